@@ -7,6 +7,8 @@ import game.game_module
 from game.sprite import Sprite
 from core.settings import Settings
 from core.bg_manager import BgManager
+from core.dirty_renderer import DirtyRenderer
+from utils.render_batch import RenderBatch
 from core.ui import Ui
 from core.menu import Menu
 from utils.ui.textsprite import TextSprite
@@ -19,6 +21,7 @@ from utils.animation import AnimationTrack
 import sys
 import platform
 from typing import Any
+from utils.helpers import ColorType
 
 WEBPLATFORM = 'emscripten'
 
@@ -30,6 +33,7 @@ class Core:
     def __init__(self) -> None:
         self.FPS = 60
         self.PERFORMANCE_MODE = False
+        self.DIRTY_RENDERING = False
         self.WEBPLATFORM = 'emscripten'
         self.CURRENT_PLATFORM = sys.platform
         self.main_display : pygame.Surface
@@ -51,6 +55,8 @@ class Core:
         self.task_scheduler = TaskScheduler()
         self.delta_stream : deque[float] = deque([1 for _ in range(30)])
         self.dirty_display_rects : list[pygame.Rect] = []
+        self.dirty_renderer : DirtyRenderer = DirtyRenderer()
+        self.frame_batch : RenderBatch = RenderBatch()
         self.brightness_map_blend_mode = pygame.BLENDMODE_NONE
 
         self.global_timer : Timer = Timer(-1, perf_counter, 1)
@@ -88,6 +94,7 @@ class Core:
                 self.end_game(None)
     
     def end_game(self, event : pygame.Event = None):
+        self.save_pool_sizes()
         self.game.end_game()
         self.menu.prepare_entry(1)
         self.event_manager.unbind(pygame.MOUSEBUTTONDOWN, Sprite.handle_mouse_event)
@@ -109,11 +116,39 @@ class Core:
     def init(self, main_display : pygame.Surface):
         self.main_display = main_display
     
+    def save_pool_sizes(self):
+        '''Saves the pool high-water marks when they grew since the last save,
+        so the next session pre-sizes its pools even if this one does not close cleanly.'''
+        pool_sizes : dict[str, int] = Sprite.get_pool_sizes()
+        if pool_sizes == self.storage.pool_sizes: return
+        self.storage.pool_sizes = pool_sizes
+        self.storage.save(self.is_web())
+
     def close_game(self, event : pygame.Event):
         self.settings.save()
+        self.storage.pool_sizes = Sprite.get_pool_sizes()
+        self.storage.save(self.is_web())
         pygame.quit()
         exit()
     
+    def get_frame_batch(self) -> RenderBatch|None:
+        '''Returns the batch draw passes should fill when dirty rendering is on, None otherwise (draw immediately).'''
+        return self.frame_batch if self.DIRTY_RENDERING else None
+
+    def set_dirty_rendering(self, value : bool):
+        self.DIRTY_RENDERING = value
+        self.frame_batch.clear()
+        self.dirty_renderer.invalidate()
+
+    def present(self, display : pygame.Surface, bg_color : ColorType|str):
+        overlay = (self.brightness_map, self.brightness_map_blend_mode) if self.settings.brightness != 0 else None
+        if self.DIRTY_RENDERING:
+            self.dirty_display_rects = self.dirty_renderer.present(display, self.frame_batch, bg_color, overlay)
+            return
+        if overlay is not None:
+            display.blit(overlay[0], (0,0), special_flags=overlay[1])
+        pygame.display.update()
+
     def update_dt(self, target_fps : int|float = 60):
         if self.last_dt_measurment == 0:
             self.dt = 1
@@ -240,13 +275,14 @@ class Core:
             self.delta_stream.popleft()
         self.delta_stream.append(self.dt)
     
-    def get_fps(self):
+    def get_average_dt(self) -> float:
         total = 0
         for delta in self.delta_stream:
             total += delta
-        
-        average = total / len(self.delta_stream)
-        return 60 / average
+        return total / len(self.delta_stream)
+    
+    def get_fps(self):
+        return 60 / self.get_average_dt()
 
     def update_fps_sprite(self):
         self.fps_sprite.text = f'FPS : {self.get_fps():0.0f}'
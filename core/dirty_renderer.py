@@ -0,0 +1,89 @@
+import pygame
+from utils.render_batch import RenderBatch, surface_versions
+from utils.helpers import ColorType
+
+DrawKey = tuple[int, int|None, int, int, int, int, int]
+
+class DirtyRenderer:
+    '''Presents a frame by only redrawing the regions that changed since the previous frame.
+    Works from the RenderBatch of the frame: every blit is identified by its surface, alpha and rect,
+    so anything that appeared, vanished or moved is erased against the background and redrawn.
+    Surfaces drawn on in place keep their identity, the code doing so bumps them in surface_versions (see SurfaceVersions).
+    Falls back to a full redraw when the batch holds custom draw callbacks or when the dirty area is too large.'''
+    def __init__(self, full_update_threshold : float = 0.35, max_rects : int = 48) -> None:
+        self.full_update_threshold : float = full_update_threshold
+        self.max_rects : int = max_rects
+        self.previous_keys : dict[DrawKey, int]|None = None
+        self.previous_items : list[tuple] = [] #keeps last frame's surfaces alive so their ids cannot be reused
+        self.previous_state : tuple|None = None
+        self.full_update_count : int = 0
+        self.partial_update_count : int = 0
+
+    def invalidate(self):
+        '''Forces the next frame to be fully redrawn.'''
+        self.previous_keys = None
+
+    @staticmethod
+    def merge_rects(rects : list[pygame.Rect], bounds : pygame.Rect) -> list[pygame.Rect]:
+        merged : list[pygame.Rect] = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if rect.width == 0 or rect.height == 0: continue
+            index : int = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def present(self, display : pygame.Surface, batch : RenderBatch, bg_color : ColorType|str,
+                overlay : tuple[pygame.Surface, int]|None = None) -> list[pygame.Rect]:
+        '''Draws the batch onto display and pushes it to the screen. Returns the rects that were updated.'''
+        items : list[tuple] = []
+        rects : list[pygame.Rect] = []
+        keys : dict[DrawKey, int] = {}
+        versions : dict[int, int] = surface_versions.versions
+        for item in batch.iter_blits():
+            surf : pygame.Surface = item[0]
+            dest = item[1]
+            rect = pygame.Rect(dest[0], dest[1], *surf.get_size()) #blits only use the position of dest
+            key : DrawKey = (rect.x, rect.y, rect.w, rect.h, id(surf), surf.get_alpha(), versions.get(id(surf), 0))
+            keys[key] = keys.get(key, 0) + 1
+            items.append(item)
+            rects.append(rect)
+
+        bounds : pygame.Rect = display.get_rect()
+        state = (tuple(pygame.Color(bg_color)), None if overlay is None else (id(overlay[0]), overlay[1]))
+        dirty : list[pygame.Rect]|None = None
+        if self.previous_keys is not None and batch.callback_count == 0 and state == self.previous_state:
+            previous_keys = self.previous_keys
+            changed : list[pygame.Rect] = [pygame.Rect(key[:4]) for key, count in keys.items() if previous_keys.get(key) != count]
+            changed += [pygame.Rect(key[:4]) for key, count in previous_keys.items() if keys.get(key) != count]
+            if len(changed) <= self.max_rects * 4:
+                dirty = self.merge_rects(changed, bounds)
+                area : int = sum(rect.width * rect.height for rect in dirty)
+                if len(dirty) > self.max_rects or area > bounds.width * bounds.height * self.full_update_threshold:
+                    dirty = None
+
+        self.previous_keys = keys
+        self.previous_items = items
+        self.previous_state = state
+
+        if dirty is None:
+            display.fill(bg_color)
+            batch.flush(display)
+            if overlay is not None: display.blit(overlay[0], (0, 0), special_flags=overlay[1])
+            pygame.display.update()
+            self.full_update_count += 1
+            return [bounds]
+
+        for rect in dirty:
+            display.set_clip(rect)
+            display.fill(bg_color, rect)
+            display.blits([items[index] for index in rect.collidelistall(rects)], doreturn=False)
+            if overlay is not None: display.blit(overlay[0], (0, 0), special_flags=overlay[1])
+        display.set_clip(None)
+        batch.clear()
+        if dirty: pygame.display.update(dirty)
+        self.partial_update_count += 1
+        return dirty
@@ -9,14 +9,17 @@ if PLATFORM == 'emscripten':
 
 class GameData(TypedDict):
     high_score : int
+    pool_sizes : dict[str, int]
 
 class GameStorage:
     '''Most of these functions are incomplete and need implementing.\nThis module is made to handle file I/O and saving on multiple platforms.'''
     def __init__(self) -> None:
         self.high_score : int = 0
+        self.pool_sizes : dict[str, int] = {}
 
     def reset(self):
         self.high_score = 0
+        self.pool_sizes = {}
     
     def validate_data(self, data : dict) -> bool:
         if data is None: return False
@@ -24,13 +27,14 @@ class GameStorage:
         return True
 
     def _get_data(self) -> GameData:
-        return {'high_score' : self.high_score}
+        return {'high_score' : self.high_score, 'pool_sizes' : self.pool_sizes}
 
     def _load_data(self, data : GameData) -> bool:
         if not self.validate_data(data):
             print('Data is invalid!')
             return False
         self.high_score = data['high_score']
+        self.pool_sizes = data.get('pool_sizes', {})
         return True
 
     def load(self, is_web : bool = False) -> bool:
@@ -10,6 +10,7 @@ from utils.my_timer import Timer
 from utils.ui.brightness_overlay import BrightnessOverlay
 from math import floor, ceil
 from utils.helpers import ColorType
+from utils.render_batch import RenderBatch
 from typing import Callable
 
 def noop():
@@ -27,18 +28,23 @@ class BaseMenu:
         self.stages : list[list[UiSprite|UiSpriteGroup]]
         self.bg_color : ColorType|str
         self.temp : dict[UiSprite|UiSpriteGroup, Timer] = {}
+        self.render_list : list[UiSprite]|None = None
+        self.render_key : tuple[int, int] = (0, 0)
+        self.render_batch : RenderBatch = RenderBatch()
         
     def init(self):
         self.bg_color = (94, 129, 162)
         self.stage = 1
         self.stage_data : list[dict] = [None, {}]
         self.stages = [None, []]
+        self.invalidate_render_order()
     
     def add_temp(self, element : UiSprite|UiSpriteGroup, time : float|Timer, 
                  override = False, time_source : Callable[[], float]|None = None, time_scale : float = 1):
         if element not in self.temp or override == True:
             timer = time if type(time) == Timer else Timer(time, time_source, time_scale)
             self.temp[element] = timer
+            self.invalidate_render_order()
     
     def alert_player(self, text : str, alert_speed : float = 1):
         text_sprite = TextSprite(pygame.Vector2(core_object.main_display.get_width() // 2, 90), 'midtop', 0, text, 
@@ -74,7 +80,14 @@ class BaseMenu:
         global core_object
         from core.core import core_object
 
-    def render(self, display : pygame.Surface):
+    def invalidate_render_order(self):
+        self.render_list = None
+
+    def get_render_list(self) -> list[UiSprite]:
+        '''Returns the sprites of the current stage sorted by zindex. 
+        The list is only rebuilt when the stage layout or a zindex changed.'''
+        if self.render_list is not None and self.render_key == (self.stage, UiSprite.zindex_version):
+            return self.render_list
         sprite_list : list[UiSprite] = []
         for sprite in (self.stages[self.stage] + list(self.temp.keys())):
             if isinstance(sprite, UiSpriteGroup):
@@ -82,8 +95,20 @@ class BaseMenu:
             else:
                 sprite_list.append(sprite)
         sprite_list.sort(key = lambda sprite : sprite.zindex)
-        for sprite in filter(lambda sprite : sprite.visible, sprite_list):
-            sprite.draw(display)
+        self.render_list = sprite_list
+        self.render_key = (self.stage, UiSprite.zindex_version)
+        return sprite_list
+
+    def render(self, display : pygame.Surface, batch : RenderBatch|None = None):
+        own_batch : bool = batch is None
+        if own_batch: batch = self.render_batch
+        for sprite in self.get_render_list():
+            if not sprite.visible: continue
+            if getattr(sprite, 'batched_draw', False):
+                batch.add(sprite.surf, sprite.rect)
+            else:
+                batch.add_callback(sprite.draw)
+        if own_batch: batch.flush(display)
         
     
     def update(self, delta : float):
@@ -92,6 +117,7 @@ class BaseMenu:
             if self.temp[item].isover(): to_del.append(item)
         for item in to_del:
             self.temp.pop(item)
+        if to_del: self.invalidate_render_order()
 
         stage_data = self.stage_data[self.stage]
         match self.stage:
@@ -106,6 +132,7 @@ class BaseMenu:
         self.stage = 0
         self.remove_connections()
         self.temp.clear()
+        self.invalidate_render_order()
     
     def goto_stage(self, new_stage : int):
         self.exit_stage()
@@ -176,6 +203,7 @@ class BaseMenu:
         
         if found:
             self.stages[stage][index] = new_sprite
+            self.invalidate_render_order()
         else:
             print('Find and replace failed')
         return found
@@ -198,6 +226,7 @@ class BaseMenu:
         
         if found:
             self.stages[stage].remove(found)
+            self.invalidate_render_order()
         else:
             print('Removal failed')
         return found
@@ -277,6 +306,7 @@ class Menu(BaseMenu):
         []
         ]
         self.bg_color = (94, 129, 162)
+        self.invalidate_render_order()
         self.add_connections()   
 
     
@@ -2,6 +2,7 @@ import pygame
 from utils.ui.ui_sprite import UiSprite
 from utils.ui.base_ui_elements import BaseUiElements
 from utils.my_timer import Timer
+from utils.render_batch import RenderBatch
 from typing import Callable
 
 class Ui:
@@ -10,6 +11,9 @@ class Ui:
         self.elements : list[UiSprite] = elements
         self.temp_elements : dict[UiSprite, Timer] = {}
         self.complete_list : list[UiSprite] = []
+        self.needs_sort : bool = True
+        self.sorted_version : int = -1
+        self.render_batch : RenderBatch = RenderBatch()
     
     def get_sprite(self, name : str|None = None, tag : int|None = None) -> UiSprite|None:
         for element in self.complete_list:
@@ -32,17 +36,26 @@ class Ui:
         
         return return_list
 
-    def render(self, display : pygame.Surface):
-        
-        self.complete_list.sort(key = lambda ui_sprite : ui_sprite.zindex)
+    def render(self, display : pygame.Surface, batch : RenderBatch|None = None):
+        if self.needs_sort or self.sorted_version != UiSprite.zindex_version:
+            self.complete_list.sort(key = lambda ui_sprite : ui_sprite.zindex)
+            self.needs_sort = False
+            self.sorted_version = UiSprite.zindex_version
+        own_batch : bool = batch is None
+        if own_batch: batch = self.render_batch
         for element in self.complete_list:
-            element.draw(display)
+            if getattr(element, 'batched_draw', False):
+                if element.visible: batch.add(element.surf, element.rect)
+            else:
+                batch.add_callback(element.draw)
+        if own_batch: batch.flush(display)
         #print(self.complete_list, self.elements, self.temp_elements)
     
     def add(self, element : UiSprite, duplicate = False):
         if element not in self.elements or duplicate == True:
             self.elements.append(element)
             self.complete_list.append(element)
+            self.needs_sort = True
     
     def add_multiple(self, elements : list[UiSprite], duplicate = False):
         for element in elements:
@@ -73,6 +86,7 @@ class Ui:
             timer = time if type(time) == Timer else Timer(time, time_source, time_scale)
             self.temp_elements[element] = timer
             self.complete_list.append(element)
+            self.needs_sort = True
     
     def update(self):
         to_del = []
@@ -11,6 +11,7 @@ from utils.ui.textsprite import TextSprite
 from utils.ui.base_ui_elements import BaseUiElements
 import utils.interpolation as interpolation
 from utils.my_timer import Timer
+from utils.timing_wheel import TimingWheel
 from game.sprite import Sprite
 from utils.helpers import average, random_float
 from utils.ui.brightness_overlay import BrightnessOverlay
@@ -29,6 +30,7 @@ class Game:
         self.active : bool = False
         self.state : None|GameState = None
         self.game_timer : Timer|None = None
+        self.timing_wheel : TimingWheel|None = None
         self.game_data : dict|None = {}
 
         
@@ -36,6 +38,7 @@ class Game:
     def start_game(self, event : pygame.Event):
         self.active = True
         self.game_timer = Timer(-1)
+        self.timing_wheel = TimingWheel()
         self.game_data = {}
         self.make_connections()
         if event.mode == 'test':
@@ -95,8 +98,15 @@ class Game:
         self.state.handle_mouse_event(event)
 
     def update(self, delta : float):
+        self.expire_scheduled()
         self.state.main_logic(delta)
     
+    def expire_scheduled(self):
+        '''Kills the sprites whose lifetime ran out on the timing wheel. Entries of sprites recycled since then are skipped.'''
+        for element, serial in self.timing_wheel.advance(self.game_timer.get_time()):
+            if element._active and element._spawn_serial == serial:
+                element.kill_instance()
+    
     def pause(self):
         if not self.active: return
         self.state.pause()
@@ -122,6 +132,7 @@ class Game:
         self.active = False
         self.state = None
         self.game_timer = None
+        self.timing_wheel = None
         self.game_data.clear()
 
         #Cleanup ingame object
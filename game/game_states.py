@@ -51,6 +51,7 @@ class NormalGameState(GameState):
                                (self.game.font_70, 'White', False), ('Black', 2), colorkey=(0, 255, 0))
         core_object.main_ui.add(pause_ui1)
         core_object.main_ui.add(pause_ui2)
+        core_object.save_pool_sizes()
         self.game.state = PausedGameState(self.game, self)
     
     def handle_key_event(self, event : pygame.Event):
@@ -109,6 +110,7 @@ class RedButtonStageStandby(RedButtonStage):
                 print('hey')
     
     def switch_to_assault(self):
+        core_object.save_pool_sizes()
         self.game.state = RedButtonStageAssault(self.game, self)
 
 class RedButtonStageAssault(RedButtonStage):
@@ -33,11 +33,12 @@ class Player(Sprite):
     def __init__(self) -> None:
         super().__init__()
         self.control_method : Literal['keyboard', 'mouse']
-        Player.inactive_elements.append(self)
+        Player.add_to_pool(self)
 
     @classmethod
     def spawn(cls, new_pos : pygame.Vector2, control_method : Literal['keyboard', 'mouse'] = 'mouse'):
-        element = cls.inactive_elements[0]
+        element = cls.get_inactive()
+        if element is None: return None
 
         element.image = cls.test_image
         element.rect = element.image.get_rect()
@@ -82,6 +83,10 @@ class Player(Sprite):
                     self.position = mouse_pos
         self.clamp_rect(pygame.Rect(0,0, *core_object.main_display.get_size()))
     
+    def get_projectile_hits(self) -> list[BaseProjectile]:
+        '''Every projectile touching the player, mask exact.'''
+        return BaseProjectile.get_hits(self)
+    
     def handle_mouse_event(self, event : pygame.Event):
         pass
 
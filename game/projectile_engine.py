@@ -0,0 +1,302 @@
+import pygame
+from typing import Any
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.batch_collision import query_circles
+from utils.render_batch import RenderBatch
+from utils.timing_wheel import TimingWheel
+
+class SlotVector:
+    '''A 2D vector column entry of a ProjectileEngine seen through a handle. Reads and writes go straight to the engine arrays,
+    so h.velocity.x = 3 or h.position += offset behave like on a sprite. Arithmetic returns plain pygame.Vector2 copies.'''
+    __slots__ = ('handle', 'column')
+    def __init__(self, handle : 'ProjectileHandle', column : str) -> None:
+        self.handle : ProjectileHandle = handle
+        self.column : str = column
+
+    def _row(self) -> 'np.ndarray':
+        return getattr(self.handle.engine, self.column)[self.handle._slot()]
+
+    @property
+    def x(self) -> float:
+        return float(self._row()[0])
+    @x.setter
+    def x(self, value : float):
+        self._row()[0] = value
+
+    @property
+    def y(self) -> float:
+        return float(self._row()[1])
+    @y.setter
+    def y(self, value : float):
+        self._row()[1] = value
+
+    def copy(self) -> pygame.Vector2:
+        return pygame.Vector2(self._row().tolist())
+
+    def __getitem__(self, index : int) -> float:
+        return float(self._row()[index])
+
+    def __setitem__(self, index : int, value : float):
+        self._row()[index] = value
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        return iter(self._row().tolist())
+
+    def __eq__(self, other) -> bool:
+        return self.copy() == other
+
+    def __add__(self, other) -> pygame.Vector2:
+        return self.copy() + other
+    __radd__ = __add__
+
+    def __sub__(self, other) -> pygame.Vector2:
+        return self.copy() - other
+
+    def __rsub__(self, other) -> pygame.Vector2:
+        return other - self.copy()
+
+    def __mul__(self, other):
+        return self.copy() * other
+    __rmul__ = __mul__
+
+    def __truediv__(self, other) -> pygame.Vector2:
+        return self.copy() / other
+
+    def __neg__(self) -> pygame.Vector2:
+        return -self.copy()
+
+    def __repr__(self):
+        return f'SlotVector({self.column}, {self.copy()})'
+
+class ProjectileHandle:
+    '''Lightweight stand-in for a projectile living in a ProjectileEngine.
+    Vector attributes are SlotVector views writing through to the engine, call copy() on them to keep a value around.
+    A handle goes stale once its slot is freed, every accessor then raises a LookupError.'''
+    __slots__ = ('engine', 'index', 'generation')
+    def __init__(self, engine : 'ProjectileEngine', index : int, generation : int) -> None:
+        self.engine : ProjectileEngine = engine
+        self.index : int = index
+        self.generation : int = generation
+
+    @property
+    def active(self) -> bool:
+        engine = self.engine
+        return bool(engine.alive[self.index]) and engine.generations[self.index] == self.generation
+
+    def _slot(self) -> int:
+        if not self.active: raise LookupError('Projectile handle is no longer valid')
+        return self.index
+
+    @property
+    def position(self) -> SlotVector:
+        self._slot()
+        return SlotVector(self, 'positions')
+    @position.setter
+    def position(self, value):
+        self.engine.positions[self._slot()] = tuple(value)
+
+    @property
+    def velocity(self) -> SlotVector:
+        self._slot()
+        return SlotVector(self, 'velocities')
+    @velocity.setter
+    def velocity(self, value):
+        self.engine.velocities[self._slot()] = tuple(value)
+
+    @property
+    def acceleration(self) -> SlotVector:
+        self._slot()
+        return SlotVector(self, 'accelerations')
+    @acceleration.setter
+    def acceleration(self, value):
+        self.engine.accelerations[self._slot()] = tuple(value)
+
+    @property
+    def drag(self) -> float:
+        return float(self.engine.drags[self._slot()])
+    @drag.setter
+    def drag(self, value : float):
+        self.engine.drags[self._slot()] = value
+
+    @property
+    def collision_radius(self) -> float:
+        return float(self.engine.radii[self._slot()])
+    @collision_radius.setter
+    def collision_radius(self, value : float):
+        self.engine.radii[self._slot()] = value
+
+    @property
+    def image(self) -> pygame.Surface:
+        return self.engine.images[self._slot()]
+
+    @property
+    def rect(self) -> pygame.Rect:
+        index : int = self._slot()
+        rect = self.engine.images[index].get_rect()
+        rect.center = self.engine.positions[index].tolist()
+        return rect
+
+    def kill_instance(self):
+        self.engine.kill(self._slot())
+
+    def kill_instance_safe(self):
+        '''Same as kill_instance but does nothing on a stale handle.'''
+        if self.active: self.engine.kill(self.index)
+
+class ProjectileEngine:
+    '''Struct-of-arrays storage for plain projectiles.
+    Every projectile lives in a slot of contiguous NumPy arrays, so movement, offscreen culling and lifetimes
+    are handled for all of them in a handful of vectorized operations per frame.
+    Slots are recycled through a free list and validated by a generation counter.
+    The projectiles are drawn along with the sprites of the given zindex, after them.'''
+    def __init__(self, bounding_box : pygame.Rect, capacity : int = 256, zindex : int = 0) -> None:
+        self.bounding_box : pygame.Rect = bounding_box
+        self.zindex : int = zindex
+        self.capacity : int = 0
+        self.positions : np.ndarray = np.zeros((0, 2))
+        self.velocities : np.ndarray = np.zeros((0, 2))
+        self.accelerations : np.ndarray = np.zeros((0, 2))
+        self.half_sizes : np.ndarray = np.zeros((0, 2))
+        self.drags : np.ndarray = np.zeros(0)
+        self.radii : np.ndarray = np.zeros(0)
+        self.alive : np.ndarray = np.zeros(0, dtype=bool)
+        self.kill_offscreen : np.ndarray = np.zeros(0, dtype=bool)
+        self.was_onscreen : np.ndarray = np.zeros(0, dtype=bool)
+        self.generations : np.ndarray = np.zeros(0, dtype=np.int64)
+        self.images : list[pygame.Surface|None] = []
+        self.free_slots : list[int] = []
+        self.live_count : int = 0
+        self.timing_wheel : TimingWheel = TimingWheel()
+        self.grow(capacity)
+
+    def grow(self, new_capacity : int):
+        old_capacity : int = self.capacity
+        if new_capacity <= old_capacity: return
+        extra : int = new_capacity - old_capacity
+        def extend(array : 'np.ndarray') -> 'np.ndarray':
+            return np.concatenate((array, np.zeros((extra, *array.shape[1:]), dtype=array.dtype)))
+        self.positions = extend(self.positions)
+        self.velocities = extend(self.velocities)
+        self.accelerations = extend(self.accelerations)
+        self.half_sizes = extend(self.half_sizes)
+        self.drags = extend(self.drags)
+        self.radii = extend(self.radii)
+        self.alive = extend(self.alive)
+        self.kill_offscreen = extend(self.kill_offscreen)
+        self.was_onscreen = extend(self.was_onscreen)
+        self.generations = extend(self.generations)
+        self.images.extend(None for _ in range(extra))
+        self.free_slots.extend(range(new_capacity - 1, old_capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def spawn(self, pos : pygame.Vector2, surf : pygame.Surface, velocity : Any = None, accel : Any = None,
+              drag : float = 0, lifetime : float = -1, kill_offscreen : bool = True, radius : float|None = None,
+              current_time : float = 0) -> ProjectileHandle:
+        if not self.free_slots: self.grow(max(16, self.capacity * 2))
+        index : int = self.free_slots.pop()
+        width, height = surf.get_size()
+        self.positions[index] = tuple(pos)
+        self.velocities[index] = tuple(velocity) if velocity is not None else (0, 0)
+        self.accelerations[index] = tuple(accel) if accel is not None else (0, 0)
+        self.half_sizes[index] = (width / 2, height / 2)
+        self.drags[index] = drag
+        self.radii[index] = radius if radius is not None else min(width, height) / 2
+        self.kill_offscreen[index] = kill_offscreen
+        self.was_onscreen[index] = False
+        self.images[index] = surf
+        self.alive[index] = True
+        self.live_count += 1
+        self.update_onscreen(np.array([index]))
+        if lifetime >= 0: self.timing_wheel.schedule(current_time + lifetime, index, int(self.generations[index]))
+        return ProjectileHandle(self, index, int(self.generations[index]))
+
+    def kill(self, index : int):
+        if not self.alive[index]: return
+        self.alive[index] = False
+        self.generations[index] += 1
+        self.images[index] = None
+        self.free_slots.append(index)
+        self.live_count -= 1
+
+    def kill_indices(self, indices : 'np.ndarray'):
+        if len(indices) == 0: return
+        self.alive[indices] = False
+        self.generations[indices] += 1
+        images = self.images
+        for index in indices.tolist():
+            images[index] = None
+        self.free_slots.extend(indices.tolist())
+        self.live_count -= len(indices)
+
+    def kill_all(self):
+        self.kill_indices(self.get_live_indices())
+        self.timing_wheel.reset()
+
+    def get_live_indices(self) -> 'np.ndarray':
+        return np.flatnonzero(self.alive)
+
+    def update_onscreen(self, indices : 'np.ndarray') -> 'np.ndarray':
+        '''Flags the given slots that touch the bounding box and returns the mask of the ones that do.'''
+        box : pygame.Rect = self.bounding_box
+        positions = self.positions[indices]
+        half_sizes = self.half_sizes[indices]
+        onscreen = ((positions[:, 0] + half_sizes[:, 0] > box.left) & (positions[:, 0] - half_sizes[:, 0] < box.right) &
+                    (positions[:, 1] + half_sizes[:, 1] > box.top) & (positions[:, 1] - half_sizes[:, 1] < box.bottom))
+        self.was_onscreen[indices] |= onscreen
+        return onscreen
+
+    def update(self, delta : float, current_time : float):
+        '''Integrates every live projectile (velocity Verlet with drag, as BaseProjectile.do_movement)
+        then frees the ones that left the screen or outlived their lifetime.'''
+        indices = self.get_live_indices()
+        if len(indices) == 0: return
+        velocities = self.velocities[indices]
+        accelerations = self.accelerations[indices] * (0.5 * delta)
+        damping = np.power(1 - self.drags[indices], delta * 0.5)[:, None]
+        velocities *= damping
+        velocities += accelerations
+        self.positions[indices] += velocities * delta
+        velocities += accelerations
+        velocities *= damping
+        self.velocities[indices] = velocities
+
+        was_onscreen = self.was_onscreen[indices]
+        onscreen = self.update_onscreen(indices)
+        self.kill_indices(indices[~onscreen & was_onscreen & self.kill_offscreen[indices]])
+        self.kill_expired(current_time)
+    
+    def kill_expired(self, current_time : float):
+        '''Frees the slots whose lifetime ran out. Only the entries due on the timing wheel are looked at.'''
+        due = self.timing_wheel.advance(current_time)
+        if not due: return
+        alive = self.alive
+        generations = self.generations
+        expired = [index for index, generation in due if alive[index] and generations[index] == generation]
+        self.kill_indices(np.array(expired, dtype=np.int64))
+
+    def pack_collision_data(self) -> tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        indices = self.get_live_indices()
+        return indices, self.positions[indices], self.radii[indices]
+
+    def get_hits(self, mask : pygame.Mask|None, rect : pygame.Rect) -> list[ProjectileHandle]:
+        indices, centers, radii = self.pack_collision_data()
+        generations = self.generations
+        return [ProjectileHandle(self, int(indices[hit]), int(generations[indices[hit]]))
+                for hit in query_circles(mask, rect, centers, radii)]
+
+    def draw(self, batch : RenderBatch):
+        '''Adds every live projectile to the batch, positions are read straight from the arrays.'''
+        indices = self.get_live_indices()
+        if len(indices) == 0: return
+        topleft = np.floor(self.positions[indices] - self.half_sizes[indices]).astype(int).tolist()
+        images = self.images
+        batch.add_many([(images[index], pos) for index, pos in zip(indices.tolist(), topleft)])
+
+    def __len__(self):
+        return self.live_count
@@ -1,9 +1,16 @@
 import pygame
-from game.sprite import Sprite
+from game.sprite import Sprite, SpillPolicy
 from core.core import core_object
 
 from utils.helpers import load_alpha_to_colorkey
 from utils.my_timer import Timer
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.batch_collision import query_circles, confirm_circle_hits
+from utils.render_batch import RenderBatch
+from game.projectile_engine import ProjectileEngine, ProjectileHandle
 
 class BaseProjectile(Sprite):
     active_elements : list['BaseProjectile'] = []
@@ -17,21 +24,30 @@ class BaseProjectile(Sprite):
     pygame.draw.circle(test_image, "Red", (test_radius, test_radius), test_radius)
 
     bounding_box = pygame.Rect(0, 0, *core_object.main_display.get_size())
+    #Opt in by giving a class its own engine, e.g. StandardProjectile.engine = ProjectileEngine(BaseProjectile.bounding_box).
+    #Engine projectiles are not sprites : pool limits and the Sprite collision queries do not see them, get_hits does.
+    engine : ProjectileEngine|None = None
+    collision_cache : tuple[int, list['BaseProjectile'], 'np.ndarray', 'np.ndarray']|None = None
 
     def __init__(self):
         super().__init__()
         self.velocity : pygame.Vector2
         self.acceleration : pygame.Vector2
         self.drag : float
+        self.collision_radius : float
         self.lifetime_timer : Timer
         self.kill_offscreen : bool
         self.was_onscreen : bool
-        BaseProjectile.inactive_elements.append(self)
+        BaseProjectile.add_to_pool(self)
     
     @classmethod
     def spawn(cls,  pos : pygame.Vector2, surf : pygame.Vector2|None = None, velocity : pygame.Vector2|None = None, 
-              accel : pygame.Vector2|None = None, drag : float = 0, lifetime : float = -1, kill_offscreen : bool = True):
-        element = cls.inactive_elements[0]
+              accel : pygame.Vector2|None = None, drag : float = 0, lifetime : float = -1, kill_offscreen : bool = True,
+              radius : float|None = None):
+        handle : ProjectileHandle|None = cls.spawn_in_engine(pos, surf, velocity, accel, drag, lifetime, kill_offscreen, radius)
+        if handle is not None: return handle
+        element = cls.get_inactive()
+        if element is None: return None
 
         element.image = surf or cls.test_image
         element.rect = element.image.get_rect()
@@ -42,6 +58,7 @@ class BaseProjectile(Sprite):
         element.velocity = velocity or pygame.Vector2(0,0)
         element.acceleration = accel or pygame.Vector2(0,0)
         element.drag = drag
+        element.collision_radius = radius if radius is not None else (cls.test_radius if surf is None else min(element.rect.size) / 2)
         element.lifetime_timer = Timer(lifetime, time_source=core_object.game.game_timer.get_time)
 
 
@@ -50,8 +67,18 @@ class BaseProjectile(Sprite):
         
         element.check_bounding()
         cls.unpool(element)
+        element.schedule_expiry(lifetime, core_object.game.game_timer.get_time)
         return element
     
+    @classmethod
+    def spawn_in_engine(cls, pos : pygame.Vector2, surf : pygame.Surface|None, velocity : pygame.Vector2|None, accel : pygame.Vector2|None,
+                        drag : float, lifetime : float, kill_offscreen : bool, radius : float|None) -> ProjectileHandle|None:
+        '''Spawns the projectile in the engine of the class. Returns None when the class has no engine and spawns pooled sprites.'''
+        engine : ProjectileEngine|None = cls.get_engine()
+        if engine is None: return None
+        return engine.spawn(pos, surf or cls.test_image, velocity, accel, drag, lifetime, kill_offscreen, radius,
+                            core_object.game.game_timer.get_time())
+    
     def do_movement(self, delta : float):
         self.velocity *=  ((1 - self.drag) ** delta) ** 0.5
 
@@ -75,11 +102,69 @@ class BaseProjectile(Sprite):
             if self.was_onscreen and self.kill_offscreen:
                 self.kill_instance_safe()
     
+    @classmethod
+    def get_engine(cls) -> ProjectileEngine|None:
+        '''Returns the array engine of this exact class. Spawns go through it instead of the pool when there is one.'''
+        return cls.__dict__.get('engine')
+    
+    @classmethod
+    def get_draw_zindex(cls) -> int|None:
+        engine : ProjectileEngine|None = cls.get_engine()
+        return engine.zindex if engine is not None else None
+    
+    @classmethod
+    def update_class(cls, delta : float):
+        engine : ProjectileEngine|None = cls.get_engine()
+        if engine is not None: engine.update(delta, core_object.game.game_timer.get_time())
+    
+    @classmethod
+    def draw_class(cls, batch : RenderBatch):
+        engine : ProjectileEngine|None = cls.get_engine()
+        if engine is not None: engine.draw(batch)
+    
+    @classmethod
+    def kill_class(cls):
+        engine : ProjectileEngine|None = cls.get_engine()
+        if engine is not None: engine.kill_all()
+    
+    @classmethod
+    def pack_collision_data(cls) -> tuple[list['BaseProjectile'], 'np.ndarray', 'np.ndarray']:
+        '''Packs the centers and radii of every live projectile of the class into arrays for batched queries.
+        The arrays are built once per frame, on the first query after movement, and shared by the other queries of the frame.
+        Projectiles spawned later in the frame are only seen on the next one.'''
+        cache = cls.__dict__.get('collision_cache')
+        if cache is not None and cache[0] == core_object.frame_counter: return cache[1:]
+        elements : list[BaseProjectile] = [element for element in cls.active_elements if not element._zombie]
+        centers = np.array([element.rect.center for element in elements], dtype=float).reshape(-1, 2)
+        radii = np.array([element.collision_radius for element in elements], dtype=float)
+        cls.collision_cache = (core_object.frame_counter, elements, centers, radii)
+        return elements, centers, radii
+    
+    @classmethod
+    def get_hits(cls, target : Sprite, precise : bool = True) -> list['BaseProjectile|ProjectileHandle']:
+        '''Returns every projectile of the class hitting target, including the ones living in its engine or the engines of its subclasses (as handles). 
+        Bullets are treated as circles of collision_radius, precise confirms the few candidates against the target's mask.'''
+        mask : pygame.Mask|None = target.mask if precise else None
+        engine_hits : list[ProjectileHandle] = []
+        for sprite_class in Sprite.registered_classes:
+            engine : ProjectileEngine|None = sprite_class.get_engine() if issubclass(sprite_class, cls) else None
+            if engine is not None: engine_hits += engine.get_hits(mask, target.rect)
+        if np is None:
+            hits : list[BaseProjectile] = target.get_all_rect_colliding(cls)
+            if mask is None: return hits
+            centers = [element.rect.center for element in hits]
+            radii = [element.collision_radius for element in hits]
+            return [hits[index] for index in confirm_circle_hits(mask, target.rect, centers, radii, range(len(hits)))]
+        elements, centers, radii = cls.pack_collision_data()
+        hits = [elements[index] for index in query_circles(mask, target.rect, centers, radii)]
+        return [element for element in hits if element._active and not element._zombie] + engine_hits
+
     def clean_instance(self):
         super().clean_instance()
         self.velocity = None
         self.acceleration = None
         self.drag = None
+        self.collision_radius = None
         self.lifetime_timer = None
         self.kill_offscreen = None
         self.was_onscreen = None
@@ -89,15 +174,22 @@ class StandardProjectile(BaseProjectile):
     active_elements : list['StandardProjectile'] = []
     inactive_elements : list['StandardProjectile'] = []
     linked_classes : list['Sprite'] = [Sprite, BaseProjectile]
+    pool_growth : int = 50
+    pool_limit : int = 5000
+    spill_policy : SpillPolicy = 'recycle'
 
     def __init__(self):
         super().__init__()
-        StandardProjectile.inactive_elements.append(self)
+        StandardProjectile.add_to_pool(self)
     
     @classmethod
     def spawn(cls, pos : pygame.Vector2, surf : pygame.Vector2|None = None, velocity : pygame.Vector2|None = None, 
-              accel : pygame.Vector2|None = None, drag : float = 0, lifetime : float = -1, kill_offscreen : bool = True):
-        element = cls.inactive_elements[0]
+              accel : pygame.Vector2|None = None, drag : float = 0, lifetime : float = -1, kill_offscreen : bool = True,
+              radius : float|None = None):
+        handle : ProjectileHandle|None = cls.spawn_in_engine(pos, surf, velocity, accel, drag, lifetime, kill_offscreen, radius)
+        if handle is not None: return handle
+        element = cls.get_inactive()
+        if element is None: return None
 
         element.image = surf or cls.test_image
         element.rect = element.image.get_rect()
@@ -108,6 +200,7 @@ class StandardProjectile(BaseProjectile):
         element.velocity = velocity or pygame.Vector2(0,0)
         element.acceleration = accel or pygame.Vector2(0,0)
         element.drag = drag
+        element.collision_radius = radius if radius is not None else (cls.test_radius if surf is None else min(element.rect.size) / 2)
         element.lifetime_timer = Timer(lifetime, time_source=core_object.game.game_timer.get_time)
 
 
@@ -116,6 +209,7 @@ class StandardProjectile(BaseProjectile):
         
         element.check_bounding()
         cls.unpool(element)
+        element.schedule_expiry(lifetime, core_object.game.game_timer.get_time)
         return element
     
     def update(self, delta : float):
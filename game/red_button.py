@@ -20,11 +20,12 @@ class RedButton(Sprite):
         self.velocity : pygame.Vector2
         self.accel : pygame.Vector2
         self.anchored : bool = False
-        RedButton.inactive_elements.append(self)
+        RedButton.add_to_pool(self)
     
     @classmethod
     def spawn(cls, pos : pygame.Vector2):
-        element = cls.inactive_elements[0]
+        element = cls.get_inactive()
+        if element is None: return None
 
         element.image = cls.unpressed_image
         element.rect = element.image.get_rect()
@@ -1,10 +1,18 @@
 import pygame
 from utils.animation import AnimationTrack, Animation
-from typing import Any
+from utils.my_timer import TimeSource
+from typing import Any, Literal, TypeAlias
+from collections import deque
 from utils.helpers import is_sorted
 from utils.pivot_2d import Pivot2D
+from utils.spatial_hash import SpatialHash
+from utils.render_order import RenderOrder
+from utils.render_batch import RenderBatch
+from utils.mask_cache import mask_cache
 from inspect import isclass
 
+SpillPolicy : TypeAlias = Literal['drop', 'recycle', 'grow']
+
 class Sprite:
     '''Base class for all game objects.'''
     active_elements : list['Sprite'] = []
@@ -14,18 +22,39 @@ class Sprite:
     ordered_sprites : list['Sprite'] = []
     registered_classes : list['Sprite'] = []
     SPRITE_CLICKED : int = pygame.event.custom_type()
-    
+
+    pool_growth : int = 16
+    pool_limit : int = -1
+    spill_policy : SpillPolicy = 'grow'
+    high_water_marks : dict[str, int] = {}
+    spawn_orders : dict[type, deque[tuple[int, 'Sprite']]] = {}
+    _spawn_counter : int = 0
+    spatial_hash : SpatialHash = SpatialHash()
+    render_order : RenderOrder = RenderOrder()
+    render_batch : RenderBatch = RenderBatch()
+    blend_flags : int = 0
+    batched_draw : bool = True
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.batched_draw = cls.draw is Sprite.draw
+
     def __init__(self) -> None:
         self._position : pygame.Vector2
         self.pivot : Pivot2D|None = None
         self._image : pygame.Surface
         self.rect : pygame.Rect
-        self.mask : pygame.Mask
+        self._mask : pygame.Mask|None = None
         self.dynamic_mask : bool = False
-        self.zindex : int
+        self._zindex : int|None = None
+        self._render_z : int|None = None
+        self._render_slot : int = 0
         self.animation_tracks : dict[str, AnimationTrack]
-        Sprite.inactive_elements.append(self)
+        self._pool_slots : dict[type, int] = {}
+        self._active : bool = False
+        self._spawn_serial : int = 0
         self._zombie : bool = False
+        Sprite.add_to_pool(self)
     
     @property
     def image(self) -> pygame.Surface:
@@ -34,11 +63,35 @@ class Sprite:
     @image.setter
     def image(self, new_surf : pygame.Surface):
         self._image = new_surf
-        if self.dynamic_mask:
-            if new_surf is None:
-                self.mask = None
-            else:
-                self.mask = pygame.mask.from_surface(new_surf)
+        self._mask = None
+        if self.dynamic_mask and new_surf is not None:
+            self._mask = self.get_surface_mask(new_surf)
+    
+    @property
+    def mask(self) -> pygame.Mask|None:
+        '''The collision mask of the current image. Built (or fetched from the shared cache) the first time it is needed.'''
+        if self._mask is None and self.image is not None:
+            self._mask = self.get_surface_mask(self.image)
+        return self._mask
+    
+    @mask.setter
+    def mask(self, new_mask : pygame.Mask|None):
+        self._mask = new_mask
+    
+    def get_surface_mask(self, surf : pygame.Surface) -> pygame.Mask:
+        '''Rotations coming from the rotation cache keep their own mask, other surfaces go through the shared mask cache.'''
+        pivot : Pivot2D|None = getattr(self, 'pivot', None)
+        rotated = pivot.rotated if pivot is not None else None
+        return rotated.mask if rotated is not None and rotated.image is surf else mask_cache.get(surf)
+    
+    @property
+    def zindex(self) -> int|None:
+        return self._zindex
+    
+    @zindex.setter
+    def zindex(self, new_val : int|None):
+        self._zindex = new_val
+        if self._active: Sprite.render_order.move(self, new_val)
     
     def align_rect(self):
         self.rect.center = round(self.true_position)
@@ -108,41 +161,135 @@ class Sprite:
     
     @property
     def active(self):
-        return (self in self.__class__.active_elements) or (self in Sprite.active_elements)
+        return self._active
+    
+    @classmethod
+    def add_to_pool(cls, element : 'Sprite'):
+        '''Registers a freshly created element in the inactive list of this exact class.'''
+        element._pool_slots[cls] = len(cls.inactive_elements)
+        cls.inactive_elements.append(element)
+    
+    @staticmethod
+    def _swap_remove(owner : type, elements : list['Sprite'], element : 'Sprite'):
+        '''Removes element from one of owner's lists in O(1) by moving the last element into its slot.'''
+        index : int = element._pool_slots[owner]
+        last : Sprite = elements.pop()
+        if last is not element:
+            elements[index] = last
+            last._pool_slots[owner] = index
 
     @classmethod
     def pool(cls, element):
         '''Transfers an element from active to inactive state. Nothing changes if the element is already inactive.'''
-
+        if not element._active: return
         for linked_class in cls.linked_classes + [cls]:
-            if element in linked_class.active_elements:
-                linked_class.active_elements.remove(element)         
-            
-            if element not in linked_class.inactive_elements:
-                linked_class.inactive_elements.append(element)
+            Sprite._swap_remove(linked_class, linked_class.active_elements, element)
+            element._pool_slots[linked_class] = len(linked_class.inactive_elements)
+            linked_class.inactive_elements.append(element)
+        element._active = False
+        Sprite.render_order.remove(element)
     
     @classmethod
     def unpool(cls, element):
         '''Transfers an element from inactive to active state. Nothing changes if the element is already active.'''
+        if element._active: return
         for linked_class in cls.linked_classes + [cls]:
-            if element not in linked_class.active_elements:
-                linked_class.active_elements.append(element)
+            Sprite._swap_remove(linked_class, linked_class.inactive_elements, element)
+            element._pool_slots[linked_class] = len(linked_class.active_elements)
+            linked_class.active_elements.append(element)
+        element._active = True
+        if element._zindex is not None: Sprite.render_order.add(element, element._zindex)
+
+        Sprite._spawn_counter += 1
+        element._spawn_serial = Sprite._spawn_counter
+        active_count : int = len(cls.active_elements)
+        if active_count > Sprite.high_water_marks.get(cls.__name__, 0):
+            Sprite.high_water_marks[cls.__name__] = active_count
+        if cls.spill_policy == 'recycle':
+            cls._record_spawn_order(element, active_count)
+        if Sprite.spatial_hash.is_usable(core_object.frame_counter):
+            Sprite.spatial_hash.insert(element)
 
-            if element in linked_class.inactive_elements:
-                linked_class.inactive_elements.remove(element)
+    @classmethod
+    def _record_spawn_order(cls, element : 'Sprite', active_count : int):
+        order = Sprite.spawn_orders.get(cls)
+        if order is None:
+            order = Sprite.spawn_orders[cls] = deque()
+        order.append((element._spawn_serial, element))
+        if len(order) > 4 * active_count + 64:
+            Sprite.spawn_orders[cls] = deque(entry for entry in order if entry[1]._active and entry[1]._spawn_serial == entry[0])
+    
+    @classmethod
+    def get_oldest_active(cls) -> 'Sprite|None':
+        '''Returns the active element of the class that was spawned the longest time ago. Only tracked for the 'recycle' spill policy.'''
+        order = Sprite.spawn_orders.get(cls)
+        while order:
+            serial, element = order[0]
+            if element._active and element._spawn_serial == serial: return element
+            order.popleft()
+        return None
+
+    @classmethod
+    def grow_pool(cls, amount : int):
+        for _ in range(amount):
+            cls()
+    
+    @classmethod
+    def get_pool_size(cls) -> int:
+        return len(cls.active_elements) + len(cls.inactive_elements)
 
+    @classmethod
+    def reserve(cls, size : int):
+        '''Grows the pool until it holds at least size elements (clamped to pool_limit).'''
+        if cls.pool_limit >= 0: size = min(size, cls.pool_limit)
+        missing : int = size - cls.get_pool_size()
+        if missing > 0: cls.grow_pool(missing)
 
+    @classmethod
+    def get_inactive(cls) -> 'Sprite|None':
+        '''Returns an inactive element ready to be spawned, growing the pool in chunks when it runs dry.
+        Once the pool holds pool_limit elements, spill_policy decides what happens: 'drop' returns None,
+        'recycle' kills and reuses the oldest active element and 'grow' ignores the limit.'''
+        if cls.inactive_elements: return cls.inactive_elements[-1]
+        active_count : int = len(cls.active_elements)
+        if cls.pool_limit < 0:
+            cls.grow_pool(cls.pool_growth)
+        elif active_count < cls.pool_limit:
+            cls.grow_pool(min(cls.pool_growth, cls.pool_limit - active_count))
+        elif cls.spill_policy == 'grow':
+            cls.grow_pool(cls.pool_growth)
+        elif cls.spill_policy == 'recycle':
+            oldest : Sprite|None = cls.get_oldest_active()
+            if oldest is None: return None
+            oldest.kill_instance()
+        else:
+            return None
+        return cls.inactive_elements[-1]
     
+    @staticmethod
+    def reserve_pools(sizes : dict[str, int]):
+        '''Pre-sizes the pools of registered classes from high-water marks saved by a previous session.'''
+        for name, size in sizes.items():
+            sprite_class : Sprite|None = Sprite.get_sprite_class_by_name(name)
+            if sprite_class is None: continue
+            sprite_class.reserve(size)
+            Sprite.high_water_marks[name] = max(size, Sprite.high_water_marks.get(name, 0))
+    
+    @staticmethod
+    def get_pool_sizes() -> dict[str, int]:
+        return dict(Sprite.high_water_marks)
+
     @classmethod
     def pool_elements(cls):
-        '''Pools every element of the class'''
+        '''Pools every element of the class. Each element is pooled by its own class, which also clears the lists of its subclass.'''
         while len(cls.active_elements) > 0:
-            cls.pool(cls.active_elements[0])
+            element = cls.active_elements[-1]
+            element.__class__.pool(element)
     
     @staticmethod
     def pool_all_sprites():
         while len(Sprite.active_elements) > 0:
-            element = Sprite.active_elements[0]
+            element = Sprite.active_elements[-1]
             cls = element.__class__
             cls.pool(element)
 
@@ -167,6 +314,14 @@ class Sprite:
     def kill_instance_safe(self):
         self._zombie = True
     
+    def schedule_expiry(self, lifetime : float, time_source : TimeSource|None) -> bool:
+        '''Registers the end of this sprite's lifetime on the game's timing wheel, which kills it once the game timer gets there.
+        Only possible for lifetimes measured with the game timer while a game is running. Returns whether it was scheduled.'''
+        game = core_object.game
+        if lifetime < 0 or game.timing_wheel is None or time_source != game.game_timer.get_time: return False
+        game.timing_wheel.schedule(time_source() + lifetime, self, self._spawn_serial)
+        return True
+    
     @classmethod
     def clean_all_instances(cls):
         for element in cls.active_elements:
@@ -188,6 +343,9 @@ class Sprite:
         for element in Sprite.active_elements:
             element.clean_instance()
         Sprite.pool_all_sprites()
+        Sprite.spatial_hash.clear()
+        for sprite_class in Sprite.registered_classes:
+            sprite_class.kill_class()
     
     def update(self, delta : float):
         pass
@@ -195,6 +353,21 @@ class Sprite:
     @classmethod
     def update_class(cls, delta : float):
         pass
+    
+    @classmethod
+    def draw_class(cls, batch : RenderBatch):
+        '''Hook for registered classes drawing things that are not sprites. 
+        Called right after the sprites of get_draw_zindex, or after every sprite if it returns None.'''
+        pass
+    
+    @classmethod
+    def get_draw_zindex(cls) -> int|None:
+        return None
+    
+    @classmethod
+    def kill_class(cls):
+        '''Hook for registered classes holding state outside of the pools. Called by kill_all_sprites.'''
+        pass
 
     def self_destruct(self):
         cls = self.__class__
@@ -223,6 +396,12 @@ class Sprite:
         for element in Sprite.active_elements:
             element.update(delta)
         Sprite.clear_zombies(Sprite.active_elements)
+        Sprite.update_spatial_hash(delta)
+    
+    @staticmethod
+    def update_spatial_hash(delta : float = 1):
+        '''Refiles every active sprite in the broadphase. Called once per frame after movement.'''
+        Sprite.spatial_hash.rebuild(Sprite.active_elements, core_object.frame_counter, delta)
     
     @classmethod
     def update_all_registered_classes(cls, delta : float):
@@ -274,6 +453,20 @@ class Sprite:
     def is_collding_rect(self, other : 'Sprite'):
         return self.rect.colliderect(other.rect)
 
+    def get_collision_candidates(self, collision_group : 'list[Sprite]|type[Sprite]') -> list['Sprite']:
+        '''Returns the elements of collision_group worth a narrow phase check against this sprite.
+        Class groups go through the spatial hash when it is fresh enough, plain lists are returned as is.'''
+        spatial_hash : SpatialHash = Sprite.spatial_hash
+        if not isclass(collision_group):
+            candidates = collision_group
+        elif spatial_hash.is_usable(core_object.frame_counter):
+            candidates = [element for element in spatial_hash.query(self.rect, core_object.frame_counter, core_object.dt) 
+                          if element._active and collision_group in element._pool_slots]
+        else:
+            candidates = collision_group.active_elements
+        spatial_hash.candidate_count += len(candidates)
+        return candidates
+
     def get_colliding(self, collision_groups : list[list['Sprite']]):
         '''Returns the first sprite colliding this sprite within collision_group or None if there arent any. Uses mask collision.'''
         try:
@@ -281,9 +474,10 @@ class Sprite:
         except TypeError:
             collision_groups = [collision_groups]
         for collision_group in collision_groups:
-            actual_group = collision_group.active_elements if isclass(collision_group) else collision_group
-            for element in actual_group:
-                if self.is_colliding(element) and not element._zombie: return element     
+            for element in self.get_collision_candidates(collision_group):
+                if self.is_colliding(element) and not element._zombie: 
+                    Sprite.spatial_hash.hit_count += 1
+                    return element     
         return None
     
     def get_rect_colliding(self, collision_groups : list[list['Sprite']]):
@@ -293,9 +487,10 @@ class Sprite:
         except TypeError:
             collision_groups = [collision_groups]
         for collision_group in collision_groups:
-            actual_group = collision_group.active_elements if isclass(collision_group) else collision_group
-            for element in actual_group:
-                if self.is_collding_rect(element) and not element._zombie: return element
+            for element in self.get_collision_candidates(collision_group):
+                if self.is_collding_rect(element) and not element._zombie: 
+                    Sprite.spatial_hash.hit_count += 1
+                    return element
         return None
     
     def get_all_colliding(self, collision_groups : list[list['Sprite']]) -> list['Sprite']:
@@ -306,10 +501,10 @@ class Sprite:
             collision_groups = [collision_groups]
         return_val = []
         for collision_group in collision_groups:
-            actual_group = collision_group.active_elements if isclass(collision_group) else collision_group
-            for element in actual_group:
+            for element in self.get_collision_candidates(collision_group):
                 if self.is_colliding(element) and not element._zombie:
                     return_val.append(element)
+        Sprite.spatial_hash.hit_count += len(return_val)
         return return_val
 
     def get_all_rect_colliding(self, collision_groups : list[list['Sprite']]):
@@ -320,24 +515,48 @@ class Sprite:
             collision_groups = [collision_groups]
         return_val = []
         for collision_group in collision_groups:
-            actual_group = collision_group.active_elements if isclass(collision_group) else collision_group
-            for element in actual_group:
+            for element in self.get_collision_candidates(collision_group):
                 if self.is_collding_rect(element) and not element._zombie: return_val.append(element)
+        Sprite.spatial_hash.hit_count += len(return_val)
         return return_val
 
     def on_collision(self, other : 'Sprite'):
         pass
 
     def is_active(self):
-        return self in self.__class__.active_elements
+        return self._active
     
     @classmethod
-    def draw_all_sprites(cls, display):
-        #if not is_sorted(cls.active_elements, key=lambda sprite : sprite.zindex):
-        cls.active_elements.sort(key=lambda sprite : sprite.zindex)
+    def draw_all_sprites(cls, display : pygame.Surface, batch : RenderBatch|None = None):
+        '''Draws every active sprite in zindex order. 
+        Sprites using the default draw are collected into a RenderBatch, the others are kept as draw callbacks.
+        The batch is flushed right away unless one was provided by the caller.'''
+        own_batch : bool = batch is None
+        if own_batch: batch = Sprite.render_batch
         element : Sprite
-        for element in cls.active_elements:
-            element.draw(display)
+        layered : list[tuple[int, int, Sprite]] = []
+        unlayered : list[Sprite] = []
+        for order, sprite_class in enumerate(Sprite.registered_classes):
+            class_zindex : int|None = sprite_class.get_draw_zindex()
+            if class_zindex is None: unlayered.append(sprite_class)
+            else: layered.append((class_zindex, order, sprite_class))
+        layered.sort(key=lambda layer : layer[:2])
+        next_layer : int = 0
+        buckets = Sprite.render_order.buckets
+        for zindex in Sprite.render_order.order:
+            while next_layer < len(layered) and layered[next_layer][0] < zindex:
+                layered[next_layer][2].draw_class(batch)
+                next_layer += 1
+            for element in buckets[zindex]:
+                if element.batched_draw:
+                    batch.add(element.image, element.rect, element.blend_flags)
+                else:
+                    batch.add_callback(element.draw)
+        for _, _, sprite_class in layered[next_layer:]:
+            sprite_class.draw_class(batch)
+        for sprite_class in unlayered:
+            sprite_class.draw_class(batch)
+        if own_batch: batch.flush(display)
 
     
     @classmethod
@@ -352,7 +571,7 @@ class Sprite:
         if event.type == pygame.MOUSEBUTTONDOWN:
             if event.touch: return
             press_pos : tuple = event.pos
-            hit = [sprite for sprite in Sprite.active_elements if sprite.rect.collidepoint(press_pos)]
+            hit = [sprite for sprite in Sprite.active_elements if sprite._zindex is not None and sprite.rect.collidepoint(press_pos)]
             if len(hit) == 0: return
             hit.sort(key = lambda sprite : sprite.zindex)
             new_event = pygame.event.Event(Sprite.SPRITE_CLICKED, {'main_hit' : hit[-1], 'all_hit' : hit, 'pos' : press_pos,
@@ -365,7 +584,7 @@ class Sprite:
             x = event.x * core_object.main_display.get_width()
             y = event.y * core_object.main_display.get_height()
             press_pos : tuple[int, int] = (round(x), round(y))
-            hit = [sprite for sprite in Sprite.active_elements if sprite.rect.collidepoint(press_pos)]
+            hit = [sprite for sprite in Sprite.active_elements if sprite._zindex is not None and sprite.rect.collidepoint(press_pos)]
             if len(hit) == 0: return
             hit.sort(key = lambda sprite : sprite.zindex)
             new_event = pygame.event.Event(Sprite.SPRITE_CLICKED, {'main_hit' : hit[-1], 'all_hit' : hit, 'pos' : press_pos,
@@ -4,6 +4,7 @@ from core.core import core_object
 
 from utils.animation import Animation
 from utils.pivot_2d import Pivot2D
+from utils.rotation_cache import rotation_cache
 
 
 class TestPlayer(Sprite):
@@ -30,16 +31,32 @@ class TestPlayer(Sprite):
         surfaces[color] = image
         surface_list.append(image)
 
+    @classmethod
+    def get_rotated_images(cls) -> list[tuple[pygame.Surface, tuple|list]]:
+        '''Every (image, colorkey) pair the pivot rotates : the base image (Q and E rotate it freely)
+        and the images the test animation switches to, with the colorkey it gives them.'''
+        sources : dict[str, dict[str, pygame.Surface]|list[pygame.Surface]] = {'color_images' : cls.surfaces, 'color_image_list' : cls.surface_list}
+        images : list[tuple[pygame.Surface, tuple|list]] = [(cls.test_image, (0, 255, 0))]
+        for instruction in cls.test_anim.program.source:
+            if not instruction.get('colorkey'): continue
+            source = sources[instruction['source']]
+            if instruction['type'] == 'switch_image':
+                images.append((source[instruction['index']], instruction['colorkey']))
+            elif instruction['type'] == 'image_gradient':
+                images.extend((image, instruction['colorkey']) for image in source[:instruction['target_index'] + 1])
+        return images
+
     def __init__(self) -> None:
         super().__init__()
         self.color_images : dict[str, pygame.Surface]
         self.color_image_list : list[pygame.Surface]
         self.last_mouse_pos : tuple[int, int]
-        TestPlayer.inactive_elements.append(self)
+        TestPlayer.add_to_pool(self)
 
     @classmethod
     def spawn(cls, new_pos : pygame.Vector2):
-        element = cls.inactive_elements[0]
+        element = cls.get_inactive()
+        if element is None: return None
 
         element.image = cls.test_image
         element.color_images = cls.surfaces
@@ -104,6 +121,7 @@ class TestPlayer(Sprite):
 
 TestPlayer()
 Sprite.register_class(TestPlayer)
+rotation_cache.prewarm_many(TestPlayer.get_rotated_images())
 
 def make_connections():
     core_object.event_manager.bind(pygame.MOUSEBUTTONDOWN, TestPlayer.receive_event)
@@ -49,6 +49,7 @@ core.settings.apply()
 core.menu.init()
 core.game.init()
 game_states.runtime_imports()
+Sprite.reserve_pools(core.storage.pool_sizes)
 
 clock = pygame.Clock()
 
@@ -58,25 +59,26 @@ async def main():
         for event in pygame.event.get():
             core.event_manager.process_event(event)
 
+        frame_batch = core.get_frame_batch()
         if core.game.active == False:
-            window.fill(core.menu.bg_color)
+            bg_color = core.menu.bg_color
+            if frame_batch is None: window.fill(bg_color)
             core.menu.update(core.dt)
-            core.menu.render(window)
+            core.menu.render(window, frame_batch)
         else:
-            core.game.state.main_logic(core.dt)
+            core.game.update(core.dt)
             ParticleEffect.update_all()
             
-            window.fill((94,129,162))    
-            Sprite.draw_all_sprites(window)
+            bg_color = (94,129,162)
+            if frame_batch is None: window.fill(bg_color)
+            Sprite.draw_all_sprites(window, frame_batch)
+            ParticleEffect.draw_all(window, frame_batch)
 
             core.main_ui.update()
-            core.main_ui.render(window)
+            core.main_ui.render(window, frame_batch)
 
         core.update()
-        if core.settings.brightness != 0:
-            window.blit(core.brightness_map, (0,0), special_flags=core.brightness_map_blend_mode)
-            
-        pygame.display.update()
+        core.present(window, bg_color)
         core.frame_counter += 1
         clock.tick(core.FPS)
         await asyncio.sleep(0)
@@ -0,0 +1,12 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+ROOT : str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT) #Assets are loaded relative to the project root, like when running main.py
+
+import pygame
+pygame.init()
+pygame.display.set_mode((1, 1))
@@ -0,0 +1,28 @@
+import pytest
+from utils.animation import validate_instruction, compile_animation
+
+WAIT = {'type': 'wait', 'time': 1}
+
+def test_delay_targets_must_come_before_the_delay():
+    compile_animation('ok', [WAIT, WAIT, {'type': 'delay', 'index': [0, 1]}, {'type': 'delay_rel', 'index': -2}])
+    for delay in ({'type': 'delay', 'index': 1}, {'type': 'delay', 'index': 2}, {'type': 'delay', 'index': [0, 2]},
+                  {'type': 'delay_rel', 'index': 0}, {'type': 'delay_rel', 'index': 1}):
+        with pytest.raises(ValueError, match='before the delay'):
+            validate_instruction('bad', 1, 3, delay)
+
+def test_delay_targets_must_exist():
+    for delay in ({'type': 'delay', 'index': 5}, {'type': 'delay_rel', 'index': -3}, {'type': 'delay', 'index': -1}):
+        with pytest.raises(ValueError, match='out of the animation'):
+            validate_instruction('bad', 2, 4, delay)
+    with pytest.raises(ValueError, match='list of integers'):
+        validate_instruction('bad', 2, 4, {'type': 'delay', 'index': 'first'})
+
+def test_templates_are_enforced():
+    with pytest.raises(ValueError, match='unknown type'):
+        validate_instruction('bad', 0, 1, {'type': 'teleport'})
+    with pytest.raises(ValueError, match='missing keys'):
+        validate_instruction('bad', 0, 1, {'type': 'wait'})
+    with pytest.raises(ValueError, match='unknown keys'):
+        validate_instruction('bad', 0, 1, {'type': 'wait', 'time': 1, 'speed': 2})
+    with pytest.raises(ValueError, match='easing style'):
+        validate_instruction('bad', 0, 1, {'type': 'slide_by', 'offset': [1, 1], 'time': 1, 'easing_style': 'bouncy'})
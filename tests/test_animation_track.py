@@ -0,0 +1,114 @@
+import json
+import os
+import pygame
+import pytest
+from game.sprite import Sprite
+from game import test_player
+from utils.animation import AnimationTrack, AnimationProgram, Animation
+from utils.pivot_2d import Pivot2D
+Sprite._core_hint() #Done by main.py at startup
+PlayerSprite = test_player.TestPlayer #Not imported under its own name, pytest would try to collect it
+
+TRACE_PATH : str = os.path.join(os.path.dirname(__file__), 'data', 'test_animation_trace.json')
+
+class Target:
+    '''The little of a sprite that movement instructions use.'''
+    def __init__(self) -> None:
+        self.active : bool = True
+        self.position : pygame.Vector2 = pygame.Vector2(0, 0)
+
+class Clock:
+    def __init__(self) -> None:
+        self.time : float = 0
+
+    def __call__(self) -> float:
+        return self.time
+
+def make_track(data : list[dict]) -> tuple[AnimationTrack, Target, Clock]:
+    target, clock = Target(), Clock()
+    track = AnimationTrack(target, data, 'test', clock)
+    track.play(update_manually=True)
+    return track, target, clock
+
+def run_until(track : AnimationTrack, clock : Clock, time : float, step : float = 0.05):
+    while clock.time < time - 1e-9:
+        clock.time = round(clock.time + step, 6)
+        track.update()
+
+def test_waits_block_and_timed_instructions_run_alongside():
+    track, target, clock = make_track([
+        {'type': 'move_by', 'offset': [1, 0]},
+        {'type': 'wait', 'time': 1},
+        {'type': 'slide_by', 'offset': [100, 0], 'time': 2, 'easing_style': 'linear'},
+        {'type': 'move_by', 'offset': [0, 5]},
+        {'type': 'delay_rel', 'index': -2},
+        {'type': 'move_by', 'offset': [0, 1000]},
+    ])
+    assert target.position == (1, 0) and track.cursor == 2
+    run_until(track, clock, 0.9)
+    assert target.position == (1, 0)
+    run_until(track, clock, 1.1)
+    assert target.position.y == 5 and track.cursor == 5 #The slide started, the move_by after it did not wait for it
+    run_until(track, clock, 2.1)
+    assert 40 < target.position.x < 60 and target.position.y == 5
+    run_until(track, clock, 3.5)
+    assert target.position == (101, 1005)
+    assert track.has_ended and track.progress == track.count
+
+def test_delays_wait_for_every_target():
+    track, target, clock = make_track([
+        {'type': 'slide_by', 'offset': [10, 0], 'time': 1, 'easing_style': 'linear'},
+        {'type': 'slide_by', 'offset': [0, 10], 'time': 2, 'easing_style': 'linear'},
+        {'type': 'move_by', 'offset': [5, 5]},
+        {'type': 'delay', 'index': [0, 1, 2]},
+        {'type': 'move_by', 'offset': [1000, 0]},
+    ])
+    run_until(track, clock, 1.5)
+    assert target.position.x == pytest.approx(15) and target.position.x < 1000
+    run_until(track, clock, 2.5)
+    assert target.position == (1015, 15) and track.has_ended
+def test_tracks_share_a_compiled_program():
+    program = AnimationProgram([{'type': 'wait', 'time': 1}, {'type': 'move_by', 'offset': [1, 1]}])
+    first, first_target, first_clock = make_track(program)
+    second, second_target, second_clock = make_track(program)
+    run_until(first, first_clock, 1.5)
+    assert first_target.position == (1, 1) and first.has_ended
+    assert second_target.position == (0, 0) and not second.has_ended
+    del second[0]
+    assert second.program is not program and len(program) == 2
+    second.play(update_manually=True)
+    assert second_target.position == (1, 1)
+
+def record_test_trace() -> list[list]:
+    '''Plays the 'test' animation on a test player (set up like TestPlayer.spawn, without a running game)
+    and samples its position, angle, image and rect every 10 frames at 60 fps.'''
+    element = PlayerSprite.get_inactive()
+    element.image = PlayerSprite.test_image
+    element.color_images = PlayerSprite.surfaces
+    element.color_image_list = PlayerSprite.surface_list
+    element.rect = element.image.get_rect()
+    element.position = pygame.Vector2(200, 200)
+    element.align_rect()
+    element.pivot = Pivot2D(element._position, element.image, (0, 255, 0))
+    element.pivot.pivot_offset = pygame.Vector2(0, 30)
+    PlayerSprite.unpool(element)
+    clock = Clock()
+    track = Animation.get_animation('test').load(element, clock)
+    track.play(update_manually=True)
+    trace : list[list] = []
+    for frame in range(60 * 20):
+        clock.time = frame / 60
+        track.update()
+        if frame % 10: continue
+        source : pygame.Surface = element.pivot.original_image #element.image is its rotated copy
+        image_index : int = PlayerSprite.surface_list.index(source) if source in PlayerSprite.surface_list else -1
+        trace.append([round(element.position.x, 3), round(element.position.y, 3), round(element.angle, 3), image_index,
+                      list(element.rect), track.has_ended])
+    element.kill_instance()
+    return trace
+
+def test_test_animation_matches_the_recorded_trace():
+    '''Recorded before the scheduler rewrite : the 'test' animation must keep moving the player exactly the same way.'''
+    with open(TRACE_PATH) as file:
+        expected : list[list] = json.load(file)
+    assert record_test_trace() == expected
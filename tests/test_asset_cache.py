@@ -0,0 +1,52 @@
+import json
+from utils.asset_cache import load_compiled, load_compiled_dir, get_cache_path
+
+class Compiler:
+    def __init__(self) -> None:
+        self.calls : int = 0
+
+    def __call__(self, raw):
+        self.calls += 1
+        return {'doubled' : [value * 2 for value in raw]}
+
+def test_compiled_assets_are_cached_until_the_source_changes(tmp_path):
+    source = tmp_path / 'asset.json'
+    source.write_text(json.dumps([1, 2]))
+    compiler = Compiler()
+    assert load_compiled(str(source), compiler) == {'doubled' : [2, 4]}
+    assert load_compiled(str(source), compiler) == {'doubled' : [2, 4]}
+    assert compiler.calls == 1
+    source.write_text(json.dumps([3]))
+    assert load_compiled(str(source), compiler) == {'doubled' : [6]}
+    assert compiler.calls == 2
+    load_compiled(str(source), compiler, version=2)
+    assert compiler.calls == 3
+
+def test_broken_caches_are_rebuilt(tmp_path):
+    source = tmp_path / 'asset.json'
+    source.write_text(json.dumps([5]))
+    compiler = Compiler()
+    with open(get_cache_path(str(source)), 'wb') as file:
+        file.write(b'not a pickle')
+    assert load_compiled(str(source), compiler) == {'doubled' : [10]}
+    assert load_compiled(str(source), compiler) == {'doubled' : [10]}
+    assert compiler.calls == 1
+
+def test_directories_are_compiled_together(tmp_path):
+    directory = tmp_path / 'animations'
+    directory.mkdir()
+    (directory / 'a.json').write_text(json.dumps([1]))
+    (directory / 'b.json').write_text(json.dumps([2]))
+    (directory / 'notes.txt').write_text('ignored')
+    calls : list[dict] = []
+    def compile_library(raw : dict) -> dict:
+        calls.append(raw)
+        return {name : sum(values) for name, values in raw.items()}
+    assert load_compiled_dir(str(directory), compile_library) == {'a' : 1, 'b' : 2}
+    assert load_compiled_dir(str(directory), compile_library) == {'a' : 1, 'b' : 2}
+    assert len(calls) == 1
+    (directory / 'b.json').rename(directory / 'c.json') #Same contents under another name
+    assert load_compiled_dir(str(directory), compile_library) == {'a' : 1, 'c' : 2}
+    (directory / 'a.json').unlink()
+    assert load_compiled_dir(str(directory), compile_library) == {'c' : 2}
+    assert len(calls) == 3
@@ -0,0 +1,27 @@
+import pygame
+import pytest
+from utils.batch_collision import np, get_circle_mask, confirm_circle_hits, query_circles
+
+pytestmark = pytest.mark.skipif(np is None, reason='batched collisions need NumPy')
+
+def test_circle_masks_are_centered_on_the_rounded_center():
+    target = pygame.mask.Mask((1, 1), fill=True)
+    for radius in (1.4, 1.6, 2.5, 2.6, 5.3):
+        rounded : int = max(1, round(radius))
+        for center in (100.0, 100.4, 100.6, 101.5):
+            pixel = pygame.Rect(round(center), round(center), 1, 1)
+            assert confirm_circle_hits(target, pixel, [(center, center)], [radius], [0]) == [0]
+            #The circle spans rounded pixels on each side of its center (one less on the right and bottom)
+            beyond = pygame.Rect(round(center) + rounded, round(center), 1, 1)
+            assert confirm_circle_hits(target, beyond, [(center, center)], [radius], [0]) == []
+    assert get_circle_mask(2.6) is get_circle_mask(3)
+
+def test_query_circles_broadphase_and_mask():
+    rect = pygame.Rect(0, 0, 20, 20)
+    centers = np.array([[10.0, 10.0], [40.0, 10.0], [24.0, 24.0], [-3.0, 10.0]])
+    radii = np.array([2.0, 5.0, 6.0, 4.0])
+    assert query_circles(None, rect, centers, radii) == [0, 2, 3]
+    left_column = pygame.mask.Mask(rect.size)
+    left_column.draw(pygame.mask.Mask((2, 20), fill=True), (0, 0))
+    assert query_circles(left_column, rect, centers, radii) == [3]
+    assert query_circles(left_column, rect, np.zeros((0, 2)), np.zeros(0)) == []
@@ -0,0 +1,39 @@
+import gc
+import pygame
+from core.dirty_renderer import DirtyRenderer
+from utils.render_batch import RenderBatch, SurfaceVersions, surface_versions
+
+def present(renderer : DirtyRenderer, display : pygame.Surface, blits : list[tuple[pygame.Surface, tuple[int, int]]]) -> list[pygame.Rect]:
+    batch = RenderBatch()
+    batch.add_many(blits)
+    return renderer.present(display, batch, 'Black')
+
+def test_only_changed_regions_are_redrawn():
+    display = pygame.Surface((200, 200))
+    renderer = DirtyRenderer()
+    still, moving = pygame.Surface((10, 10)), pygame.Surface((10, 10))
+    assert present(renderer, display, [(still, (0, 0)), (moving, (50, 50))]) == [display.get_rect()]
+    assert present(renderer, display, [(still, (0, 0)), (moving, (50, 50))]) == []
+    assert present(renderer, display, [(still, (0, 0)), (moving, (55, 50))]) == [pygame.Rect(50, 50, 15, 10)]
+
+def test_surfaces_drawn_in_place_are_redrawn_once_bumped():
+    display = pygame.Surface((200, 200))
+    renderer = DirtyRenderer()
+    label = pygame.Surface((20, 10))
+    present(renderer, display, [(label, (30, 30))])
+    label.fill('White')
+    surface_versions.bump(label)
+    assert present(renderer, display, [(label, (30, 30))]) == [pygame.Rect(30, 30, 20, 10)]
+    assert display.get_at((35, 35)) == pygame.Color('White')
+    assert present(renderer, display, [(label, (30, 30))]) == []
+
+def test_surface_versions_drop_dead_surfaces():
+    versions = SurfaceVersions()
+    surf = pygame.Surface((4, 4))
+    assert versions.get(surf) == 0
+    versions.bump(surf)
+    versions.bump(surf)
+    assert versions.get(surf) == 2 and len(versions) == 1
+    del surf
+    gc.collect()
+    assert len(versions) == 0
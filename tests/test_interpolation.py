@@ -0,0 +1,35 @@
+import math
+import pytest
+from utils import interpolation
+from utils.interpolation import EasingTable, Easings
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def test_table_interpolates_between_samples():
+    table = EasingTable(lambda t : t * t, resolution=4)
+    assert table.values == [0, 1 / 16, 1 / 4, 9 / 16, 1]
+    assert table(0.125) == pytest.approx(1 / 32)
+    assert table(0.5) == pytest.approx(0.25)
+    assert table(-1) == 0 and table(2) == 1
+    sine = EasingTable(lambda t : math.sin(t * math.pi / 2))
+    assert max(abs(sine(i / 997) - math.sin(i / 997 * math.pi / 2)) for i in range(998)) < 1e-6
+
+@pytest.mark.skipif(np is None, reason='vectorized easing needs NumPy')
+def test_vectorized_easing_matches_the_scalar_functions():
+    alphas = np.linspace(-0.5, 1.5, 41)
+    table = EasingTable(interpolation.cubic_ease_out, resolution=256)
+    assert np.allclose(table.get_many(alphas), [table(alpha) for alpha in alphas])
+    inside = np.linspace(0, 1, 33)
+    for name, func in Easings.functions.items():
+        assert np.allclose(Easings.ease_many(name, inside), [func(alpha) for alpha in inside], atol=1e-5), name
+    unregistered = lambda t : t ** 0.5
+    assert np.allclose(Easings.ease_many(unregistered, inside), np.sqrt(inside), atol=1e-3)
+
+def test_registry_lookups():
+    assert Easings.get('smoothstep') is interpolation.smoothstep
+    assert Easings.get_name(interpolation.mirror) == 'mirror'
+    assert Easings.get_table('linear') is Easings.get_table(interpolation.linear)
+    with pytest.raises(KeyError):
+        Easings.get('bouncy')
@@ -0,0 +1,35 @@
+import gc
+import pygame
+from utils.mask_cache import MaskCache
+
+def test_masks_are_shared_per_surface():
+    cache = MaskCache()
+    surf = pygame.Surface((8, 8), pygame.SRCALPHA)
+    surf.fill((255, 0, 0, 255), (0, 0, 4, 8))
+    mask = cache.get(surf)
+    assert cache.get(surf) is mask and mask.count() == 32
+    assert cache.hit_count == 1 and cache.miss_count == 1
+
+def test_least_recently_used_entries_are_evicted():
+    cache = MaskCache(max_entries=2)
+    first, second, third = (pygame.Surface((4, 4)) for _ in range(3))
+    first_mask = cache.get(first)
+    cache.get(second)
+    cache.get(first)
+    cache.get(third)
+    assert len(cache) == 2
+    assert cache.get(first) is first_mask
+    cache.get(second)
+    assert cache.miss_count == 4
+
+def test_dead_surfaces_drop_their_masks():
+    cache = MaskCache()
+    kept, dropped = pygame.Surface((4, 4)), pygame.Surface((4, 4))
+    cache.get(kept)
+    cache.get(dropped)
+    del dropped
+    gc.collect()
+    assert len(cache) == 1
+    kept.fill('White')
+    cache.invalidate(kept)
+    assert len(cache) == 0 and cache.get(kept).count() == 16
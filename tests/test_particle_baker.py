@@ -0,0 +1,75 @@
+import json
+import pygame
+import pytest
+from utils.particle_baker import pack_frames, bake_effect
+from utils.particle_effects import ParticleEffect, BakedEffect, BakedFlipbook, load_baked_effects, get_descriptor_key
+from utils.render_batch import RenderBatch
+
+def test_pack_frames_does_not_overlap():
+    sizes = [(10, 20), (30, 5), (0, 0), (15, 15), (40, 12), (8, 8)]
+    positions, (width, height) = pack_frames(sizes, 64)
+    rects = [pygame.Rect(position, size) for position, size in zip(positions, sizes) if size[0] and size[1]]
+    for index, rect in enumerate(rects):
+        assert pygame.Rect(0, 0, width, height).contains(rect)
+        assert rect.collidelist(rects[index + 1:]) == -1
+
+def test_pack_frames_respects_the_size_cap():
+    with pytest.raises(ValueError):
+        pack_frames([(50, 50)] * 10, 64)
+    with pytest.raises(ValueError):
+        pack_frames([(100, 10)], 64)
+
+def test_baked_flipbook_loads_lazily_and_uses_frame_offsets(tmp_path):
+    sheet = pygame.Surface((6, 4), pygame.SRCALPHA)
+    sheet.fill((255, 0, 0, 255), (0, 0, 4, 4))
+    sheet.fill((0, 255, 0, 255), (4, 0, 2, 2))
+    pygame.image.save(sheet, str(tmp_path / 'sheet.png'))
+    baked = BakedEffect(name='sheet', source_key='', sheet=str(tmp_path / 'sheet.png'),
+                        frames=((0, 0, 4, 4, -2, -2), (0, 0, 0, 0, 0, 0), (4, 0, 2, 2, 5, 1)), frame_rate=10, premultiplied=False)
+    flipbook = BakedFlipbook(baked)
+    assert flipbook.frames is None
+    flipbook.load()
+    assert [None if frame is None else frame.get_size() for frame in flipbook.frames] == [(4, 4), None, (2, 2)]
+    for elapsed, expected in ((0.05, [(8, 8)]), (0.15, []), (0.25, [(15, 11)])):
+        batch = RenderBatch()
+        flipbook.draw(batch, pygame.Vector2(10, 10), elapsed)
+        assert [tuple(dest) for _, dest, *_ in batch.iter_blits()] == expected
+    assert flipbook.is_over(0.3)
+
+def test_baked_frames_are_cropped_to_their_particles(tmp_path):
+    info = bake_effect(ParticleEffect.descriptors['test2'], frame_rate=30, max_duration=0.5, sheet_dir=str(tmp_path))
+    sheet_rect = pygame.image.load(info.sheet).get_rect()
+    assert len(info.frames) == 15
+    for x, y, width, height, _, _ in info.frames:
+        assert sheet_rect.contains((x, y, width, height))
+        assert width < 512 and height < 512
+
+def test_stale_bakes_are_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(ParticleEffect, 'flipbooks', {})
+    frames = [[0, 0, 4, 4, -2, -2]]
+    entry = {'name' : 'test2', 'source_key' : get_descriptor_key(ParticleEffect.descriptors['test2']), 'sheet' : 'sheet.png',
+             'frames' : frames, 'frame_rate' : 30, 'premultiplied' : True}
+    current_key : str = get_descriptor_key(ParticleEffect.descriptors['test'])
+    entries = [entry, {**entry, 'name' : 'test', 'source_key' : current_key + 'old'},
+               {key : value for key, value in entry.items() if key != 'premultiplied'} | {'name' : 'test', 'source_key' : current_key}]
+    (tmp_path / 'baked.json').write_text(json.dumps(entries))
+    load_baked_effects(str(tmp_path / 'baked.json'))
+    assert list(ParticleEffect.flipbooks) == ['test2']
+    fresh = ParticleEffect.load_effect('test2')
+    stale = ParticleEffect.load_effect('test')
+    assert isinstance(fresh.flipbook, BakedFlipbook) and stale.flipbook is None
+    fresh.destroy()
+    stale.destroy()
+
+def test_editing_an_effect_invalidates_its_bake(tmp_path, monkeypatch):
+    monkeypatch.setattr(ParticleEffect, 'flipbooks', {})
+    descriptor = ParticleEffect.descriptors['test2']
+    entry = {'name' : 'test2', 'source_key' : get_descriptor_key(descriptor), 'sheet' : 'sheet.png',
+             'frames' : [[0, 0, 4, 4, -2, -2]], 'frame_rate' : 30, 'premultiplied' : True}
+    (tmp_path / 'baked.json').write_text(json.dumps([entry]))
+    monkeypatch.setitem(ParticleEffect.descriptors, 'test2', descriptor._replace(lifetime=(0.5, 1.0)))
+    load_baked_effects(str(tmp_path / 'baked.json'))
+    assert ParticleEffect.flipbooks == {}
+    effect = ParticleEffect.load_effect('test2')
+    assert effect.flipbook is None
+    effect.destroy()
@@ -0,0 +1,174 @@
+import pygame
+import pytest
+from game.sprite import Sprite
+Sprite._core_hint() #Done by main.py at startup
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.particle_effects import ParticleEffect, ParticleBudget, Particle, TEMPLATE
+
+pytestmark = pytest.mark.skipif(np is None, reason='array backed particles need NumPy')
+
+class FrameClock:
+    def __init__(self) -> None:
+        self.now : float = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def budget(monkeypatch):
+    budget = ParticleBudget()
+    monkeypatch.setattr(ParticleEffect, 'budget', budget)
+    return budget
+
+def make_effect(use_arrays : bool = True, seed : int|None = 3, **fields) -> ParticleEffect:
+    effect = ParticleEffect({**TEMPLATE, **fields}, False)
+    effect.use_arrays = use_arrays
+    effect.set_seed(seed)
+    return effect
+
+def get_centers(track) -> list[tuple[float, float]]:
+    if track.particles is not None: return sorted(map(tuple, track.particles.get_centers().tolist()))
+    return sorted((particle.position.x, particle.position.y) for particle in track.active)
+
+def run_frames(effect : ParticleEffect, frames : int) -> list[list[tuple[float, float]]]:
+    '''Plays effect and steps it one frame at a time like the game does, recording where its particles are after each frame.'''
+    clock = FrameClock()
+    track = effect.play(pygame.Vector2(30, 270), time_source=clock)
+    history : list[list[tuple[float, float]]] = []
+    for _ in range(frames):
+        clock.now += 1 / 64
+        for particle in list(track.active): particle.update(1)
+        Particle.clear_zombies(list(track.active))
+        effect.update_particles(1)
+        effect.update()
+        history.append(get_centers(track))
+    for particle in list(track.active): particle.kill_instance()
+    effect.destroy()
+    return history
+
+def test_array_backend_matches_sprite_particles(budget):
+    fields = dict(velocity_x=[-8, 3], velocity_y=[-3, 3], accel_y=[0, 0.2], drag=[0, 0.05], lifetime=[0.2, 0.9], angle=None,
+                  init_spawn_count=20, part_per_wave=6, cooldown=0.1, target_spawn_count=80, destroy_offscreen=True)
+    arrays = run_frames(make_effect(True, **fields), 140)
+    sprites = run_frames(make_effect(False, **fields), 140)
+    counts = [len(frame) for frame in arrays]
+    assert counts == [len(frame) for frame in sprites]
+    assert counts[11] < 20 + 6 #Only offscreen particles died before the first ones expire, once a single wave was emitted
+    assert max(counts) > 20 and counts[-1] == 0
+    for array_frame, sprite_frame in zip(arrays, sprites):
+        assert np.allclose(np.array(array_frame).reshape(-1, 2), np.array(sprite_frame).reshape(-1, 2), atol=1e-6)
+
+def test_identical_seeds_give_identical_waves(budget):
+    waves = []
+    for seed in (11, 11, 12):
+        effect = make_effect(seed=seed, offset_x=[-50, 50], velocity_x=[-2, 2], lifetime=[1, 3], init_spawn_count=16)
+        track = effect.play(pygame.Vector2(100, 100), time_source=FrameClock())
+        waves.append((track.particles.positions[:16].copy(), track.particles.velocities[:16].copy(), track.particles.expire_times[:16].copy()))
+        effect.destroy()
+    assert all(np.array_equal(first, second) for first, second in zip(waves[0], waves[1]))
+    assert not np.array_equal(waves[0][0], waves[2][0])
+
+def test_sampler_stays_in_range_and_skips_unset_fields():
+    effect = make_effect(offset_x=[-5, 5], offset_y=2, velocity_x=None, lifetime=[1, 2])
+    values = effect.sampler.sample(np.random.default_rng(0), 200)
+    effect.destroy()
+    assert values['velocity_x'] is None
+    assert values['offset_x'].min() >= -5 and values['offset_x'].max() <= 5
+    assert np.all(values['offset_y'] == 2)
+    assert values['lifetime'].min() >= 1 and values['lifetime'].max() <= 2
+    assert set(values) == set(effect.sampler.fields)
+
+def test_waves_respect_part_per_wave_and_target_count(budget):
+    clock = FrameClock()
+    effect = make_effect(lifetime=10, init_spawn_count=3, part_per_wave=4, cooldown=0.1, target_spawn_count=13)
+    track = effect.play(pygame.Vector2(100, 100), time_source=clock)
+    counts = [len(track.particles)]
+    for elapsed in (0.05, 0.125, 0.25, 0.5, 0.75):
+        clock.now = elapsed
+        effect.update()
+        counts.append(len(track.particles))
+    effect.destroy()
+    assert counts == [3, 3, 7, 11, 13, 13]
+    assert track.total_count == 13
+
+def check_track_slots(track):
+    for index, particle in enumerate(track.active):
+        assert particle.track is track and particle._track_slot == index and particle.active
+
+def test_finished_track_releases_its_particles_for_reuse(budget):
+    clock = FrameClock()
+    effect = make_effect(False, lifetime=0.1, init_spawn_count=5, target_spawn_count=5, destroy_offscreen=False)
+    first = effect.play(pygame.Vector2(100, 100), time_source=clock)
+    first_particles = list(first.active)
+    check_track_slots(first)
+    clock.now = 0.2
+    for particle in list(first.active): particle.update(1)
+    Particle.clear_zombies(list(first.active))
+    effect.update()
+    assert first.ended and first not in effect.tracks
+    assert first.active == [] and all(particle.track is None and not particle.active for particle in first_particles)
+
+    second = effect.play(pygame.Vector2(100, 100), time_source=clock)
+    assert {id(particle) for particle in second.active} == {id(particle) for particle in first_particles}
+    check_track_slots(second)
+    second.active[1].kill_instance()
+    assert first.active == [] and len(second.active) == 4
+    check_track_slots(second)
+    second.cleanup()
+    Particle.clear_zombies(list(second.active))
+    assert second.get_live_count() == 0 and first.get_live_count() == 0
+    effect.destroy()
+
+def test_array_tracks_keep_their_particles_apart(budget):
+    effect = make_effect(lifetime=10, init_spawn_count=6)
+    first = effect.play(pygame.Vector2(100, 100), time_source=FrameClock())
+    second = effect.play(pygame.Vector2(300, 100), time_source=FrameClock())
+    assert first.particles is not second.particles
+    first.cleanup()
+    assert first.get_live_count() == 0 and second.get_live_count() == 6
+    effect.destroy()
+
+@pytest.fixture
+def reports(monkeypatch):
+    messages : list[str] = []
+    monkeypatch.setattr(ParticleBudget, 'report', lambda self, message : messages.append(message))
+    return messages
+
+def test_level_of_detail_follows_frame_time(reports):
+    budget = ParticleBudget(target_frame_time=1.15, settle_frames=2)
+    levels = []
+    for frame_time in [2] * 8 + [0.5] * 8:
+        budget.begin_frame(frame_time, 0, [])
+        levels.append(budget.level)
+    assert levels == [0, 1, 1, 2, 2, 3, 3, 3, 2, 2, 1, 1, 0, 0, 0, 0]
+    budget.begin_frame(1, 0, [])
+    assert budget.level == 0
+
+def test_critical_effects_are_never_throttled_nor_capped(reports):
+    budget = ParticleBudget(max_live=10, emission_budget=5)
+    critical = make_effect(critical=True, priority=0)
+    regular = make_effect(priority=0)
+    budget.level = ParticleBudget.max_level
+    assert budget.get_wave_size(critical, 8) == 8 and budget.get_cooldown(critical, 0.25) == 0.25
+    assert budget.get_wave_size(regular, 8) == 0
+    assert budget.allow(regular, 8) == 5
+    assert budget.allow(critical, 8) == 8
+    assert budget.allow(regular, 8) == 0
+    critical.destroy()
+    regular.destroy()
+
+def test_throttles_are_reported_per_effect(reports):
+    budget = ParticleBudget(settle_frames=1)
+    effects = [make_effect(priority=priority) for priority in (0, 0, 1, 2)] + [make_effect(critical=True)]
+    budget.begin_frame(2, 0, effects)
+    budget.begin_frame(2, 0, effects)
+    assert reports[-1].endswith(': 3 halved, 2 slowed down, 0 skipped')
+    budget.begin_frame(2, 0, effects)
+    assert reports[-1].endswith(': 2 halved, 1 slowed down, 2 skipped')
+    effects.pop(0).destroy()
+    budget.begin_frame(2, 0, effects)
+    assert reports[-1].endswith(': 2 halved, 1 slowed down, 1 skipped')
+    for effect in effects: effect.destroy()
@@ -0,0 +1,68 @@
+import gc
+import pygame
+import pytest
+from game.sprite import Sprite
+Sprite._core_hint() #Done by main.py at startup
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.particle_textures import VariantSpec, TextureVariants, TextureRegistry, ParticleFlipbook, texture_registry
+from utils.particle_effects import ParticleEffect, TEMPLATE
+
+def make_texture() -> pygame.Surface:
+    texture = pygame.Surface((4, 4), pygame.SRCALPHA)
+    texture.fill((255, 255, 255, 255))
+    return texture
+
+def test_registry_shares_variants_and_forgets_dropped_textures():
+    registry = TextureRegistry()
+    texture = make_texture()
+    spec = VariantSpec(4, fade=(255, 0))
+    variants = registry.get_variants(texture, spec)
+    assert registry.get_variants(texture, spec) is variants
+    assert registry.get_variants(texture, VariantSpec(4, fade=(255, 128))) is not variants
+    assert registry.get_variants(make_texture(), spec) is not variants
+    del texture, variants
+    gc.collect()
+    assert len(registry.variants) == 0
+
+def test_copied_textures_share_the_variants_of_their_source():
+    texture = make_texture()
+    data = {**TEMPLATE, 'main_texture' : texture, 'copy_surface' : True, 'tint' : [[255, 0, 0], [0, 0, 255]], 'variant_steps' : 4}
+    first = ParticleEffect(data, False)
+    second = ParticleEffect(data, False)
+    assert first.main_texture is not second.main_texture
+    assert first.variants is second.variants
+    assert len(texture_registry.variants[texture]) == 1
+    first.destroy()
+    second.destroy()
+
+def test_variant_index_follows_age():
+    variants = TextureVariants(make_texture(), VariantSpec(4, scale=(1, 2)))
+    assert [variants.index_at(age) for age in (-0.5, 0, 0.24, 0.25, 0.6, 0.99, 1, 3)] == [0, 0, 0, 1, 2, 3, 3, 3]
+    assert [surf.get_width() for surf in variants.surfaces] == [4, 5, 7, 8]
+
+@pytest.mark.skipif(np is None, reason='array backed particles need NumPy')
+def test_array_particles_show_the_variant_of_their_age():
+    effect = ParticleEffect({**TEMPLATE, 'fade' : [255, 0], 'variant_steps' : 4}, False)
+    arrays = effect.new_particle_arrays()
+    for birth_time in (0, 0.5, 1):
+        arrays.spawn(pygame.Vector2(10, 10), pygame.Vector2(0, 0), pygame.Vector2(0, 0), 0, birth_time + 2, False, birth_time=birth_time)
+    assert arrays.get_frame_indices(1).tolist() == [2, 1, 0]
+    assert arrays.get_frame_indices(2.75).tolist() == [3, 3, 3]
+    effect.destroy()
+
+@pytest.mark.parametrize('loop, expected', [(True, [0, 0, 1, 2, 0, 1, 0]), (False, [0, 0, 1, 2, 2, 2, 2])])
+def test_flipbook_frame_follows_age(loop, expected):
+    flipbook = ParticleFlipbook([pygame.Surface((size, size)) for size in (2, 4, 6)], 0.1, loop=loop)
+    ages = [-0.05, 0.05, 0.15, 0.25, 0.35, 0.45, 0.65]
+    assert [flipbook.index_at(age) for age in ages] == expected
+    if np is not None: assert flipbook.get_indices(np.array(ages)).tolist() == expected
+    assert flipbook.half_sizes == [(1, 1), (2, 2), (3, 3)]
+
+def test_flipbook_frame_duration_sets_the_frame_rate():
+    frames = [pygame.Surface((2, 2)) for _ in range(4)]
+    assert ParticleFlipbook(frames, 0.05).index_at(0.125) == 2
+    assert ParticleFlipbook(frames, 0.25).index_at(0.125) == 0
+    assert ParticleFlipbook(frames, 0.25).index_at(0.8) == 3
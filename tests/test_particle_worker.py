@@ -0,0 +1,108 @@
+import gc
+import pygame
+import pytest
+from multiprocessing.shared_memory import SharedMemory
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.particle_arrays import ParticleArrays
+from utils.particle_worker import ParticleWorker, SharedParticleArrays
+
+pytestmark = pytest.mark.skipif(not ParticleWorker.is_supported(), reason='the particle worker needs NumPy and fork')
+
+IMAGE = pygame.Surface((4, 4))
+BOX = pygame.Rect(0, 0, 200, 200)
+
+@pytest.fixture
+def worker():
+    worker = ParticleWorker()
+    worker.start()
+    yield worker
+    worker.stop()
+
+def spawn_rows(arrays : ParticleArrays, amount : int, seed : int = 0):
+    '''Spawns particles that move, slow down, expire and leave the bounding box at different frames.'''
+    rng = np.random.default_rng(seed)
+    arrays.spawn_many(rng.random((amount, 2)) * 200, (rng.random((amount, 2)) - 0.5) * 20, np.tile((0, 0.5), (amount, 1)),
+                      rng.random(amount) * 0.1, rng.random(amount) * 0.5, True)
+
+def is_unlinked(name : str) -> bool:
+    try:
+        block = SharedMemory(name)
+    except FileNotFoundError:
+        return True
+    block.close()
+    return False
+
+def test_worker_steps_match_in_process_updates(worker):
+    local = ParticleArrays('simulated', IMAGE, BOX)
+    shared = SharedParticleArrays(worker, 'simulated', IMAGE, BOX)
+    spawn_rows(local, 40)
+    spawn_rows(shared, 40)
+    for frame in range(20):
+        local.update(1, frame / 60)
+        shared.update(1, frame / 60)
+        worker.sync()
+    worker.wait_step()
+    assert 0 < len(shared) == len(local) < 40
+    assert np.array_equal(shared.positions[:shared.count], local.positions[:local.count])
+    assert np.array_equal(shared.velocities[:shared.count], local.velocities[:local.count])
+
+def test_staged_rows_grow_the_shared_buffers(worker):
+    local = ParticleArrays('simulated', IMAGE, BOX, capacity=4)
+    shared = SharedParticleArrays(worker, 'simulated', IMAGE, BOX, capacity=4)
+    first_blocks = [block.name for block in shared.blocks]
+    for frame in range(6):
+        spawn_rows(local, 10, seed=frame)
+        spawn_rows(shared, 10, seed=frame)
+        local.update(1, frame / 60)
+        shared.update(1, frame / 60)
+        worker.sync()
+    worker.wait_step()
+    assert shared.capacity >= len(shared) > 4
+    assert len(shared) == len(local)
+    assert np.array_equal(shared.positions[:shared.count], local.positions[:local.count])
+    worker.sync()
+    assert all(is_unlinked(name) for name in first_blocks)
+
+def test_clear_drops_the_step_in_flight(worker):
+    shared = SharedParticleArrays(worker, 'simulated', IMAGE, BOX)
+    spawn_rows(shared, 10)
+    shared.update(1, 0)
+    worker.sync()
+    assert worker.is_in_flight(shared)
+    shared.clear()
+    worker.wait_step()
+    assert len(shared) == 0
+    spawn_rows(shared, 5)
+    shared.update(1, 0)
+    worker.sync()
+    worker.wait_step()
+    assert len(shared) == 5
+
+def test_to_local_keeps_every_particle_and_releases_the_blocks(worker):
+    shared = SharedParticleArrays(worker, 'simulated', IMAGE, BOX)
+    spawn_rows(shared, 10)
+    shared.update(1, 0)
+    worker.sync()
+    worker.wait_step()
+    spawn_rows(shared, 3, seed=1)
+    local = shared.to_local()
+    assert type(local) is ParticleArrays and len(local) == len(shared) == 13
+    assert np.array_equal(local.positions[:shared.count], shared.positions[:shared.count])
+    names = [block.name for block in shared.blocks]
+    del shared
+    gc.collect()
+    worker.sync()
+    assert all(is_unlinked(name) for name in names)
+
+def test_stop_releases_live_blocks(worker):
+    shared = SharedParticleArrays(worker, 'spiral', IMAGE, BOX)
+    spawn_rows(shared, 10)
+    shared.update(1, 0)
+    worker.sync()
+    names = [block.name for block in shared.blocks]
+    worker.stop()
+    assert not worker.is_running()
+    assert all(is_unlinked(name) for name in names)
@@ -0,0 +1,51 @@
+import pygame
+import pytest
+from game.projectile_engine import ProjectileEngine
+
+def make_engine() -> ProjectileEngine:
+    return ProjectileEngine(pygame.Rect(0, 0, 200, 200), capacity=4)
+
+def test_handle_vectors_write_through():
+    engine = make_engine()
+    handle = engine.spawn(pygame.Vector2(10, 20), pygame.Surface((4, 4)), velocity=(1, 2))
+    handle.velocity.x = 3
+    handle.position += pygame.Vector2(5, 5)
+    handle.acceleration[1] = 0.5
+    assert tuple(engine.velocities[handle.index]) == (3, 2)
+    assert tuple(engine.positions[handle.index]) == (15, 25)
+    assert tuple(engine.accelerations[handle.index]) == (0, 0.5)
+    assert pygame.Vector2(handle.position) == pygame.Vector2(15, 25)
+    kept = handle.position.copy()
+    handle.position.y = 0
+    assert kept == pygame.Vector2(15, 25)
+
+def test_stale_handles_raise():
+    engine = make_engine()
+    handle = engine.spawn(pygame.Vector2(10, 10), pygame.Surface((4, 4)))
+    vector = handle.position
+    handle.kill_instance()
+    reused = engine.spawn(pygame.Vector2(50, 50), pygame.Surface((6, 6)))
+    assert reused.index == handle.index
+    for read in (lambda : handle.rect, lambda : handle.position, lambda : vector.x, lambda : handle.image):
+        with pytest.raises(LookupError):
+            read()
+    handle.kill_instance_safe()
+    assert reused.active and reused.rect.center == (50, 50)
+
+def test_slots_grow_and_recycle():
+    engine = make_engine()
+    handles = [engine.spawn(pygame.Vector2(10, 10), pygame.Surface((4, 4))) for _ in range(10)]
+    assert engine.capacity >= 10 and len(engine) == 10
+    handles[3].velocity.x = 7 #Views resolve the row on every access, so they survive the arrays being reallocated
+    engine.grow(64)
+    assert handles[3].velocity.x == 7
+
+def test_update_culls_offscreen_and_expired():
+    engine = make_engine()
+    leaving = engine.spawn(pygame.Vector2(190, 100), pygame.Surface((4, 4)), velocity=(20, 0))
+    kept = engine.spawn(pygame.Vector2(190, 100), pygame.Surface((4, 4)), velocity=(20, 0), kill_offscreen=False)
+    expiring = engine.spawn(pygame.Vector2(100, 100), pygame.Surface((4, 4)), lifetime=1, current_time=0)
+    engine.update(1, 0.5)
+    assert not leaving.active and kept.active and expiring.active
+    engine.update(1, 1.5)
+    assert not expiring.active and kept.active
@@ -0,0 +1,34 @@
+from utils.render_order import RenderOrder
+
+class Item:
+    def __init__(self, name : str) -> None:
+        self.name : str = name
+        self._render_z : int|None = None
+        self._render_slot : int = -1
+
+def names(order : RenderOrder) -> list[str]:
+    return [item.name for item in order]
+
+def test_elements_are_drawn_by_zindex_then_insertion():
+    order = RenderOrder()
+    a, b, c, d = Item('a'), Item('b'), Item('c'), Item('d')
+    order.add(a, 5)
+    order.add(b, -1)
+    order.add(c, 5)
+    order.add(d, 0)
+    assert names(order) == ['b', 'd', 'a', 'c']
+    order.move(b, 10)
+    order.move(d, None)
+    assert names(order) == ['a', 'c', 'b'] and d._render_z is None
+    assert order.order == [5, 10] and len(order) == 3
+
+def test_remove_swaps_the_last_element_in():
+    order = RenderOrder()
+    items = [Item(str(index)) for index in range(5)]
+    for item in items: order.add(item, 0)
+    order.remove(items[1])
+    order.remove(items[1]) #Already removed : nothing happens
+    assert names(order) == ['0', '4', '2', '3']
+    assert all(item._render_slot == slot for slot, item in enumerate(order.buckets[0]))
+    order.clear()
+    assert len(order) == 0 and all(item._render_z is None for item in items)
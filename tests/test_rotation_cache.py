@@ -0,0 +1,54 @@
+import gc
+import pygame
+from utils.rotation_cache import RotationCache
+
+def make_surface(size : tuple[int, int] = (20, 60)) -> pygame.Surface:
+    surf = pygame.Surface(size)
+    surf.fill('Red')
+    return surf
+
+def test_angles_are_quantized_and_shared():
+    cache = RotationCache(step=5)
+    surf = make_surface()
+    assert cache.get(surf, 91) is cache.get(surf, 89.6)
+    assert cache.get(surf, 0) is cache.get(surf, 360)
+    assert cache.get(surf, 90) is not cache.get(surf, 90, colorkey=(0, 255, 0))
+    assert cache.get(surf, 90).image.get_size() == (60, 20)
+    assert len(cache) == 3 and cache.hit_count == 4
+
+def test_least_recently_used_entries_are_evicted():
+    surf = make_surface()
+    entry_bytes : int = RotationCache().get(surf, 0).size_bytes
+    cache = RotationCache(step=90, max_bytes=entry_bytes * 2)
+    first = cache.get(surf, 0)
+    cache.get(surf, 180)
+    cache.get(surf, 0)
+    cache.get(surf, 90)
+    assert len(cache) == 2 and cache.size_bytes <= cache.max_bytes
+    assert cache.get(surf, 0) is first
+    assert cache.miss_count == 3
+
+def test_masks_are_counted_once_built():
+    cache = RotationCache(step=90)
+    surf = make_surface((100, 10))
+    rotated = cache.get(surf, 0)
+    image_bytes : int = cache.size_bytes
+    rotated.mask
+    assert rotated.size_bytes > image_bytes and cache.size_bytes == rotated.size_bytes
+    rotated.mask
+    assert cache.size_bytes == rotated.size_bytes
+    cache.clear()
+    assert cache.size_bytes == 0 and rotated.owner is None
+
+def test_dead_surfaces_drop_their_rotations():
+    cache = RotationCache(step=90)
+    kept, dropped = make_surface(), make_surface()
+    cache.prewarm(kept, background=False)
+    cache.prewarm(dropped, background=False)
+    assert len(cache) == 8
+    del dropped
+    gc.collect()
+    assert len(cache) == 4 and len(cache.sources) == 1
+    assert cache.size_bytes == sum(entry[1].size_bytes for entry in cache.entries.values())
+    cache.invalidate(kept)
+    assert len(cache) == 0 and cache.size_bytes == 0
@@ -0,0 +1,40 @@
+import pygame
+from utils.spatial_hash import SpatialHash
+
+class Box:
+    def __init__(self, x : int, y : int, size : int = 10) -> None:
+        self.rect = pygame.Rect(x, y, size, size)
+
+def test_query_returns_each_element_once():
+    spatial_hash = SpatialHash(cell_size=32)
+    big, small = Box(0, 0, 80), Box(40, 40)
+    spatial_hash.rebuild([big, small], 0)
+    result = spatial_hash.query(pygame.Rect(0, 0, 100, 100), 0)
+    assert sorted(map(id, result)) == sorted(map(id, [big, small]))
+    assert spatial_hash.query(pygame.Rect(200, 200, 5, 5), 0) == []
+
+def test_reinserting_does_not_duplicate():
+    spatial_hash = SpatialHash(cell_size=32)
+    box = Box(4, 4)
+    spatial_hash.rebuild([box], 0)
+    spatial_hash.insert(box) #Killed and respawned in the same frame
+    assert spatial_hash.query(pygame.Rect(0, 0, 5, 5), 0) == [box]
+    box.rect.topleft = (40, 4) #Respawned somewhere else : filed in its new cell too
+    spatial_hash.insert(box)
+    assert spatial_hash.query(pygame.Rect(40, 0, 5, 5), 0) == [box]
+    assert spatial_hash.query(pygame.Rect(0, 0, 64, 5), 0) == [box]
+
+def test_stale_margin_follows_the_fastest_element():
+    spatial_hash = SpatialHash(cell_size=32, min_margin=4, speed_slack=1)
+    slow, fast = Box(0, 0), Box(100, 0)
+    spatial_hash.rebuild([slow, fast], 0, 1)
+    assert spatial_hash.get_stale_margin(1) == 4
+    slow.rect.x += 1
+    fast.rect.x += 60
+    spatial_hash.rebuild([slow, fast], 1, 2)
+    assert spatial_hash.max_speed == 30
+    assert spatial_hash.get_stale_margin(2) == 60
+    fast.rect.x += 60 #Moved on during the next frame, before the rebuild
+    query_rect = fast.rect.copy()
+    assert fast in spatial_hash.query(query_rect, 2, 2)
+    assert fast not in spatial_hash.query(query_rect, 1)
@@ -0,0 +1,81 @@
+import pygame
+import pytest
+from game.sprite import Sprite
+Sprite._core_hint() #Done by main.py at startup
+
+def make_pool_class(name : str, limit : int = -1, policy : str = 'grow', growth : int = 4, base : type[Sprite] = Sprite) -> type[Sprite]:
+    def __init__(self) -> None:
+        super(pool_class, self).__init__()
+        pool_class.add_to_pool(self)
+    linked_classes : list[type[Sprite]] = [Sprite] if base is Sprite else base.linked_classes + [base]
+    pool_class = type(name, (base,), {'__init__' : __init__, 'active_elements' : [], 'inactive_elements' : [], 'linked_classes' : linked_classes,
+                                      'pool_limit' : limit, 'spill_policy' : policy, 'pool_growth' : growth})
+    return pool_class
+
+def spawn(pool_class : type[Sprite]) -> Sprite|None:
+    element = pool_class.get_inactive()
+    if element is None: return None
+    element.rect = pygame.Rect(0, 0, 4, 4)
+    pool_class.unpool(element)
+    return element
+
+def check_slots(pool_class : type[Sprite]):
+    for owner in (pool_class, Sprite):
+        for elements, active in ((owner.active_elements, True), (owner.inactive_elements, False)):
+            for index, element in enumerate(elements):
+                if owner is Sprite and not isinstance(element, pool_class): continue
+                assert element._pool_slots[owner] == index and element._active == active
+
+@pytest.fixture
+def cleanup():
+    classes : list[type[Sprite]] = []
+    yield classes
+    for pool_class in classes: pool_class.kill_all_instances()
+
+def test_swap_remove_keeps_slots_consistent(cleanup):
+    Pooled = make_pool_class('SwapPooled')
+    cleanup.append(Pooled)
+    elements = [spawn(Pooled) for _ in range(10)]
+    for element in (elements[0], elements[5], elements[9], elements[3]):
+        element.kill_instance()
+    check_slots(Pooled)
+    assert len(Pooled.active_elements) == 6 and Pooled.get_pool_size() == 12
+    elements[5].kill_instance() #Already pooled : nothing changes
+    spawn(Pooled)
+    check_slots(Pooled)
+    assert Sprite.high_water_marks['SwapPooled'] == 10
+
+def test_drop_policy_refuses_spawns_past_the_limit(cleanup):
+    Dropped = make_pool_class('DropPooled', limit=5, policy='drop')
+    cleanup.append(Dropped)
+    assert all(spawn(Dropped) is not None for _ in range(5))
+    assert spawn(Dropped) is None and Dropped.get_pool_size() == 5
+
+def test_recycle_policy_reuses_the_oldest(cleanup):
+    Recycled = make_pool_class('RecyclePooled', limit=3, policy='recycle')
+    cleanup.append(Recycled)
+    first, second, third = spawn(Recycled), spawn(Recycled), spawn(Recycled)
+    second.kill_instance()
+    assert spawn(Recycled) is second
+    assert spawn(Recycled) is first #first was the oldest one still alive
+    assert Recycled.get_pool_size() == 3 and len(Recycled.active_elements) == 3
+    check_slots(Recycled)
+
+def test_grow_policy_ignores_the_limit(cleanup):
+    Grown = make_pool_class('GrowPooled', limit=2, policy='grow')
+    cleanup.append(Grown)
+    assert all(spawn(Grown) is not None for _ in range(5))
+    Grown.reserve(20)
+    assert Grown.get_pool_size() >= 5 and len(Grown.active_elements) == 5
+
+def test_killing_a_base_class_pools_its_subclasses(cleanup):
+    Base = make_pool_class('BasePooled')
+    Derived = make_pool_class('DerivedPooled', base=Base)
+    cleanup.extend((Derived, Base))
+    elements = [spawn(Derived) for _ in range(6)]
+    assert len(Base.active_elements) == 6
+    Base.kill_all_instances()
+    assert Base.active_elements == [] and Derived.active_elements == []
+    assert not any(element.active for element in elements) and not any(element in Sprite.active_elements for element in elements)
+    assert len(Derived.inactive_elements) == len(Base.inactive_elements) == Derived.get_pool_size()
+    check_slots(Derived)
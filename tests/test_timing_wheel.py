@@ -0,0 +1,35 @@
+import random
+from math import ceil
+from utils.timing_wheel import TimingWheel
+
+def test_entries_come_back_on_time_across_levels():
+    #A small wheel : 4 slots over 2 levels span 16 ticks, later deadlines go through the overflow list
+    wheel = TimingWheel(tick_length=1, slot_count=4, level_count=2)
+    rng = random.Random(7)
+    deadlines : dict[int, float] = {item : rng.uniform(0, 120) for item in range(300)}
+    for item, deadline in deadlines.items():
+        wheel.schedule(deadline, item, token=-item)
+    assert len(wheel) == 300
+    now : float = 0
+    returned : dict[int, float] = {}
+    while now < 130:
+        now += rng.uniform(0.2, 9)
+        for item, token in wheel.advance(now):
+            assert token == -item and item not in returned
+            returned[item] = now
+    assert len(returned) == 300 and len(wheel) == 0
+    for item, deadline in deadlines.items():
+        #Due on the first advance reaching the deadline's tick, never before it
+        assert returned[item] >= ceil(deadline)
+        assert returned[item] - 9 < ceil(deadline) + 1
+
+def test_past_deadlines_and_reset():
+    wheel = TimingWheel(tick_length=1, start_time=10)
+    wheel.schedule(5, 'late')
+    assert wheel.advance(10) == [('late', None)]
+    wheel.schedule(12, 'pending')
+    wheel.reset(0) #Back to an earlier time, like a restarted game timer
+    assert len(wheel) == 0
+    wheel.schedule(3, 'again')
+    assert wheel.advance(2) == [] and wheel.advance(3) == [('again', None)]
+    assert wheel.advance(20) == []
@@ -0,0 +1,26 @@
+import pygame
+from core.ui import Ui
+from utils.ui.ui_sprite import UiSprite
+from utils.ui.ui_sprite_group import UiSpriteGroup
+
+class Dot(UiSprite):
+    def draw(self, display : pygame.Surface):
+        display.fill('Blue', self.rect)
+
+def make_sprite(color : str, position : tuple[int, int], zindex : int = 0) -> UiSprite:
+    surf = pygame.Surface((4, 4))
+    surf.fill(color)
+    return UiSprite(surf, surf.get_rect(topleft=position), 0, zindex=zindex)
+
+def test_batched_draw_is_detected():
+    assert UiSprite.batched_draw and not Dot.batched_draw and not UiSpriteGroup.batched_draw
+
+def test_render_draws_groups_and_custom_elements():
+    display = pygame.Surface((20, 20))
+    ui = Ui()
+    ui.add(make_sprite('Red', (0, 0), zindex=1))
+    ui.add(UiSpriteGroup(make_sprite('Green', (8, 0)), Dot(pygame.Surface((4, 4)), pygame.Rect(12, 0, 4, 4), 0)))
+    ui.render(display)
+    assert display.get_at((1, 1)) == pygame.Color('Red')
+    assert display.get_at((9, 1)) == pygame.Color('Green')
+    assert display.get_at((13, 1)) == pygame.Color('Blue')
@@ -1,5 +1,6 @@
-import json
+import os
 import pygame
+from utils.asset_cache import load_compiled, load_compiled_dir
 from utils.helpers import Task
 from utils.my_timer import Timer
 import utils.interpolation as interpolation
@@ -15,41 +16,53 @@ def is_rect_pos(name : str) -> bool:
     return name in ['topleft', 'topright', 'bottomleft', 'bottomright', 'center', 'midleft', 'midright', 'midbottom', 'midtop']
     
 
-class AnimationTrack:
-    elements : list['AnimationTrack'] = []
-    def __init__(self, owner : 'Sprite', data : list[dict], name : str|None = None, time_source : Callable[[], float]|None = None, timer_factor : float = 1):
-        self.target : Sprite = owner
-        
-        new_data = [None for instruction in data]
-        for i, value in enumerate(data):
+class AnimationProgram:
+    '''An animation compiled once from its instruction dicts. Instructions only hold parsed parameters
+    and are shared by every track playing the program, the per track state lives in the track.'''
+    def __init__(self, data : list[dict]) -> None:
+        self.source : tuple[dict, ...] = tuple(data)
+        instructions : list[AnimationInstruction] = []
+        for i, value in enumerate(self.source):
             instruction = AnimationInstruction.new(value)
             instruction.animation_index = i
-            new_data[i] = instruction
+            instructions.append(instruction)
+        self.instructions : tuple[AnimationInstruction, ...] = tuple(instructions)
+        self.count : int = len(self.instructions)
+    
+    def __len__(self):
+        return self.count
 
-        self.data : list[AnimationInstruction] = new_data
-        self.blocking_tasks : list[AnimationInstruction] = []
-        self.tasks : list[AnimationInstruction] = []
-        self.progress = 0
-        self.count = len(self.data)
+class AnimationTrack:
+    elements : list['AnimationTrack'] = []
+    def __init__(self, owner : 'Sprite', data : 'AnimationProgram|list[dict]', name : str|None = None, time_source : Callable[[], float]|None = None, timer_factor : float = 1):
+        self.target : Sprite = owner
+        self.program : AnimationProgram = data if isinstance(data, AnimationProgram) else AnimationProgram(data)
+        self.data : tuple[AnimationInstruction, ...] = self.program.instructions
+        self.reset()
 
-        self.has_started = False
-        self.has_ended= False
         self.time_scale = 1
         self.name : str|None = name
 
         self.time_source : Callable[[], float]|None = time_source
         self.timer_factor : float = timer_factor
+        self.clock : Timer = Timer(-1, time_source, timer_factor)
         self.callback : Task|None = None
     
     def reset(self):
-        instruction : AnimationInstruction
-        for instruction in self.data:
-            instruction.reset()
+        count : int = self.program.count
+        self.started : list[bool] = [False] * count
+        self.ended : list[bool] = [False] * count
+        self.start_times : list[float] = [0.0] * count
+        self.start_values : list[Any] = [None] * count
+        self.last_values : list[Any] = [None] * count
+        self.pending : list[int] = [0] * count
         
-        self.blocking_tasks = []
-        self.tasks = []
+        self.blocking_tasks : list[AnimationInstruction] = []
+        self.tasks : list[AnimationInstruction] = []
+        self.cursor : int = 0
+        self.waiters : dict[int, list[AnimationInstruction]] = {}
         self.progress = 0
-        self.count = len(self.data)
+        self.count = count
 
         self.has_started = False
         self.has_ended= False
@@ -62,21 +75,63 @@ class AnimationTrack:
         return self.data[index]
     
     def __delitem__(self, index):
-        del self.data[index]
+        '''The program is shared with other tracks, so this track gets its own copy without the instruction. Restarts the track.'''
+        source : list[dict] = list(self.program.source)
+        del source[index]
+        self.program = AnimationProgram(source)
+        self.data = self.program.instructions
+        self.reset()
     
     def do_instruction(self, instruction : 'AnimationInstruction', index : int|None = None):
         instruction.execute(self)
-                
+    
+    def get_timestamp(self) -> float:
+        return self.clock.get_timestamp()
+    
+    def get_alpha(self, instruction : 'AnimationInstruction') -> float:
+        '''Progress of a timed instruction, clamped to 1. Ends the instruction once it goes past 1.'''
+        alpha : float = (self.get_timestamp() - self.start_times[instruction.animation_index]) / instruction.time
+        if alpha > 1:
+            self.ended[instruction.animation_index] = True
+            return 1
+        return alpha
+    
+    def finish(self, instruction : 'AnimationInstruction'):
+        '''Counts an instruction that just ended and releases the delays waiting on it.'''
+        self.progress += 1
+        waiters = self.waiters.pop(instruction.animation_index, None)
+        if waiters is None: return
+        for waiter in waiters:
+            index : int = waiter.animation_index
+            self.pending[index] -= 1
+            if self.pending[index] == 0:
+                self.ended[index] = True
+                self.finish(waiter)
+    
+    def wait_for(self, waiter : 'AnimationInstruction', indexes : tuple[int, ...]):
+        '''Makes waiter end once every instruction in indexes has. Instructions that already ended are not waited on.'''
+        waiter_index : int = waiter.animation_index
+        self.pending[waiter_index] = 0
+        for index in indexes:
+            if self.ended[index]: continue
+            self.pending[waiter_index] += 1
+            self.waiters.setdefault(index, []).append(waiter)
+        if self.pending[waiter_index] == 0: self.ended[waiter_index] = True
+    
+    def start_instructions(self):
+        '''Starts instructions from the cursor on, until one of them blocks.'''
+        data = self.data
+        while not self.blocking_tasks and self.cursor < len(data):
+            instruction : AnimationInstruction = data[self.cursor]
+            self.cursor += 1
+            self.do_instruction(instruction, instruction.animation_index)
+            if self.ended[instruction.animation_index]: self.finish(instruction)
     
     def play(self, update_manually : bool = False, callback : Task|None = None):
         self.has_started= True
         self.has_ended = False
         self.callback = callback
-        instruction: AnimationInstruction
-        for i, instruction in enumerate(self.data):
-            if self.blocking_tasks: break
-            self.do_instruction(instruction, i)
-            if instruction.has_ended: self.progress += 1
+        self.start_instructions()
         if not update_manually:
             self.register()
     
@@ -91,82 +146,55 @@ class AnimationTrack:
         if not self.target.active: self.stop()
         if self.has_ended: return
 
-        to_delete = []
-        instruction: AnimationInstruction
-        for i, instruction in enumerate(self.data): #this loop starting new tasks
-            if self.blocking_tasks: 
-                break #cant start new tasks when there's a blocking task
-            if instruction.has_started: continue #Already being handled by self.tasks
-            if instruction.has_ended: continue #Already finished
-            self.do_instruction(instruction, i)
-            if instruction.has_ended: 
-                self.progress += 1
-                #print(f'Progress made : {self.progress}/{self.count} (type = {instruction.type})')
-                
-        to_delete = []
-
-        for instruction in self.blocking_tasks: #this loop is for blocking tasks
-            if instruction.has_ended: 
-                to_delete.append(instruction) #Uncessary guard clause
-                continue
-
-            self.do_instruction(instruction)
-            if instruction.has_ended: 
-                to_delete.append(instruction)
-                self.progress += 1
-                #print(f'Progress made : {self.progress}/{self.count} (type = {instruction.type})')
-                
-        
-        for instruction in to_delete:
-            self.blocking_tasks.remove(instruction)
-        
-        to_delete = []
-        for i, instruction in enumerate(self.tasks): #this loop is for already running tasks
-            if instruction.has_ended: 
-                to_delete.append(instruction) #Uncessary guard clause
-                continue
-
-            self.do_instruction(instruction, i)
-            if instruction.has_ended:
-                to_delete.append(instruction)
-                self.progress += 1
-                #print(f'Progress made : {self.progress}/{self.count} (type = {instruction.type})')
-
-        for instruction in to_delete:
-            self.tasks.remove(instruction)
+        self.start_instructions() #cant start new tasks while there's a blocking task
+        if self.blocking_tasks: self.blocking_tasks = self.run_tasks(self.blocking_tasks)
+        if self.tasks: self.tasks = self.run_tasks(self.tasks)
 
         if self.progress >= self.count: 
             self.has_ended = True
             if self.callback: self.callback.execute()
     
+    def run_tasks(self, tasks : list['AnimationInstruction']) -> list['AnimationInstruction']:
+        '''Runs every instruction of tasks once and returns the ones still running.
+        Delays are skipped : they only end when the instructions they wait on do.'''
+        remaining : list[AnimationInstruction] = []
+        ended : list[bool] = self.ended
+        for instruction in tasks:
+            if ended[instruction.animation_index]: continue #Ended by an instruction it was waiting on
+            if not instruction.passive:
+                self.do_instruction(instruction)
+                if ended[instruction.animation_index]:
+                    self.finish(instruction)
+                    continue
+            remaining.append(instruction)
+        return remaining
+    
     @classmethod
     def update_all_elements(cls):
-        to_del : list[AnimationTrack] = []
         for element in cls.elements:
             element.update()
-            if element.has_ended:
-                to_del.append(element)
-        for element in to_del:
-            cls.elements.remove(element)
-        to_del.clear()
+        cls.elements[:] = [element for element in cls.elements if not element.has_ended]
         
 
 
 
 class AnimationInstruction:
+    '''A compiled instruction. Its attributes are parsed parameters that never change once compiled, as the instruction
+    is shared by every track playing the animation. The run state is kept in the track (started, ended, start_times...).'''
+    passive : bool = False
+    types : dict[str, type['AnimationInstruction']] = {}
     def __init__(self, data):
         self.type : str = data["type"]
         self.data : dict = data
-
-        self.has_started : bool = False
-        self.has_ended : bool = False
-
-        self.start_value : Any|None = None
-        self.last_update : Any|None = None
-        self.last_value : Any|None = None
-        self.timer : Timer|None = None
         self.animation_index : int
     
+    @staticmethod
+    def get_easing(easing_style : str|Callable[[float], float]) -> Callable[[float], float]:
+        return interpolation.Easings.get(easing_style)
+    
+    @staticmethod
+    def get_target(target : int|float|list[int]) -> pygame.Vector2|int|float:
+        return target if type(target) == int or type(target) == float else pygame.Vector2(target)
     
     def get_anchor(self, sprite : 'Sprite', anchor : str|None) -> pygame.Vector2:
         if anchor is None:
@@ -198,39 +226,26 @@ class AnimationInstruction:
     
     @staticmethod
     def new(data : dict) -> 'AnimationInstruction':
-        anim_conversion_dict : dict[str, AnimationInstruction] = {
-            "wait" : WaitInstruction,
-            "delay" : DelayInstruction,
-            'delay_rel' : DelayRelInstruction,
-            "move_to" : MoveToInstruction,
-            "move_by" : MoveByInstruction,
-            "slide_by" : SlideByInstruction,
-            "slide_to" : SlideToInstruction,
-            "switch_image" : SwitchImageInstruction,
-            "rotate_by" : RotateByInstruction,
-            "rotate_to" : RotateToInstruction,
-            "rotate_by_over_time" : RotateByOverTimeInstruction,
-            "rotate_to_over_time" : RotateToOverTimeInstruction,
-            "image_gradient" : ImageGradientInstruction,
-            "tween_property" : TweenPropertyInstruction,
-        }
-        instruction_type : str = data['type']
-        if instruction_type in anim_conversion_dict:
-            return (anim_conversion_dict[instruction_type])(data)
-        else:
-            return AnimationInstruction(data)
+        return AnimationInstruction.types.get(data['type'], AnimationInstruction)(data)
+    
+    def start(self, track : AnimationTrack) -> bool:
+        '''Marks the instruction as started on track. Returns False if it already was.'''
+        if track.started[self.animation_index]: return False
+        track.started[self.animation_index] = True
+        return True
+    
+    def start_timed(self, track : AnimationTrack) -> bool:
+        if not self.start(track): return False
+        track.tasks.append(self)
+        track.start_times[self.animation_index] = track.get_timestamp()
+        return True
+    
+    def end(self, track : AnimationTrack):
+        track.started[self.animation_index] = True
+        track.ended[self.animation_index] = True
     
     def execute(self, track : AnimationTrack):
         pass
-        
-    def reset(self):
-        self.has_started = False
-        self.has_ended = False
-
-        self.start_value = None
-        self.last_update = None
-        self.last_value = None
-        self.timer = None
 
 
 class WaitInstruction(AnimationInstruction):
@@ -240,75 +255,56 @@ class WaitInstruction(AnimationInstruction):
         self.time : float = data['time']
 
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if not self.has_started:
-            self.has_started = True
-            self.timer = Timer(self.time, track.time_source, track.timer_factor)
+        index : int = self.animation_index
+        if self.start(track):
+            track.start_times[index] = track.get_timestamp() + self.time #Deadline
             track.blocking_tasks.append(self)
 
-        if self.timer.isover():
-            self.has_ended = True
+        if track.get_timestamp() - track.start_times[index] > 0:
+            track.ended[index] = True
         return
 
 class DelayInstruction(AnimationInstruction):
+    passive : bool = True
     def __init__(self, data):
         super().__init__(data)
         indexes : int|list[int] = data["index"]
-        self.indexes : list[int] = [indexes] if type(indexes) == int else indexes
+        self.indexes : tuple[int, ...] = (indexes,) if type(indexes) == int else tuple(indexes)
     
-    def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if not self.has_started:
-            self.has_started = True
-            track.blocking_tasks.append(self)
-        
-        for index in self.indexes:
-            if not track.data[index].has_ended: return     
-        self.has_ended = True
-
-class DelayRelInstruction(AnimationInstruction):
-    def __init__(self, data):
-        super().__init__(data)
-        indexes : int|list[int] = data["index"]
-        self.indexes : list[int] = [indexes] if type(indexes) == int else indexes
+    def get_targets(self) -> tuple[int, ...]:
+        return self.indexes
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if not self.has_started:
-            self.has_started = True
-            track.blocking_tasks.append(self)
-        
-        for index in self.indexes:
-            target_index = self.animation_index + index
-            if target_index < 0: target_index = f"Target index went below 0 ({target_index})"
-            if not track.data[target_index].has_ended: return     
-        self.has_ended = True
+        if not self.start(track): return
+        track.blocking_tasks.append(self)
+        track.wait_for(self, self.get_targets())
+
+class DelayRelInstruction(DelayInstruction):
+    def get_targets(self) -> tuple[int, ...]:
+        targets : tuple[int, ...] = tuple(self.animation_index + index for index in self.indexes)
+        for target_index in targets:
+            if target_index < 0: raise IndexError(f"Target index went below 0 ({target_index})")
+        return targets
 
 class MoveByInstruction(AnimationInstruction):
     def __init__(self, data):
         super().__init__(data)
         self.offset : pygame.Vector2 = pygame.Vector2(data['offset'])
-        self.last_value : None|pygame.Vector2 = None
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        self.has_started = True
         track.target.position += self.offset
-        self.has_ended = True
+        self.end(track)
         return
 
 class MoveToInstruction(AnimationInstruction):
     def __init__(self, data):
         super().__init__(data)
         self.anchor : str|None = data['anchor']
-        target : int|list[int, int] = data['target']
-        self.target : pygame.Vector2|int
-
-        if type(target) == int or type(target) == float:
-            self.target = target
-        else:
-            self.target = pygame.Vector2(target)
+        self.target : pygame.Vector2|int = self.get_target(data['target'])
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        self.has_started = True
-        self.set_any_anchor(track.target, self.anchor, self.target)
-        self.has_ended = True
+        self.set_any_anchor(track.target, self.anchor, pygame.Vector2(self.target) if type(self.target) == pygame.Vector2 else self.target)
+        self.end(track)
         return
 
 class SlideByInstruction(AnimationInstruction):
@@ -316,36 +312,23 @@ class SlideByInstruction(AnimationInstruction):
         super().__init__(data)
         self.offset : pygame.Vector2 = pygame.Vector2(data['offset'])
         self.time : float = data['time']
-        self.easing_style : Callable[[float], float]
-        easing_style : str|Callable[[float], float] = data['easing_style']
-        if type(easing_style) == str: 
-            self.easing_style = getattr(interpolation, easing_style)
-        else:
-            self.easing_style = easing_style
+        self.easing_style : Callable[[float], float] = self.get_easing(data['easing_style'])
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if self.has_ended: return
-        if not self.has_started:
-            self.has_started = True
-            track.tasks.append(self)
-            self.timer = Timer(self.time, track.time_source, track.timer_factor)
-            self.start_value = pygame.Vector2(track.target.position)
-            self.last_value = pygame.Vector2(0,0)    
+        index : int = self.animation_index
+        if track.ended[index]: return
+        if self.start_timed(track):
+            track.last_values[index] = pygame.Vector2(0,0)    
             return
         
-        
-        alpha = self.timer.get_time() / self.timer.duration
-        if alpha > 1: 
-            alpha = 1
-            self.has_ended = True
-        
+        alpha = track.get_alpha(self)
         new_offset : pygame.Vector2 = interpolation.compatibilty_lerp(pygame.Vector2(0, 0), self.offset, self.easing_style(alpha))
-        prev_offset : pygame.Vector2 = self.last_value
+        prev_offset : pygame.Vector2 = track.last_values[index]
         result : pygame.Vector2 = new_offset - prev_offset
 
         
         track.target.position += result
-        self.last_value = new_offset
+        track.last_values[index] = new_offset
 
         return
 
@@ -353,36 +336,17 @@ class SlideToInstruction(AnimationInstruction):
     def __init__(self, data):
         super().__init__(data)
         self.anchor : str|None = data['anchor']
-
-        target : int|list[int, int] = data['target']
-        self.target : pygame.Vector2|int
-
-        if type(target) == int or type(target) == float:
-            self.target = target
-        else:
-            self.target = pygame.Vector2(target)
-        
+        self.target : pygame.Vector2|int = self.get_target(data['target'])
         self.time : float = data['time']
-        self.easing_style : Callable[[float], float]
-        easing_style : str|Callable[[float], float] = data['easing_style']
-        if type(easing_style) == str: 
-            self.easing_style = getattr(interpolation, easing_style)
-        else:
-            self.easing_style = easing_style
+        self.easing_style : Callable[[float], float] = self.get_easing(data['easing_style'])
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if not self.has_started:
-            self.has_started = True
-            track.tasks.append(self)
-            self.timer = Timer(self.time, track.time_source, track.timer_factor)
-            self.start_value = self.get_any_anchor(track.target, self.anchor)
+        index : int = self.animation_index
+        if self.start_timed(track):
+            track.start_values[index] = self.get_any_anchor(track.target, self.anchor)
         
-        alpha = self.timer.get_time() / self.timer.duration
-        if alpha > 1: 
-            alpha = 1
-            self.has_ended = True
-
-        new_pos : pygame.Vector2|int = interpolation.lerp(self.start_value, self.target, self.easing_style(alpha))
+        alpha = track.get_alpha(self)
+        new_pos : pygame.Vector2|int = interpolation.lerp(track.start_values[index], self.target, self.easing_style(alpha))
         self.set_any_anchor(track.target, self.anchor, new_pos)
         return
 
@@ -395,7 +359,6 @@ class SwitchImageInstruction(AnimationInstruction):
         self.colorkey : str|ColorType|None = data['colorkey']
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        self.has_started = True
         old_pos = None if self.anchor is None else self.get_any_anchor(track.target, self.anchor)
 
         source : dict[Any, pygame.Surface] = track.target.__getattribute__(self.source_name)
@@ -422,7 +385,7 @@ class SwitchImageInstruction(AnimationInstruction):
         if track.target.pivot:
             track.target.angle = track.target.angle
 
-        self.has_ended = True
+        self.end(track)
         return
 
 class RotateByInstruction(AnimationInstruction):
@@ -431,9 +394,8 @@ class RotateByInstruction(AnimationInstruction):
         self.target_angle : float = data['angle']
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        self.has_started = True
         track.target.angle += self.target_angle
-        self.has_ended = True
+        self.end(track)
         return
 
 class RotateToInstruction(AnimationInstruction):
@@ -442,9 +404,8 @@ class RotateToInstruction(AnimationInstruction):
         self.target_angle : float = data['angle']
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        self.has_started = True
         track.target.angle = self.target_angle
-        self.has_ended = True
+        self.end(track)
         return
 
 class RotateByOverTimeInstruction(AnimationInstruction):
@@ -452,63 +413,39 @@ class RotateByOverTimeInstruction(AnimationInstruction):
         super().__init__(data)
         self.target_angle : float = data['angle']
         self.time : float = data['time']
-        self.easing_style : Callable[[float], float]
-        easing_style : str|Callable[[float], float] = data['easing_style']
-        if type(easing_style) == str: 
-            self.easing_style = getattr(interpolation, easing_style)
-        else:
-            self.easing_style = easing_style
+        self.easing_style : Callable[[float], float] = self.get_easing(data['easing_style'])
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if not self.has_started:
-            self.has_started = True
-            track.tasks.append(self)
-            self.timer = Timer(self.time, track.time_source, track.timer_factor)
-            self.start_value = track.target.angle
-            self.last_value = 0.0    
+        index : int = self.animation_index
+        if self.start_timed(track):
+            track.start_values[index] = track.target.angle
+            track.last_values[index] = 0.0    
             return
         
-        
-        alpha = self.timer.get_time() / self.timer.duration
-        if alpha > 1: 
-            alpha = 1
-            self.has_ended = True
-        
+        alpha = track.get_alpha(self)
         new_offset : float = interpolation.lerp(0, self.target_angle, self.easing_style(alpha))
-        prev_offset : float = self.last_value
+        prev_offset : float = track.last_values[index]
         result : float = new_offset - prev_offset
 
         
         track.target.angle += result
-        self.last_value = new_offset
+        track.last_values[index] = new_offset
     
 class RotateToOverTimeInstruction(AnimationInstruction):
     def __init__(self, data):
         super().__init__(data)
         self.target_angle : float = data['angle']
         self.time : float = data['time']
-        self.easing_style : Callable[[float], float]
-        easing_style : str|Callable[[float], float] = data['easing_style']
-        if type(easing_style) == str: 
-            self.easing_style = getattr(interpolation, easing_style)
-        else:
-            self.easing_style = easing_style
+        self.easing_style : Callable[[float], float] = self.get_easing(data['easing_style'])
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if not self.has_started:
-            self.has_started = True
-            track.tasks.append(self)
-            self.timer = Timer(self.time, track.time_source, track.timer_factor)
-            self.start_value = track.target.angle
+        index : int = self.animation_index
+        if self.start_timed(track):
+            track.start_values[index] = track.target.angle
             return
         
-        
-        alpha = self.timer.get_time() / self.timer.duration
-        if alpha > 1: 
-            alpha = 1
-            self.has_ended = True
-        
-        track.target.angle = interpolation.lerp(self.start_value, self.target_angle, self.easing_style(alpha))
+        alpha = track.get_alpha(self)
+        track.target.angle = interpolation.lerp(track.start_values[index], self.target_angle, self.easing_style(alpha))
 
 class ImageGradientInstruction(AnimationInstruction):
     def __init__(self, data):
@@ -517,34 +454,19 @@ class ImageGradientInstruction(AnimationInstruction):
         self.target_index : int|float = data['target_index']
         self.anchor : str|None = data['dynamic_anchor']
         self.colorkey : str|ColorType|None = data['colorkey']
-
         self.time : float = data['time']
-
-        self.easing_style : Callable[[float], float]
-        easing_style : str|Callable[[float], float] = data['easing_style']
-        if type(easing_style) == str: 
-            self.easing_style = getattr(interpolation, easing_style)
-        else:
-            self.easing_style = easing_style
+        self.easing_style : Callable[[float], float] = self.get_easing(data['easing_style'])
     
     def execute(self, track: AnimationTrack, current_index : int|None = None):
-        if not self.has_started:
-            self.has_started = True
-            track.tasks.append(self)
-            self.timer = Timer(self.time, track.time_source, track.timer_factor)
-            self.start_value = track.target.image
-            self.last_value = track.target.image
-
-        
-        alpha = self.timer.get_time() / self.timer.duration
-        if alpha > 1: 
-            alpha = 1
-            self.has_ended = True
+        index : int = self.animation_index
+        if self.start_timed(track):
+            track.start_values[index] = track.target.image
+            track.last_values[index] = track.target.image
 
-        
+        alpha = track.get_alpha(self)
         source : list[pygame.Surface] = track.target.__getattribute__(self.source_name)
         new_image : pygame.Surface = source[int(interpolation.lerp(0, self.target_index, self.easing_style(alpha)))]
-        if new_image == self.last_value: return
+        if new_image == track.last_values[index]: return
 
         old_pos = None if self.anchor is None else self.get_any_anchor(track.target, self.anchor)    
         if self.colorkey: new_image.set_colorkey(self.colorkey)
@@ -570,36 +492,45 @@ class ImageGradientInstruction(AnimationInstruction):
             track.target.align_rect()
         else:
             track.target.move_rect(self.anchor, old_pos)    
-        self.last_value = new_image
+        track.last_values[index] = new_image
 
 class TweenPropertyInstruction(AnimationInstruction):
     def __init__(self, data):
         super().__init__(data)
         self.property_name : str = data['property']
         self.goal : Any = data['goal']
-
         self.time : float = data['time']
-
-        self.easing_style : Callable[[float], float]
-        easing_style : str|Callable[[float], float] = data['easing_style']
-        if type(easing_style) == str: 
-            self.easing_style = getattr(interpolation, easing_style)
-        else:
-            self.easing_style = easing_style
-    
-    def execute(self, track: AnimationTrack):
-        if not self.has_started:
-            self.has_started = True
-            track.tasks.append(self)
-            self.timer = Timer(self.time, track.time_source, track.timer_factor)
-            new_tween = TweenModule.new_tween(track.target, TweenModule.TweenInfo(self.easing_style, self.time), {self.property_name : self.goal},
-                                              True, True, True, track.time_source, track.timer_factor)
-            self.start_value = new_tween
+        self.easing_style : Callable[[float], float] = self.get_easing(data['easing_style'])
+        self.tween_info : TweenModule.TweenInfo = TweenModule.TweenInfo(self.easing_style, self.time)
+        self.goals : dict[str, Any] = {self.property_name : self.goal}
+    
+    def execute(self, track: AnimationTrack, current_index : int|None = None):
+        index : int = self.animation_index
+        if self.start_timed(track):
+            track.start_values[index] = TweenModule.new_tween(track.target, self.tween_info, self.goals,
+                                                              True, True, True, track.time_source, track.timer_factor)
         
-        tween : TweenModule.TweenTrack = self.start_value
+        tween : TweenModule.TweenTrack = track.start_values[index]
         tween.update()
         if tween.has_finished:
-            self.has_ended = True
+            track.ended[index] = True
+
+AnimationInstruction.types = {
+    "wait" : WaitInstruction,
+    "delay" : DelayInstruction,
+    'delay_rel' : DelayRelInstruction,
+    "move_to" : MoveToInstruction,
+    "move_by" : MoveByInstruction,
+    "slide_by" : SlideByInstruction,
+    "slide_to" : SlideToInstruction,
+    "switch_image" : SwitchImageInstruction,
+    "rotate_by" : RotateByInstruction,
+    "rotate_to" : RotateToInstruction,
+    "rotate_by_over_time" : RotateByOverTimeInstruction,
+    "rotate_to_over_time" : RotateToOverTimeInstruction,
+    "image_gradient" : ImageGradientInstruction,
+    "tween_property" : TweenPropertyInstruction,
+}
 
 
 TEMPLATES = [
@@ -628,53 +559,109 @@ TEMPLATES = [
              ]
 
 
-test_anim = [
-    {"type" : "wait", "time" : 1},
-    {"type" : "move_to", "target" : [300, 300], "anchor" : None},
-    {"type" : "wait", "time" : 1},
-    {"type" : "move_by", "offset" : [-150, -150]},
-    {"type" : "slide_by", "offset" : [200, 200], "time" : 1.5, "easing_style" : interpolation.smoothstep},
-    {"type" : "delay_rel", "index" : -1},
-    {"type" : "move_by", "offset" : [-200, -200]},
-    {"type" : "slide_to", "target" : [800, 450], "anchor" : "topleft", "time" : 2, "easing_style" : interpolation.quad_ease_in},
-    {"type" : "delay_rel", "index" : -1},
-    {"type" : "switch_image", "source" : "color_images", "index" : "Green", 'dynamic_anchor' : None, 'colorkey' : [0,0, 255]},
-    {"type" : "wait", "time" : 1},
-    {"type" : "rotate_to", "angle" : 90},
-    {"type" : "wait", "time" : 1},
-    {"type" : "rotate_by_over_time", "angle" : 360, "time" : 1.5, "easing_style" : interpolation.smoothstep},
-    {"type" : "image_gradient", "source" : "color_image_list", "target_index" : 7, "time" : 3, "easing_style" : interpolation.linear, 
-    'dynamic_anchor' : 'topleft', 'colorkey' : [90, 90, 90]},
-    {"type" : "delay_rel", "index" : -1},
-    {"type" : "tween_property", "property" : "position", "goal" : [100, 100], "time" : 3, "easing_style" : interpolation.linear},
-    ]
+ANIMATION_DIR : str = 'assets/data/animations'
+TEMPLATE_KEYS : dict[str, frozenset[str]] = {template['type'] : frozenset(template) for template in TEMPLATES}
+ANCHORS : frozenset[str|None] = frozenset(['left', 'right', 'top', 'bottom', 'x', 'y', 'centerx', 'centery', 'topleft', 'topright', 'bottomleft', 
+                                           'bottomright', 'center', 'midleft', 'midright', 'midbottom', 'midtop', None])
+
+def is_number(value : Any) -> bool:
+    return type(value) in (int, float)
+
+def validate_instruction(name : str, index : int, count : int, raw : dict[str, Any]):
+    '''Checks one JSON instruction against its template. Raises ValueError describing the first problem found.'''
+    where : str = f"Animation '{name}' : instruction {index}"
+    if type(raw) != dict or raw.get('type') not in TEMPLATE_KEYS:
+        raise ValueError(f"{where} has an unknown type {raw.get('type') if type(raw) == dict else raw!r}")
+    expected : frozenset[str] = TEMPLATE_KEYS[raw['type']]
+    unknown, missing = raw.keys() - expected, expected - raw.keys()
+    if unknown: raise ValueError(f"{where} ({raw['type']}) : unknown keys {sorted(unknown)}")
+    if missing: raise ValueError(f"{where} ({raw['type']}) : missing keys {sorted(missing)}")
+    if 'easing_style' in raw:
+        if raw['easing_style'] not in interpolation.Easings.functions: 
+            raise ValueError(f"{where} : unknown easing style {raw['easing_style']!r}")
+        if not is_number(raw['time']) or raw['time'] <= 0: raise ValueError(f"{where} : time must be a number above 0")
+    elif 'time' in raw and (not is_number(raw['time']) or raw['time'] < 0): 
+        raise ValueError(f"{where} : time must be a positive number")
+    if 'source' in raw and (type(raw['source']) != str or not raw['source'].isidentifier()):
+        raise ValueError(f"{where} : source must be the name of an image attribute, got {raw['source']!r}")
+    if 'target_index' in raw and (type(raw['target_index']) != int or raw['target_index'] < 0):
+        raise ValueError(f"{where} : target_index must be a positive integer")
+    if raw.get('dynamic_anchor') not in ANCHORS: raise ValueError(f"{where} : unknown anchor {raw['dynamic_anchor']!r}")
+    if 'anchor' in raw and raw['anchor'] not in ANCHORS and raw['anchor'] != 'true': raise ValueError(f"{where} : unknown anchor {raw['anchor']!r}")
+    if raw['type'] in ('delay', 'delay_rel'):
+        targets : int|list[int] = raw['index']
+        targets = [targets] if type(targets) == int else targets
+        if type(targets) != list or any(type(target) != int for target in targets): 
+            raise ValueError(f"{where} : index must be an integer or a list of integers")
+        if raw['type'] == 'delay_rel': targets = [index + target for target in targets]
+        if any(not 0 <= target < count for target in targets):
+            raise ValueError(f"{where} : delay targets {targets} are out of the animation")
+        if any(target >= index for target in targets): #Instructions are started in order, waiting on a later one never ends
+            raise ValueError(f"{where} : delay targets {targets} must come before the delay")
+
+def compile_animation(name : str, raw : list[dict[str, Any]]) -> AnimationProgram:
+    if type(raw) != list: raise ValueError(f"Animation '{name}' : expected a list of instructions")
+    for index, instruction in enumerate(raw):
+        validate_instruction(name, index, len(raw), instruction)
+    return AnimationProgram(raw)
+
+def compile_animation_library(raw : dict[str, list[dict[str, Any]]]) -> dict[str, AnimationProgram]:
+    return {name : compile_animation(name, animation) for name, animation in raw.items()}
 
 
 class Animation:
-    ANIM_DATA = {"test" : test_anim}
+    animations : dict[str, 'Animation'] = {}
 
     @classmethod
     def get_animation(cls, name):
-        if name in cls.ANIM_DATA:
-            return Animation(cls.ANIM_DATA[name], name)
+        if name in cls.animations:
+            return cls.animations[name]
         else:
             print("AnimationError: Animation not found")
             return None
 
+    @classmethod
+    def load_directory(cls, path : str = ANIMATION_DIR):
+        '''Registers every animation of a directory of JSON files, one animation per file named after it.
+        The validated and compiled animations are cached together, see load_compiled_dir.'''
+        programs : dict[str, AnimationProgram] = load_compiled_dir(path, compile_animation_library, version=2)
+        for name, program in programs.items():
+            cls.animations[name] = Animation(list(program.source), name, program)
+
+    @classmethod
+    def load_file(cls, path : str):
+        '''Registers the animation of a single JSON file, named after it.'''
+        name : str = os.path.splitext(os.path.basename(path))[0]
+        program : AnimationProgram = load_compiled(path, lambda raw : compile_animation(name, raw), version=2)
+        cls.animations[name] = Animation(list(program.source), name, program)
     
-    def __init__(self, data : list[dict], name : str) -> None:
+    def __init__(self, data : list[dict], name : str, program : AnimationProgram|None = None) -> None:
         self.data = data
         self.name : str = name
+        self.program : AnimationProgram = program if program is not None else AnimationProgram(data)
+        self.checked_owners : set[type] = set()
+    
+    def check_sources(self, owner : 'Sprite'):
+        '''Image instructions refer to image attributes of their sprite, which only exist once it is set up.
+        They are checked against the first sprite of each class the animation is loaded on.'''
+        for instruction in self.program.instructions:
+            if not isinstance(instruction, (SwitchImageInstruction, ImageGradientInstruction)): continue
+            source = getattr(owner, instruction.source_name, None)
+            if source is None:
+                raise ValueError(f"Animation '{self.name}' : {type(owner).__name__} has no image source '{instruction.source_name}'")
+            try:
+                source[instruction.index if isinstance(instruction, SwitchImageInstruction) else int(instruction.target_index)]
+            except (KeyError, IndexError, TypeError):
+                raise ValueError(f"Animation '{self.name}' : image source '{instruction.source_name}' of {type(owner).__name__} "
+                                 f"has no image {instruction.index if isinstance(instruction, SwitchImageInstruction) else instruction.target_index!r}") from None
+        self.checked_owners.add(type(owner))
     
     def load(self, owner : 'Sprite', time_source : Callable[[], float]|None = None, timer_factor : float = 1):
-        return AnimationTrack(owner, self.data, self.name, time_source, timer_factor)
-
-    def load_file(self, path = "data/animations/animation_data.json"):
-        with open(path, "r") as read_file:
-            dictionary = json.load(read_file)
-        
-        self.ANIM_DATA += dictionary
+        if type(owner) not in self.checked_owners: self.check_sources(owner)
+        return AnimationTrack(owner, self.program, self.name, time_source, timer_factor)
 
 def _sprite_hint():
     global Sprite
-    from game.sprite import Sprite
\ No newline at end of file
+    from game.sprite import Sprite
+
+Animation.load_directory(ANIMATION_DIR)
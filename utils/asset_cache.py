@@ -0,0 +1,48 @@
+import json
+import os
+import pickle
+from hashlib import sha1
+from typing import Any, Callable
+
+def get_cache_path(source_path : str) -> str:
+    return source_path + '.cache'
+
+def load_compiled(source_path : str, compile_func : Callable[[Any], Any], version : int = 1) -> Any:
+    '''Loads a JSON asset through compile_func, reusing the compiled result cached next to the file when possible.
+    The cache is keyed on the hash of the source and on version (bump it whenever compile_func changes its output).
+    compile_func receives the parsed JSON and must return something picklable.
+    A missing, stale or unreadable cache is rebuilt, failing to write it (read-only or web builds) is not an error.'''
+    with open(source_path, 'rb') as file:
+        source : bytes = file.read()
+    key : tuple[str, int] = (sha1(source).hexdigest(), version)
+    return load_cached(get_cache_path(source_path), key, lambda : compile_func(json.loads(source)))
+
+def load_compiled_dir(directory : str, compile_func : Callable[[dict[str, Any]], Any], version : int = 1, extension : str = '.json') -> Any:
+    '''Same as load_compiled for every file of directory with the given extension, compiled together into one cache next to the directory.
+    compile_func receives a dict of the parsed files keyed on their name without extension.
+    The cache is keyed on the names and contents of the files, so adding, removing or editing any of them rebuilds it.'''
+    names : list[str] = sorted(name for name in os.listdir(directory) if name.endswith(extension))
+    sources : dict[str, bytes] = {}
+    digest = sha1()
+    for name in names:
+        with open(os.path.join(directory, name), 'rb') as file:
+            source : bytes = file.read()
+        sources[name[:-len(extension)]] = source
+        digest.update(name.encode() + b'\0' + source + b'\0')
+    key : tuple[str, int] = (digest.hexdigest(), version)
+    return load_cached(get_cache_path(directory.rstrip('/\\')), key, lambda : compile_func({name : json.loads(source) for name, source in sources.items()}))
+
+def load_cached(cache_path : str, key : tuple[str, int], build : Callable[[], Any]) -> Any:
+    try:
+        with open(cache_path, 'rb') as file:
+            cached_key, compiled = pickle.load(file)
+        if cached_key == key: return compiled
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+        pass
+    compiled = build()
+    try:
+        with open(cache_path, 'wb') as file:
+            pickle.dump((key, compiled), file)
+    except OSError:
+        pass
+    return compiled
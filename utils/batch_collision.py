@@ -0,0 +1,54 @@
+import pygame
+from typing import Any
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_circle_masks : dict[int, pygame.Mask] = {}
+
+def has_numpy() -> bool:
+    return np is not None
+
+def get_circle_mask(radius : float) -> pygame.Mask:
+    '''Returns a shared mask of a filled circle. Masks are cached per integer radius.'''
+    radius = max(1, round(radius))
+    mask = _circle_masks.get(radius)
+    if mask is None:
+        surf = pygame.Surface((radius * 2, radius * 2))
+        surf.set_colorkey((0, 0, 0))
+        surf.fill((0, 0, 0))
+        pygame.draw.circle(surf, (255, 255, 255), (radius, radius), radius)
+        mask = pygame.mask.from_surface(surf)
+        _circle_masks[radius] = mask
+    return mask
+
+def circles_hitting_rect(centers : 'np.ndarray', radii : 'np.ndarray', rect : pygame.Rect) -> 'np.ndarray':
+    '''Returns the indices of every circle overlapping rect in one vectorized pass.
+    centers is a (N, 2) float array and radii a (N,) float array.'''
+    closest_x = np.clip(centers[:, 0], rect.left, rect.right)
+    closest_y = np.clip(centers[:, 1], rect.top, rect.bottom)
+    dx = centers[:, 0] - closest_x
+    dy = centers[:, 1] - closest_y
+    return np.flatnonzero(dx * dx + dy * dy <= radii * radii)
+
+def confirm_circle_hits(mask : pygame.Mask, rect : pygame.Rect, centers : Any, radii : Any,
+                        candidates : 'np.ndarray|list[int]') -> list[int]:
+    '''Pixel-exact confirmation of broadphase candidates against a sprite's mask.'''
+    hits : list[int] = []
+    left, top = rect.topleft
+    for index in candidates:
+        radius : int = max(1, round(radii[index])) #The radius the mask is built with
+        circle_mask = get_circle_mask(radius)
+        offset = (round(centers[index][0]) - radius - left, round(centers[index][1]) - radius - top)
+        if mask.overlap(circle_mask, offset):
+            hits.append(int(index))
+    return hits
+
+def query_circles(mask : pygame.Mask|None, rect : pygame.Rect, centers : 'np.ndarray', radii : 'np.ndarray') -> list[int]:
+    '''Returns the indices of the circles hitting a sprite. Uses the mask for the final check when one is given.'''
+    if len(radii) == 0: return []
+    candidates = circles_hitting_rect(centers, radii, rect)
+    if mask is None or len(candidates) == 0:
+        return candidates.tolist()
+    return confirm_circle_hits(mask, rect, centers, radii, candidates)
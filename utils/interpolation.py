@@ -1,4 +1,11 @@
 """Module that contains multiple lerp related utility functions."""
+from typing import Callable, TypeAlias
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EasingFunc : TypeAlias = Callable[[float], float]
 def compatibilty_lerp(a, b, t : float):
     try: return a + (b-a) * t 
     except: pass
@@ -47,7 +54,7 @@ def cubic_ease_out(t : float) -> float:
 
 
 def smoothstep(t : float) -> float:
-    return lerp(quad_ease_in(t), quad_ease_out(t), t)
+    return t * t * (3 - 2 * t) #lerp(quad_ease_in(t), quad_ease_out(t), t) expanded
 
 
 def linear(t : float) -> float:
@@ -59,3 +66,74 @@ def mirror(t : float) -> float:
 
 
 
+class EasingTable:
+    '''An easing function sampled at resolution + 1 evenly spaced alphas, evaluated by linear interpolation between entries.
+    Alphas outside [0, 1] are clamped.'''
+    def __init__(self, func : EasingFunc, resolution : int = 1024) -> None:
+        self.func : EasingFunc = func
+        self.resolution : int = resolution
+        self.values : list[float] = [func(i / resolution) for i in range(resolution + 1)]
+        self.array : 'np.ndarray|None' = np.array(self.values, dtype=np.float64) if np is not None else None
+
+    def __call__(self, t : float) -> float:
+        if t <= 0: return self.values[0]
+        if t >= 1: return self.values[-1]
+        position : float = t * self.resolution
+        index : int = int(position)
+        low : float = self.values[index]
+        return low + (self.values[index + 1] - low) * (position - index)
+
+    def get_many(self, alphas : 'np.ndarray') -> 'np.ndarray':
+        positions = np.clip(alphas, 0, 1) * self.resolution
+        indices = np.minimum(positions.astype(np.intp), self.resolution - 1)
+        low = self.array[indices]
+        return low + (self.array[indices + 1] - low) * (positions - indices)
+
+class Easings:
+    '''Registry of the easing functions that can be referred to by name, e.g. in animation data.
+    Each easing may come with a vectorized version taking a numpy array of alphas, the ones without use a lookup table.'''
+    functions : dict[str, EasingFunc] = {}
+    vectorized : dict[str, Callable[['np.ndarray'], 'np.ndarray']] = {}
+    tables : dict[tuple[EasingFunc, int], EasingTable] = {}
+
+    @classmethod
+    def register(cls, name : str, func : EasingFunc, vectorized : Callable[['np.ndarray'], 'np.ndarray']|None = None):
+        cls.functions[name] = func
+        if vectorized is not None: cls.vectorized[name] = vectorized
+        else: cls.vectorized.pop(name, None)
+
+    @classmethod
+    def get(cls, easing : str|EasingFunc) -> EasingFunc:
+        if type(easing) != str: return easing
+        if easing not in cls.functions: raise KeyError(f"Unknown easing style '{easing}'")
+        return cls.functions[easing]
+
+    @classmethod
+    def get_name(cls, func : EasingFunc) -> str|None:
+        for name, registered in cls.functions.items():
+            if registered is func: return name
+        return None
+
+    @classmethod
+    def get_table(cls, easing : str|EasingFunc, resolution : int = 1024) -> EasingTable:
+        '''Returns the lookup table of an easing, built on first use and shared afterwards.'''
+        func : EasingFunc = cls.get(easing)
+        key = (func, resolution)
+        if key not in cls.tables: cls.tables[key] = EasingTable(func, resolution)
+        return cls.tables[key]
+
+    @classmethod
+    def ease_many(cls, easing : str|EasingFunc, alphas : 'np.ndarray') -> 'np.ndarray':
+        '''Eases every alpha of a numpy array at once, exactly for registered easings with a vectorized version,
+        through the lookup table otherwise. Requires numpy.'''
+        func : EasingFunc = cls.get(easing)
+        name : str|None = easing if type(easing) == str else cls.get_name(func)
+        if name in cls.vectorized: return cls.vectorized[name](np.asarray(alphas, dtype=np.float64))
+        return cls.get_table(func).get_many(np.asarray(alphas, dtype=np.float64))
+
+def _vectorized_mirror(t : 'np.ndarray') -> 'np.ndarray':
+    return np.where(t < 0.5, t * 2, (1 - t) * 2)
+
+for _func in (flip, quad_ease_out, quad_ease_in, cubic_ease_in, cubic_ease_out, smoothstep, linear):
+    Easings.register(_func.__name__, _func, _func) #Plain arithmetic, works on arrays as is
+Easings.register('mirror', mirror, _vectorized_mirror)
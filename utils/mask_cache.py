@@ -0,0 +1,47 @@
+import pygame
+import weakref
+from collections import OrderedDict
+
+class MaskCache:
+    '''Shares collision masks between everything using the same surface.
+    Entries are keyed by surface identity and hold a weak reference to it, so a surface going away drops its mask.
+    The least recently used entries are evicted once max_entries is reached.
+    Surfaces modified in place must be passed to invalidate.'''
+    def __init__(self, max_entries : int = 512) -> None:
+        self.max_entries : int = max_entries
+        self.entries : OrderedDict[int, tuple[weakref.ref, pygame.Mask]] = OrderedDict()
+        self.hit_count : int = 0
+        self.miss_count : int = 0
+
+    def get(self, surf : pygame.Surface) -> pygame.Mask:
+        key : int = id(surf)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0]() is surf:
+            self.entries.move_to_end(key)
+            self.hit_count += 1
+            return entry[1]
+        self.miss_count += 1
+        mask : pygame.Mask = pygame.mask.from_surface(surf)
+        self.entries[key] = (weakref.ref(surf, self._make_remover(key)), mask)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return mask
+
+    def _make_remover(self, key : int):
+        entries = self.entries
+        def remove(ref : weakref.ref):
+            entry = entries.get(key)
+            if entry is not None and entry[0] is ref: del entries[key]
+        return remove
+
+    def invalidate(self, surf : pygame.Surface):
+        self.entries.pop(id(surf), None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+mask_cache : MaskCache = MaskCache()
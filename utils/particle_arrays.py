@@ -0,0 +1,162 @@
+import pygame
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.render_batch import RenderBatch
+from utils.particle_textures import TextureVariants, ParticleFlipbook
+
+class ParticleArrays:
+    '''Array backed storage for the particles of one effect track.
+    Every live particle is a row of contiguous NumPy arrays and the whole set is stepped by a single kernel per frame,
+    so particles handled here are never Sprites. Dead rows are compacted away at the end of each update.
+    'simulated' rows keep a position and integrate it with Verlet and drag (as Particle.update does),
+    'spiral' rows keep their origin in positions and a polar offset (angle in degrees, radius) around it,
+    'animated' rows do not move.
+    With variants or a flipbook, every particle is drawn with the variant or frame matching its age.'''
+    def __init__(self, update_method : str, image : pygame.Surface, bounding_box : pygame.Rect, capacity : int = 64,
+                 variants : TextureVariants|None = None, flipbook : ParticleFlipbook|None = None) -> None:
+        self.update_method : str = update_method
+        self.image : pygame.Surface = image
+        self.variants : TextureVariants|None = variants
+        self.flipbook : ParticleFlipbook|None = flipbook
+        self.frame_source : TextureVariants|ParticleFlipbook|None = variants if variants is not None else flipbook
+        self.bounding_box : pygame.Rect = bounding_box
+        self.count : int = 0
+        self.capacity : int = capacity
+        self.positions : np.ndarray = np.zeros((capacity, 2))
+        self.velocities : np.ndarray = np.zeros((capacity, 2))
+        self.accelerations : np.ndarray = np.zeros((capacity, 2))
+        self.drags : np.ndarray = np.zeros(capacity)
+        self.angles : np.ndarray = np.zeros(capacity)
+        self.radii : np.ndarray = np.zeros(capacity)
+        self.expire_times : np.ndarray = np.zeros(capacity)
+        self.birth_times : np.ndarray = np.zeros(capacity)
+        self.kill_offscreen : np.ndarray = np.zeros(capacity, dtype=bool)
+
+    def grow(self, new_capacity : int):
+        def resize(array : 'np.ndarray') -> 'np.ndarray':
+            new_array = np.zeros((new_capacity, *array.shape[1:]), dtype=array.dtype)
+            new_array[:self.count] = array[:self.count]
+            return new_array
+        self.positions = resize(self.positions)
+        self.velocities = resize(self.velocities)
+        self.accelerations = resize(self.accelerations)
+        self.drags = resize(self.drags)
+        self.angles = resize(self.angles)
+        self.radii = resize(self.radii)
+        self.expire_times = resize(self.expire_times)
+        self.birth_times = resize(self.birth_times)
+        self.kill_offscreen = resize(self.kill_offscreen)
+        self.capacity = new_capacity
+
+    def spawn(self, pos : pygame.Vector2, velocity : pygame.Vector2, accel : pygame.Vector2, drag : float, expire_time : float,
+              kill_offscreen : bool, angle : float = 0, radius : float = 0, birth_time : float = 0) -> int:
+        if self.count == self.capacity: self.grow(self.capacity * 2)
+        index : int = self.count
+        self.positions[index] = pos
+        self.velocities[index] = velocity
+        self.accelerations[index] = accel
+        self.drags[index] = drag
+        self.angles[index] = angle
+        self.radii[index] = radius
+        self.expire_times[index] = expire_time
+        self.birth_times[index] = birth_time
+        self.kill_offscreen[index] = kill_offscreen
+        self.count += 1
+        return index
+
+    def spawn_many(self, positions : 'np.ndarray', velocities : 'np.ndarray', accels : 'np.ndarray', drags : 'np.ndarray',
+                   expire_times : 'np.ndarray', kill_offscreen : bool, angles : 'np.ndarray|None' = None, radii : 'np.ndarray|None' = None,
+                   birth_time : float = 0):
+        '''Appends a whole wave of particles at once. Every argument is an array with one row per particle.'''
+        amount : int = len(positions)
+        if amount == 0: return
+        if self.count + amount > self.capacity:
+            new_capacity : int = self.capacity
+            while new_capacity < self.count + amount: new_capacity *= 2
+            self.grow(new_capacity)
+        rows = slice(self.count, self.count + amount)
+        self.positions[rows] = positions
+        self.velocities[rows] = velocities
+        self.accelerations[rows] = accels
+        self.drags[rows] = drags
+        self.angles[rows] = 0 if angles is None else angles
+        self.radii[rows] = 0 if radii is None else radii
+        self.expire_times[rows] = expire_times
+        self.birth_times[rows] = birth_time
+        self.kill_offscreen[rows] = kill_offscreen
+        self.count += amount
+
+    def get_centers(self) -> 'np.ndarray':
+        '''Returns the current screen position of every live particle.'''
+        count : int = self.count
+        if self.update_method != 'spiral': return self.positions[:count]
+        angles = np.radians(self.angles[:count])
+        radii = self.radii[:count]
+        return self.positions[:count] - np.stack((np.cos(angles) * radii, np.sin(angles) * radii), axis=1)
+
+    def update(self, delta : float, current_time : float):
+        count : int = self.count
+        if count == 0: return
+        width, height = self.image.get_size()
+        box : pygame.Rect = self.bounding_box
+        centers = self.get_centers()
+        offscreen = ((centers[:, 0] + width / 2 <= box.left) | (centers[:, 0] - width / 2 >= box.right) |
+                     (centers[:, 1] + height / 2 <= box.top) | (centers[:, 1] - height / 2 >= box.bottom))
+        dead = (self.expire_times[:count] < current_time) | (offscreen & self.kill_offscreen[:count])
+
+        velocities = self.velocities[:count]
+        half_accel = self.accelerations[:count] * (0.5 * delta)
+        damping = np.power(1 - self.drags[:count], delta * 0.5)[:, None]
+        velocities *= damping
+        velocities += half_accel
+        if self.update_method == 'spiral':
+            radii = self.radii[:count]
+            self.angles[:count] -= velocities[:, 0] * delta
+            radii += np.where(radii != 0, velocities[:, 1] * delta, 0)
+        elif self.update_method == 'simulated':
+            self.positions[:count] += velocities * delta
+        velocities += half_accel
+        velocities *= damping
+
+        if dead.any(): self.compact(~dead)
+
+    def compact(self, keep : 'np.ndarray'):
+        '''Keeps only the rows flagged in keep (a boolean mask over the live rows), preserving their order.'''
+        count : int = self.count
+        new_count : int = int(keep.sum())
+        for array in (self.positions, self.velocities, self.accelerations, self.drags,
+                      self.angles, self.radii, self.expire_times, self.birth_times, self.kill_offscreen):
+            array[:new_count] = array[:count][keep]
+        self.count = new_count
+
+    def clear(self):
+        self.count = 0
+
+    def get_frame_indices(self, current_time : float) -> 'np.ndarray':
+        '''Returns the surface of frame_source each live particle shows at current_time, from its age
+        (or the fraction of its life already spent for variants).'''
+        count : int = self.count
+        births = self.birth_times[:count]
+        if self.variants is None: return self.flipbook.get_indices(current_time - births)
+        lifetimes = np.maximum(self.expire_times[:count] - births, 1e-9)
+        steps : int = self.variants.steps
+        return np.clip(((current_time - births) / lifetimes * steps).astype(int), 0, steps - 1)
+
+    def draw(self, batch : RenderBatch, current_time : float = 0, blend_flags : int = 0):
+        if self.count == 0: return
+        if self.frame_source is not None:
+            source : TextureVariants|ParticleFlipbook = self.frame_source
+            indices = self.get_frame_indices(current_time)
+            topleft = (self.get_centers() - np.array(source.half_sizes)[indices]).astype(int).tolist()
+            surfaces : list[pygame.Surface] = source.surfaces
+            batch.add_many([(surfaces[index], pos) for index, pos in zip(indices.tolist(), topleft)], blend_flags)
+            return
+        image : pygame.Surface = self.image
+        width, height = image.get_size()
+        topleft = (self.get_centers() - (width // 2, height // 2)).astype(int).tolist()
+        batch.add_many([(image, pos) for pos in topleft], blend_flags)
+
+    def __len__(self):
+        return self.count
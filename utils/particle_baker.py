@@ -0,0 +1,162 @@
+'''Offline baking of particle effects into flipbooks.
+Run from the project root with : python -m utils.particle_baker [effect names] (every library effect when none are given)
+Each effect is simulated headlessly with a fixed seed and every frame is rendered into a sprite sheet,
+then listed in the bake index that ParticleEffect.load_effect picks flipbooks from.'''
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, floor, sqrt
+import numpy as np
+import pygame
+from utils.particle_effects import (ParticleEffect, ParticleEffectTrack, EffectDescriptor, EffectData, BakedEffect,
+                                    get_descriptor_key, BAKED_EFFECTS_PATH)
+
+BAKED_SHEET_DIR : str = 'assets/graphics/baked_particles'
+
+def simulate_effect(effect : ParticleEffect, seed : int, frame_rate : float, max_duration : float,
+                    bounding_box : pygame.Rect) -> list[tuple['np.ndarray', 'np.ndarray']]:
+    '''Plays the effect at (0, 0) on a simulated clock, without the particle budget.
+    Returns the centers and texture variant indices of the live particles for every frame, until the effect ends or max_duration.'''
+    data : EffectData = effect.data
+    clock : list[float] = [0.0]
+    effect.set_seed(seed)
+    track = ParticleEffectTrack(pygame.Vector2(0, 0), data['cooldown'], time_source=lambda : clock[0])
+    track.particles = effect.new_particle_arrays()
+    track.particles.bounding_box = bounding_box
+    delta : float = 60 / frame_rate
+    next_wave : float = data['cooldown']
+    effect.emit_wave(track, data['init_spawn_count'])
+    frames : list[tuple['np.ndarray', 'np.ndarray']] = []
+    for frame in range(round(max_duration * frame_rate)):
+        clock[0] = frame / frame_rate
+        while next_wave <= clock[0] and track.total_count < data['target_spawn_count']:
+            effect.emit_wave(track, min(data['part_per_wave'], data['target_spawn_count'] - track.total_count))
+            next_wave += data['cooldown']
+        if frame > 0: track.particles.update(delta, clock[0])
+        if len(track.particles) == 0 and track.total_count >= data['target_spawn_count']: break
+        if track.particles.frame_source is None: indices = np.zeros(len(track.particles), dtype=int)
+        else: indices = track.particles.get_frame_indices(clock[0])
+        frames.append((track.particles.get_centers().copy(), indices))
+    return frames
+
+def premultiply(surf : pygame.Surface) -> pygame.Surface:
+    converted = pygame.Surface(surf.get_size(), pygame.SRCALPHA)
+    converted.blit(surf, (0, 0))
+    return converted.premul_alpha()
+
+def get_frame_rects(frames : list[tuple['np.ndarray', 'np.ndarray']], half_sizes : 'np.ndarray', sizes : 'np.ndarray',
+                    bounding_box : pygame.Rect) -> list[pygame.Rect]:
+    '''The rect covering the particles of every frame, relative to the effect origin and clipped to bounding_box. Empty frames get an empty rect.'''
+    rects : list[pygame.Rect] = []
+    for centers, indices in frames:
+        if len(centers) == 0:
+            rects.append(pygame.Rect(0, 0, 0, 0))
+            continue
+        topleft = centers - half_sizes[indices]
+        low = topleft.min(axis=0)
+        high = (topleft + sizes[indices]).max(axis=0)
+        rect = pygame.Rect(floor(low[0]), floor(low[1]), ceil(high[0]) - floor(low[0]), ceil(high[1]) - floor(low[1]))
+        rects.append(rect.clip(bounding_box))
+    return rects
+
+def pack_frames(sizes : list[tuple[int, int]], max_sheet_size : int) -> tuple[list[tuple[int, int]], tuple[int, int]]:
+    '''Packs frames into rows, tallest first. Returns the position of every frame in the sheet and the sheet size.
+    Raises ValueError if the frames do not fit in max_sheet_size x max_sheet_size.'''
+    total_area : int = sum(width * height for width, height in sizes)
+    widest : int = max((width for width, _ in sizes), default=0)
+    sheet_width : int = min(max_sheet_size, max(widest, ceil(sqrt(total_area * 1.1))))
+    if widest > max_sheet_size: raise ValueError(f'a frame is {widest} pixels wide, over the {max_sheet_size} pixels sheet limit')
+    positions : list[tuple[int, int]] = [(0, 0)] * len(sizes)
+    x, y, row_height = 0, 0, 0
+    for index in sorted(range(len(sizes)), key=lambda index : -sizes[index][1]):
+        width, height = sizes[index]
+        if width == 0 or height == 0: continue
+        if x + width > sheet_width:
+            x, y, row_height = 0, y + row_height, 0
+        positions[index] = (x, y)
+        x += width
+        row_height = max(row_height, height)
+    sheet_height : int = y + row_height
+    if sheet_height > max_sheet_size: 
+        raise ValueError(f'the frames need a {sheet_width}x{sheet_height} sheet, over the {max_sheet_size} pixels limit')
+    return positions, (max(1, sheet_width), max(1, sheet_height))
+
+def bake_effect(descriptor : EffectDescriptor, seed : int = 0, frame_rate : float = 30, max_duration : float = 10,
+                max_extent : int = 2048, max_sheet_size : int = 4096, sheet_dir : str = BAKED_SHEET_DIR) -> BakedEffect:
+    '''Bakes one effect into a premultiplied sprite sheet saved in sheet_dir. Every frame is cropped to the pixels its particles cover,
+    within max_extent pixels of the origin (particles destroyed offscreen die past it). Raises ValueError if the sheet would go over
+    max_sheet_size pixels on a side, lower frame_rate or max_duration then.'''
+    name : str = descriptor.name
+    data : EffectData = descriptor.to_effect_data()
+    if not ParticleEffect.can_use_arrays(data):
+        raise ValueError(f"Particle effect '{name}' : only 'simulated' and 'spiral' effects without animation can be baked")
+    effect = ParticleEffect(data, True)
+    ParticleEffect.elements.remove(effect)
+    bounding_box = pygame.Rect(-max_extent, -max_extent, max_extent * 2, max_extent * 2)
+    frames = simulate_effect(effect, seed, frame_rate, max_duration, bounding_box)
+    if not frames or all(len(centers) == 0 for centers, _ in frames): raise ValueError(f"Particle effect '{name}' : nothing to bake")
+    if effect.variants is not None:
+        surfaces : list[pygame.Surface] = effect.variants.surfaces
+    else:
+        surfaces = [premultiply(surf) for surf in (effect.particle_flipbook.surfaces if effect.particle_flipbook is not None else [effect.main_texture])]
+    half_sizes = np.array([(surf.get_width() // 2, surf.get_height() // 2) for surf in surfaces])
+    sizes = np.array([surf.get_size() for surf in surfaces])
+
+    rects : list[pygame.Rect] = get_frame_rects(frames, half_sizes, sizes, bounding_box)
+    try:
+        positions, sheet_size = pack_frames([rect.size for rect in rects], max_sheet_size)
+    except ValueError as error:
+        raise ValueError(f"Particle effect '{name}' : {error}") from None
+    sheet = pygame.Surface(sheet_size, pygame.SRCALPHA)
+    for (centers, indices), rect, position in zip(frames, rects, positions):
+        if rect.width == 0 or rect.height == 0: continue
+        frame_surf : pygame.Surface = sheet.subsurface((position, rect.size))
+        topleft = (centers - half_sizes[indices] - rect.topleft).astype(int).tolist()
+        frame_surf.blits([(surfaces[index], pos, None, pygame.BLEND_PREMULTIPLIED) for index, pos in zip(indices.tolist(), topleft)], doreturn=False)
+    os.makedirs(sheet_dir, exist_ok=True)
+    sheet_path : str = os.path.join(sheet_dir, f'{name}.png').replace('\\', '/')
+    pygame.image.save(sheet, sheet_path)
+    return BakedEffect(name=name, source_key=get_descriptor_key(descriptor), sheet=sheet_path, 
+                       frames=tuple((*position, *rect.size, *rect.topleft) if rect.width and rect.height else (0, 0, 0, 0, 0, 0)
+                                    for position, rect in zip(positions, rects)),
+                       frame_rate=frame_rate, premultiplied=True)
+
+def bake_effects(descriptors : list[EffectDescriptor], max_workers : int|None = None, **options) -> dict[str, BakedEffect]:
+    '''Bakes every descriptor, spread over a pool of worker processes. options are passed on to bake_effect.'''
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = {descriptor.name : executor.submit(bake_effect, descriptor, **options) for descriptor in descriptors}
+        return {name : future.result() for name, future in futures.items()}
+
+def save_bake_index(baked : dict[str, BakedEffect], path : str = BAKED_EFFECTS_PATH):
+    '''Writes baked into the bake index, keeping the entries of effects that were not rebaked.'''
+    entries : dict[str, dict] = {}
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            entries = {entry['name'] : entry for entry in json.load(file)}
+    entries.update((name, info._asdict()) for name, info in baked.items())
+    with open(path, 'w') as file:
+        json.dump(list(entries.values()), file, indent=4)
+
+def main():
+    parser = argparse.ArgumentParser(description='Bakes particle effects into flipbooks.')
+    parser.add_argument('names', nargs='*', help='effects to bake (default : every effect of the library)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--frame-rate', type=float, default=30)
+    parser.add_argument('--max-duration', type=float, default=10)
+    parser.add_argument('--max-extent', type=int, default=2048)
+    parser.add_argument('--max-sheet-size', type=int, default=4096)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    names : list[str] = args.names or list(ParticleEffect.descriptors)
+    unknown = [name for name in names if name not in ParticleEffect.descriptors]
+    if unknown: parser.error(f'unknown effects {unknown}')
+    baked = bake_effects([ParticleEffect.descriptors[name] for name in names], args.workers, seed=args.seed, frame_rate=args.frame_rate,
+                         max_duration=args.max_duration, max_extent=args.max_extent,
+                         max_sheet_size=args.max_sheet_size)
+    save_bake_index(baked)
+    for info in baked.values():
+        print(f'{info.name} : {len(info.frames)} frames -> {info.sheet}')
+
+if __name__ == '__main__':
+    main()
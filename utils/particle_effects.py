@@ -4,9 +4,25 @@ from utils.animation import Animation
 import utils.interpolation as interpolation
 from random import random
 from math import sin, radians, cos, atan2
-from game.sprite import Sprite
+from game.sprite import Sprite, SpillPolicy
 from utils.pivot_2d import Pivot2D
-from typing import TypedDict, Literal, Union, TypeAlias
+from utils.particle_arrays import ParticleArrays
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.render_batch import RenderBatch
+from utils.asset_cache import load_compiled
+from utils.particle_textures import VariantSpec, TextureVariants, ParticleFlipbook, texture_registry
+try:
+    from utils.particle_worker import ParticleWorker, SharedParticleArrays, particle_worker
+except ImportError:
+    particle_worker = None
+from enum import Enum
+from hashlib import sha1
+import json
+import os
+from typing import TypedDict, Literal, Union, TypeAlias, NamedTuple, Any
 
 def __random_float(a, b):
     return random() * (b-a) + a
@@ -28,6 +44,7 @@ def get_vec_angle(vec : pygame.Vector2) -> float:
 
 NumberRange : TypeAlias = Union[float, tuple[float, float], list[float]]
 UpdateMethod : TypeAlias = Literal['simulated', 'animated', 'spiral']
+BlendMode : TypeAlias = Literal['normal', 'additive', 'premultiplied']
 
 class EffectData(TypedDict):
     offset_x : NumberRange
@@ -51,11 +68,245 @@ class EffectData(TypedDict):
     destroy_offscreen : bool
     copy_surface : bool
     type : None|str
+    priority : int
+    critical : bool
+    tint : None|tuple[tuple[int, int, int], tuple[int, int, int]]
+    fade : None|tuple[float, float]
+    scale : None|tuple[float, float]
+    variant_steps : int
+    frames : None|list[pygame.Surface]
+    frame_duration : float
+    loop_frames : bool
+    blend_mode : BlendMode
+
+class UpdateMethodKind(str, Enum):
+    '''Compiled update method. Members compare equal to the plain UpdateMethod strings.'''
+    SIMULATED = 'simulated'
+    ANIMATED = 'animated'
+    SPIRAL = 'spiral'
+
+RangeTuple : TypeAlias = tuple[float, float]
+
+class EffectDescriptor(NamedTuple):
+    '''Validated, immutable form of an effect definition, as compiled from the JSON effect library.
+    Ranges are normalized to (low, high) tuples (None where the field is unset), textures are kept as asset paths.'''
+    name : str
+    offset_x : RangeTuple
+    offset_y : RangeTuple
+    velocity_x : RangeTuple|None
+    velocity_y : RangeTuple|None
+    angle : RangeTuple|None
+    speed : RangeTuple|None
+    accel_x : RangeTuple|None
+    accel_y : RangeTuple|None
+    drag : RangeTuple|None
+    lifetime : RangeTuple
+    init_spawn_count : int
+    cooldown : float
+    target_spawn_count : int
+    part_per_wave : int
+    main_texture : str|None
+    alt_textures : tuple[str, ...]|None
+    update_method : UpdateMethodKind
+    destroy_offscreen : bool
+    copy_surface : bool
+    type : str|None
+    priority : int
+    critical : bool
+    tint : tuple[tuple[int, int, int], tuple[int, int, int]]|None
+    fade : RangeTuple|None
+    scale : RangeTuple|None
+    variant_steps : int
+    frames : tuple[str, ...]|None
+    frame_duration : float
+    loop_frames : bool
+    blend_mode : str
+
+    def to_effect_data(self) -> EffectData:
+        '''Builds the EffectData used at runtime, with textures loaded.'''
+        data : dict[str, Any] = self._asdict()
+        del data['name']
+        for field in EffectSampler.fields:
+            if data[field] is not None: data[field] = list(data[field])
+        data['main_texture'] = get_particle_texture(self.main_texture)
+        data['alt_textures'] = None if self.alt_textures is None else [get_particle_texture(path) for path in self.alt_textures]
+        data['frames'] = None if self.frames is None else [get_particle_texture(path) for path in self.frames]
+        data['animation'] = None
+        return data
+
+_particle_textures : dict[str, pygame.Surface] = {}
+
+def get_particle_texture(path : str|None) -> pygame.Surface:
+    '''Returns the texture at path, loaded once and shared. None gives the default particle texture.'''
+    if path is None: return Particle.test_image
+    texture = _particle_textures.get(path)
+    if texture is None:
+        texture = _particle_textures[path] = pygame.image.load(path)
+    return texture
+
+REQUIRED_RANGES : tuple[str, ...] = ('offset_x', 'offset_y', 'lifetime')
+
+def normalize_range(effect_name : str, field : str, value : Any) -> RangeTuple|None:
+    if value is None:
+        if field in REQUIRED_RANGES: raise ValueError(f"Particle effect '{effect_name}' : {field} cannot be null")
+        return None
+    if type(value) in (int, float): return (float(value), float(value))
+    if type(value) != list or len(value) != 2 or any(type(bound) not in (int, float) for bound in value):
+        raise ValueError(f"Particle effect '{effect_name}' : {field} must be a number or a [low, high] pair, got {value!r}")
+    return (float(min(value)), float(max(value)))
+
+def compile_effect(name : str, raw : dict[str, Any]) -> EffectDescriptor:
+    '''Validates one JSON effect definition and compiles it. Missing keys take their value from TEMPLATE.'''
+    unknown = raw.keys() - TEMPLATE.keys()
+    if unknown: raise ValueError(f"Particle effect '{name}' : unknown keys {sorted(unknown)}")
+    values : dict[str, Any] = {**TEMPLATE, 'main_texture' : None, **raw}
+    if values['animation'] is not None: raise ValueError(f"Particle effect '{name}' : animations cannot be set from data")
+    try:
+        update_method = UpdateMethodKind(values['update_method'])
+    except ValueError:
+        raise ValueError(f"Particle effect '{name}' : unknown update method {values['update_method']!r}") from None
+    for field in ('init_spawn_count', 'target_spawn_count', 'part_per_wave', 'priority', 'variant_steps'):
+        if type(values[field]) != int or values[field] < 0: 
+            raise ValueError(f"Particle effect '{name}' : {field} must be a positive integer")
+    if type(values['cooldown']) not in (int, float) or values['cooldown'] <= 0: 
+        raise ValueError(f"Particle effect '{name}' : cooldown must be a number above 0")
+    if values['variant_steps'] < 1: raise ValueError(f"Particle effect '{name}' : variant_steps must be at least 1")
+    tint = values['tint']
+    if tint is not None:
+        if (type(tint) != list or len(tint) != 2 or 
+            any(type(color) != list or len(color) != 3 or any(type(channel) != int or not 0 <= channel <= 255 for channel in color) for color in tint)):
+            raise ValueError(f"Particle effect '{name}' : tint must be a pair of [r, g, b] colors")
+        tint = (tuple(tint[0]), tuple(tint[1]))
+    for field in ('fade', 'scale'):
+        value = values[field]
+        if value is not None and (type(value) != list or len(value) != 2 or any(type(bound) not in (int, float) or bound < 0 for bound in value)):
+            raise ValueError(f"Particle effect '{name}' : {field} must be a [start, end] pair of positive numbers")
+    frames = values['frames']
+    if frames is not None:
+        if type(frames) != list or not frames or any(type(path) != str for path in frames):
+            raise ValueError(f"Particle effect '{name}' : frames must be a non-empty list of texture paths")
+        if tint is not None or values['fade'] is not None or values['scale'] is not None:
+            raise ValueError(f"Particle effect '{name}' : frames cannot be combined with tint, fade or scale")
+    if type(values['frame_duration']) not in (int, float) or values['frame_duration'] <= 0: 
+        raise ValueError(f"Particle effect '{name}' : frame_duration must be a number above 0")
+    if values['blend_mode'] not in ParticleEffect.blend_modes:
+        raise ValueError(f"Particle effect '{name}' : unknown blend mode {values['blend_mode']!r}")
+    if update_method == UpdateMethodKind.ANIMATED and frames is None:
+        raise ValueError(f"Particle effect '{name}' : 'animated' effects loaded from data need frames")
+    alt_textures = values['alt_textures']
+    return EffectDescriptor(name=name, 
+                            **{field : normalize_range(name, field, values[field]) for field in EffectSampler.fields},
+                            init_spawn_count=values['init_spawn_count'], cooldown=float(values['cooldown']),
+                            target_spawn_count=values['target_spawn_count'], part_per_wave=values['part_per_wave'],
+                            main_texture=values['main_texture'], alt_textures=None if alt_textures is None else tuple(alt_textures),
+                            update_method=update_method, destroy_offscreen=bool(values['destroy_offscreen']),
+                            copy_surface=bool(values['copy_surface']), type=values['type'],
+                            priority=values['priority'], critical=bool(values['critical']), tint=tint, 
+                            fade=None if values['fade'] is None else tuple(values['fade']),
+                            scale=None if values['scale'] is None else tuple(values['scale']), variant_steps=values['variant_steps'],
+                            frames=None if frames is None else tuple(frames), frame_duration=float(values['frame_duration']),
+                            loop_frames=bool(values['loop_frames']), blend_mode=values['blend_mode'])
+
+def compile_effect_library(raw : dict[str, dict[str, Any]]) -> dict[str, EffectDescriptor]:
+    return {name : compile_effect(name, effect) for name, effect in raw.items()}
+
+def load_effect_library(path : str):
+    '''Loads (or reuses the compiled cache of) a JSON effect library and registers its effects.'''
+    descriptors : dict[str, EffectDescriptor] = load_compiled(path, compile_effect_library, version=4)
+    ParticleEffect.descriptors.update(descriptors)
+    for name, descriptor in descriptors.items():
+        ParticleEffect.effects_data[name] = descriptor.to_effect_data()
+
+def get_descriptor_key(descriptor : EffectDescriptor) -> str:
+    '''Identifies the exact definition a bake was made from, so editing an effect invalidates its bake.'''
+    return sha1(repr(descriptor).encode()).hexdigest()
+
+class BakedEffect(NamedTuple):
+    '''A whole effect pre-rendered by utils.particle_baker into a sprite sheet. Every frame is cropped to the pixels it uses :
+    frames holds (x, y, width, height, offset_x, offset_y) per frame, the rect of the frame in the sheet and the position of its topleft
+    relative to the effect's origin. Frames without any particle are 0 x 0.'''
+    name : str
+    source_key : str
+    sheet : str
+    frames : tuple[tuple[int, int, int, int, int, int], ...]
+    frame_rate : float
+    premultiplied : bool
+
+class BakedFlipbook:
+    '''Runtime form of a BakedEffect. A track playing it draws a single frame per render, whatever the particle count.
+    The sheet is only read from disk by load, which ParticleEffect.play calls the first time the effect is played.
+    Sheets are premultiplied, so the frames are drawn with BLEND_PREMULTIPLIED unless the effect blends them another way.'''
+    def __init__(self, baked : BakedEffect) -> None:
+        self.baked : BakedEffect = baked
+        self.frames : list[pygame.Surface|None]|None = None
+        self.offsets : list[tuple[int, int]] = [(offset_x, offset_y) for _, _, _, _, offset_x, offset_y in baked.frames]
+        self.frame_rate : float = baked.frame_rate
+        self.duration : float = len(baked.frames) / baked.frame_rate
+        self.blend_flags : int = pygame.BLEND_PREMULTIPLIED if baked.premultiplied else 0
+    
+    def load(self):
+        if self.frames is not None: return
+        sheet : pygame.Surface = pygame.image.load(self.baked.sheet)
+        self.frames = [sheet.subsurface((x, y, width, height)) if width and height else None for x, y, width, height, _, _ in self.baked.frames]
+    
+    def is_over(self, elapsed : float) -> bool:
+        return elapsed >= self.duration
+    
+    def draw(self, batch : RenderBatch, position : pygame.Vector2, elapsed : float, blend_flags : int = 0):
+        if self.frames is None: self.load()
+        index : int = int(elapsed * self.frame_rate)
+        if index < 0 or index >= len(self.frames) or self.frames[index] is None: return
+        offset_x, offset_y = self.offsets[index]
+        batch.add(self.frames[index], (round(position[0]) + offset_x, round(position[1]) + offset_y), blend_flags or self.blend_flags)
+
+def load_baked_effects(path : str):
+    '''Registers the flipbooks listed in a bake index, without loading their sheets. 
+    Bakes of effects that changed since, or made with an older version of the baker, are ignored.'''
+    if not os.path.exists(path): return
+    with open(path, 'r') as file:
+        entries : list[dict[str, Any]] = json.load(file)
+    for entry in entries:
+        if entry.keys() != set(BakedEffect._fields): continue
+        baked = BakedEffect(**{**entry, 'frames' : tuple(tuple(frame) for frame in entry['frames'])})
+        descriptor : EffectDescriptor|None = ParticleEffect.descriptors.get(baked.name)
+        if descriptor is None or get_descriptor_key(descriptor) != baked.source_key: continue
+        ParticleEffect.flipbooks[baked.name] = BakedFlipbook(baked)
+
+class EffectSampler:
+    '''The random ranges of an EffectData compiled once.
+    A wave of particles is then drawn with a single RNG call, one column per field. Fields set to None come out as None.'''
+    fields : tuple[str, ...] = ('offset_x', 'offset_y', 'velocity_x', 'velocity_y', 'angle', 'speed', 
+                                'accel_x', 'accel_y', 'drag', 'lifetime')
+    def __init__(self, data : EffectData) -> None:
+        self.missing : set[str] = set()
+        lows : list[float] = []
+        spans : list[float] = []
+        for field in self.fields:
+            value : NumberRange|None = data.get(field)
+            if value is None:
+                self.missing.add(field)
+                lows.append(0)
+                spans.append(0)
+            elif type(value) == int or type(value) == float:
+                lows.append(value)
+                spans.append(0)
+            else:
+                lows.append(value[0])
+                spans.append(value[1] - value[0])
+        self.lows : np.ndarray = np.array(lows, dtype=float)
+        self.spans : np.ndarray = np.array(spans, dtype=float)
+
+    def sample(self, rng : 'np.random.Generator', count : int) -> dict[str, 'np.ndarray|None']:
+        values = self.lows + rng.random((count, len(self.fields))) * self.spans
+        return {field : (None if field in self.missing else values[:, index]) for index, field in enumerate(self.fields)}
 
 class Particle(Sprite):
     active_elements : list['Particle'] = []
     inactive_elements : list['Particle']  = []
     linked_classes : list[Sprite] = [Sprite]
+    pool_growth : int = 64
+    pool_limit : int = 2000
+    spill_policy : SpillPolicy = 'recycle'
 
     test_image = pygame.surface.Surface((4,4))
     pygame.draw.rect(test_image, 'White', (0, 0, 4, 4))
@@ -65,6 +316,9 @@ class Particle(Sprite):
         super().__init__()
         self.lifetime : float
         self.lifetime_timer : Timer
+        self.expiry_scheduled : bool = False
+        self.track : ParticleEffectTrack|None = None
+        self._track_slot : int = 0
 
         self.velocity : pygame.Vector2
         self.acceleration : pygame.Vector2
@@ -72,13 +326,15 @@ class Particle(Sprite):
 
         self.update_method : UpdateMethod = 'simulated'
         self.textures : list[pygame.Surface]
+        self.variants : TextureVariants|None = None
+        self.variant_index : int = 0
+        self.flipbook : ParticleFlipbook|None = None
         self.kill_offscreen = True
-        Particle.inactive_elements.append(self)
+        Particle.add_to_pool(self)
     
     def spawn(self, pos, lifetime, update_method, main_texture : pygame.Surface, velocity = None, accel = None, drag = None, 
               alt_textures = None, anim : Animation = None, destroy_offscreen : bool = False, angle = None, mag = None, copy_surf = False,
-              time_source : TimeSource|None = None):
-        self.zindex = 100
+              time_source : TimeSource|None = None, variants : TextureVariants|None = None, flipbook : ParticleFlipbook|None = None):
         self._position = pos
         self.update_method = update_method
         if copy_surf is False:
@@ -88,6 +344,11 @@ class Particle(Sprite):
             self.image = main_texture.copy()
             if alt_textures is None: self.textures = []
             else: self.textures = [surf.copy() for surf in alt_textures]
+        self.variants = variants
+        self.flipbook = flipbook
+        self.variant_index = 0
+        if variants is not None: self.image = variants.surfaces[0]
+        elif flipbook is not None: self.image = flipbook.surfaces[0]
 
         self.rect = self.image.get_rect()
         self.rect.center = self.position
@@ -114,16 +375,21 @@ class Particle(Sprite):
             self.anim_track = None
         
         Particle.unpool(self)
-        self.rect.center = self.pivot.position
+        self.expiry_scheduled = self.schedule_expiry(lifetime, time_source)
+        self.rect.center = self.pivot.position if self.update_method == 'spiral' else self.position
     
     def update(self, delta : float):
-        if self.lifetime_timer.isover():
+        if not self.expiry_scheduled and self.lifetime_timer.isover():
             self.kill_instance_safe()
             return
         if self.kill_offscreen:
             if self.rect.colliderect(Particle.bounding_box) is False:
                 self.kill_instance_safe()
                 return
+        if self.variants is not None:
+            self.update_variant()
+        elif self.flipbook is not None:
+            self.update_frame()
         if self.update_method == 'simulated':
             self.velocity *=  ((1 - self.drag) ** delta) ** 0.5
 
@@ -149,12 +415,42 @@ class Particle(Sprite):
                 self.anim_track.update()
         
         elif self.update_method == 'animated':
-            self.anim_track.update()
+            if self.anim_track is not None: self.anim_track.update()
+    
+    def update_variant(self):
+        '''Switches to the texture variant matching the particle's age.'''
+        index : int = self.variants.index_at(self.lifetime_timer.get_time() / self.lifetime) if self.lifetime > 0 else 0
+        if index == self.variant_index: return
+        self.variant_index = index
+        center = self.rect.center
+        self.image = self.variants.surfaces[index]
+        self.rect = self.image.get_rect(center=center)
+    
+    def update_frame(self):
+        '''Switches to the flipbook frame matching the particle's age.'''
+        index : int = self.flipbook.index_at(self.lifetime_timer.get_time())
+        if index == self.variant_index: return
+        self.variant_index = index
+        center = self.rect.center
+        self.image = self.flipbook.surfaces[index]
+        self.rect = self.image.get_rect(center=center)
+    
+    @classmethod
+    def update_class(cls, delta : float):
+        for effect in ParticleEffect.elements:
+            effect.update_particles(delta)
+        if particle_worker is not None: particle_worker.sync()
+    
+    @classmethod
+    def kill_class(cls):
+        for effect in ParticleEffect.elements:
+            for track in effect.tracks:
+                if track.particles is not None: track.particles.clear()
     
-    def draw(self, display : pygame.Surface):
-        display.blit(self.image, self.rect)
-
     def clean_instance(self):
+        if self.track is not None: self.track.release(self)
+        self.variants = None
+        self.flipbook = None
         self._position = None
         self.lifetime = None
         self.lifetime_timer = None
@@ -172,11 +468,112 @@ class Particle(Sprite):
 
 for _ in range(100):
     Particle()
+Sprite.register_class(Particle)
+
+class ParticleBudget:
+    '''Limits what all particle effects emit together.
+    Emission is capped per frame (emission_budget) and overall (max_live). When the average frame time goes over
+    target_frame_time (in delta units, 1 is a 60 fps frame) the level of detail is lowered one step at a time:
+    each effect is throttled by level - priority steps, which halves its part_per_wave, then doubles its cooldown,
+    then skips its waves. Critical effects are never throttled nor capped. Every change is reported to the debug overlay,
+    with how many effects currently have their part_per_wave halved, their cooldown doubled and their waves skipped.'''
+    max_level : int = 3
+    def __init__(self, max_live : int = 20000, emission_budget : int = 2000, target_frame_time : float = 1.15, 
+                 settle_frames : int = 30) -> None:
+        self.max_live : int = max_live
+        self.emission_budget : int = emission_budget
+        self.target_frame_time : float = target_frame_time
+        self.settle_frames : int = settle_frames
+        self.level : int = 0
+        self.frames_since_change : int = 0
+        self.emitted_this_frame : int = 0
+        self.live_count : int = 0
+        self.dropped_this_frame : int = 0
+        self.last_report : str = ''
+        self.last_frame_time : float = 0
+        self.throttle_counts : tuple[int, int, int] = (0, 0, 0)
+
+    def begin_frame(self, frame_time : float, live_count : int, effects : list['ParticleEffect']):
+        if self.dropped_this_frame:
+            self.report(f'Particles capped : {self.dropped_this_frame} dropped')
+        self.emitted_this_frame = 0
+        self.dropped_this_frame = 0
+        self.live_count = live_count
+        self.frames_since_change += 1
+        if self.frames_since_change >= self.settle_frames:
+            if frame_time > self.target_frame_time and self.level < self.max_level:
+                self.set_level(self.level + 1, frame_time)
+            elif frame_time < self.target_frame_time * 0.8 and self.level > 0:
+                self.set_level(self.level - 1, frame_time)
+        if self.level > 0: self.report_throttles(effects)
+
+    def set_level(self, level : int, frame_time : float):
+        self.level = level
+        self.frames_since_change = 0
+        self.last_frame_time = frame_time
+        if level == 0: 
+            self.throttle_counts = (0, 0, 0)
+            self.report(f'Particle LOD 0 (frame time {frame_time:.2f})')
+
+    def get_throttle_counts(self, effects : list['ParticleEffect']) -> tuple[int, int, int]:
+        '''Returns how many of effects have their part_per_wave halved, their cooldown doubled and their waves skipped.'''
+        halved : int = 0
+        doubled : int = 0
+        skipped : int = 0
+        for effect in effects:
+            throttle : int = self.get_throttle(effect)
+            if throttle >= 3: skipped += 1
+            elif throttle >= 1:
+                halved += 1
+                if throttle == 2: doubled += 1
+        return (halved, doubled, skipped)
+
+    def report_throttles(self, effects : list['ParticleEffect']):
+        counts : tuple[int, int, int] = self.get_throttle_counts(effects)
+        if counts == self.throttle_counts and self.frames_since_change: return
+        self.throttle_counts = counts
+        halved, doubled, skipped = counts
+        self.report(f'Particle LOD {self.level} (frame time {self.last_frame_time:.2f}) : '
+                    f'{halved} halved, {doubled} slowed down, {skipped} skipped')
+
+    def report(self, message : str):
+        if message == self.last_report: return
+        self.last_report = message
+        core_object.set_debug_message(message)
+
+    def get_throttle(self, effect : 'ParticleEffect') -> int:
+        if effect.critical: return 0
+        return max(0, self.level - effect.priority)
+
+    def get_wave_size(self, effect : 'ParticleEffect', part_per_wave : int) -> int:
+        throttle : int = self.get_throttle(effect)
+        if throttle >= 3: return 0
+        if throttle >= 1: return max(1, part_per_wave // 2)
+        return part_per_wave
+
+    def get_cooldown(self, effect : 'ParticleEffect', cooldown : float) -> float:
+        return cooldown * 2 if self.get_throttle(effect) >= 2 else cooldown
+
+    def allow(self, effect : 'ParticleEffect', count : int) -> int:
+        '''Returns how many of count particles effect may emit right now and books them.'''
+        if not effect.critical:
+            allowed : int = max(0, min(count, self.emission_budget - self.emitted_this_frame, self.max_live - self.live_count))
+            self.dropped_this_frame += count - allowed
+            count = allowed
+        self.emitted_this_frame += count
+        self.live_count += count
+        return count
 
 class ParticleEffect:
     elements : list['ParticleEffect'] = []
     effects_data : dict[str, EffectData] = {}
+    descriptors : dict[str, EffectDescriptor] = {}
+    flipbooks : dict[str, BakedFlipbook] = {}
     special_effect_name_dict : dict[str, 'ParticleEffect'] = {}
+    shared_rng : 'np.random.Generator|None' = np.random.default_rng() if np is not None else None
+    budget : ParticleBudget = ParticleBudget()
+    render_batch : RenderBatch = RenderBatch()
+    blend_modes : dict[str, int] = {'normal' : 0, 'additive' : pygame.BLEND_RGB_ADD, 'premultiplied' : pygame.BLEND_PREMULTIPLIED}
     def __init__(self, data : EffectData, persistance : bool, dynamic_origin : bool = False) -> None:
         self.data : EffectData = data
         ParticleEffect.elements.append(self)
@@ -188,6 +585,64 @@ class ParticleEffect:
         self.dynamic_origin : bool = dynamic_origin
         self.position : pygame.Vector2 = pygame.Vector2(0,0)
         self._zombie : bool = False
+        self.priority : int = data.get('priority', 0)
+        self.critical : bool = data.get('critical', False)
+        self.use_arrays : bool = ParticleEffect.can_use_arrays(data)
+        self.sampler : EffectSampler|None = EffectSampler(data) if np is not None else None
+        self.main_texture : pygame.Surface = data['main_texture'].copy() if data['copy_surface'] else data['main_texture']
+        self.alt_textures : list[pygame.Surface]|None = data['alt_textures']
+        if data['copy_surface'] and data['alt_textures'] is not None:
+            self.alt_textures = [surf.copy() for surf in data['alt_textures']]
+        spec : VariantSpec|None = ParticleEffect.get_variant_spec(data) #Variants are baked from the shared texture, not from the copy
+        self.variants : TextureVariants|None = None if spec is None else texture_registry.get_variants(data['main_texture'], spec)
+        self.particle_flipbook : ParticleFlipbook|None = None
+        if data.get('frames'):
+            self.particle_flipbook = ParticleFlipbook(data['frames'], data.get('frame_duration', 0.1), data.get('loop_frames', True))
+        self.blend_flags : int = ParticleEffect.blend_modes[data.get('blend_mode', 'normal')]
+        if self.blend_flags == 0 and self.variants is not None: self.blend_flags = TextureVariants.blend_flags
+        self.flipbook : BakedFlipbook|None = None
+        self.rng : np.random.Generator|None = ParticleEffect.shared_rng
+    
+    def set_seed(self, seed : int|None):
+        '''Gives the effect its own generator so its waves are reproducible. None goes back to the shared generator.'''
+        self.rng = ParticleEffect.shared_rng if seed is None else np.random.default_rng(seed)
+    
+    @staticmethod
+    def can_use_arrays(data : EffectData) -> bool:
+        '''Particles without an Animation are simulated in NumPy arrays instead of being sprites when NumPy is available.
+        'animated' particles qualify when their animation is a flipbook.'''
+        if np is None or data['animation'] is not None: return False
+        return data['update_method'] in ('simulated', 'spiral') or (data['update_method'] == 'animated' and bool(data.get('frames')))
+    
+    @staticmethod
+    def get_variant_spec(data : EffectData) -> VariantSpec|None:
+        '''Returns how the texture changes over a particle's life, or None if it never does.'''
+        tint, fade, scale = data.get('tint'), data.get('fade'), data.get('scale')
+        if tint is None and fade is None and scale is None: return None
+        return VariantSpec(data.get('variant_steps', 8), None if tint is None else (tuple(tint[0]), tuple(tint[1])),
+                           None if fade is None else tuple(fade), None if scale is None else tuple(scale))
+    
+    def new_particle_arrays(self) -> ParticleArrays:
+        image : pygame.Surface = self.main_texture if self.particle_flipbook is None else self.particle_flipbook.surfaces[0]
+        if particle_worker is not None and particle_worker.is_running():
+            return SharedParticleArrays(particle_worker, self.data['update_method'], image, Particle.bounding_box, 
+                                        variants=self.variants, flipbook=self.particle_flipbook)
+        return ParticleArrays(self.data['update_method'], image, Particle.bounding_box, variants=self.variants, flipbook=self.particle_flipbook)
+    
+    @classmethod
+    def set_worker_mode(cls, enabled : bool) -> bool:
+        '''Moves the simulation of array backed particles to a worker process, which steps them one frame ahead of rendering.
+        Returns whether the mode could be applied (it needs NumPy and a platform that can fork).'''
+        if particle_worker is None or not ParticleWorker.is_supported(): return not enabled
+        if enabled:
+            particle_worker.start()
+            return True
+        particle_worker.wait_step()
+        for effect in cls.elements:
+            for track in effect.tracks:
+                if isinstance(track.particles, SharedParticleArrays): track.particles = track.particles.to_local()
+        particle_worker.stop()
+        return True
     
     @classmethod
     def load_effect(cls, name : str, persistance : bool = False, dynamic_origin : bool = False):
@@ -195,44 +650,145 @@ class ParticleEffect:
         effect_data : EffectData = cls.effects_data[name]
         effect_type : str = effect_data['type']
         if effect_type is None:
-            return ParticleEffect(effect_data, persistance, dynamic_origin)
-        special_effect_class = ParticleEffect.special_effect_name_dict.get(effect_type, SpecialParticleEffect)
-        return special_effect_class(effect_data, persistance, dynamic_origin)
+            effect = ParticleEffect(effect_data, persistance, dynamic_origin)
+        else:
+            special_effect_class = ParticleEffect.special_effect_name_dict.get(effect_type, SpecialParticleEffect)
+            effect = special_effect_class(effect_data, persistance, dynamic_origin)
+        effect.flipbook = cls.flipbooks.get(name)
+        return effect
     
-    def emit(self, track : 'ParticleEffectTrack'):
-        new_particle : Particle = Particle.inactive_elements[0]
-
-        offset = pygame.Vector2(rand_float(self.data['offset_x']), rand_float(self.data['offset_y']))
+    def emit(self, track : 'ParticleEffectTrack', values : dict[str, float|None]|None = None):
+        '''Emits one particle. values holds the sampled value of every EffectSampler field, they are drawn from the ranges of data if omitted.'''
+        if not self.use_arrays:
+            new_particle : Particle|None = Particle.get_inactive()
+            if new_particle is None: return
+        ranges = self.data if values is None else values
+
+        offset = pygame.Vector2(rand_float(ranges['offset_x']), rand_float(ranges['offset_y']))
         if not self.dynamic_origin:
             new_pos = track.origin + offset
         else:
             new_pos = self.position + offset
 
-        life = rand_float(self.data['lifetime'])
-        if (self.data['velocity_x'] is None) or (self.data['velocity_y'] is None):
+        life = rand_float(ranges['lifetime'])
+        if (ranges['velocity_x'] is None) or (ranges['velocity_y'] is None):
             velocity = None
         else:
-            velocity = pygame.Vector2(rand_float(self.data['velocity_x']), rand_float(self.data['velocity_y']))
-        drag = rand_float(self.data['drag'])
-        accel = pygame.Vector2(rand_float(self.data['accel_x']), rand_float(self.data['accel_y']))
+            velocity = pygame.Vector2(rand_float(ranges['velocity_x']), rand_float(ranges['velocity_y']))
+        drag = rand_float(ranges['drag'])
+        accel = pygame.Vector2(rand_float(ranges['accel_x']), rand_float(ranges['accel_y']))
         kill_offscreen = self.data.get('destroy_offscreen', True)
-        angle = rand_float(self.data['angle'])
-        mag = rand_float(self.data['speed'])
-        new_particle.spawn(new_pos, life, self.data['update_method'], self.data['main_texture'], 
-                           velocity=velocity, accel=accel, drag=drag, alt_textures=self.data['alt_textures'], anim=self.data['animation'], 
-                           destroy_offscreen=kill_offscreen, angle=angle, mag=mag, copy_surf = self.data['copy_surface'],
-                           time_source=track.time_source)
+        angle = rand_float(ranges['angle'])
+        mag = rand_float(ranges['speed'])
+        if self.use_arrays:
+            self.emit_array(track, new_pos, life, velocity, accel, drag, kill_offscreen, angle, mag)
+            track.total_count += 1
+            return
+        new_particle.spawn(new_pos, life, self.data['update_method'], self.main_texture, 
+                           velocity=velocity, accel=accel, drag=drag, alt_textures=self.alt_textures, anim=self.data['animation'], 
+                           destroy_offscreen=kill_offscreen, angle=angle, mag=mag, time_source=track.time_source, variants=self.variants,
+                           flipbook=self.particle_flipbook)
         
-        track.active.append(new_particle)
+        track.adopt(new_particle)
         track.total_count += 1
     
+    def emit_array(self, track : 'ParticleEffectTrack', pos : pygame.Vector2, life : float, velocity : pygame.Vector2|None,
+                   accel : pygame.Vector2, drag : float|None, kill_offscreen : bool, angle : float|None, mag : float|None):
+        '''Same as Particle.spawn, but the particle becomes a row of the track's ParticleArrays.'''
+        if track.particles is None: track.particles = self.new_particle_arrays()
+        now : float = track.timer.get_timestamp()
+        expire_time : float = now + life if life >= 0 else float('inf')
+        velocity = velocity or pygame.Vector2(0, 0)
+        if self.data['update_method'] == 'spiral':
+            track.particles.spawn(pos, velocity, accel, drag or 0, expire_time, kill_offscreen, -angle, mag or 1, birth_time=now)
+            return
+        if angle is not None:
+            velocity = velocity + vec_from_angle(angle, 1 if mag is None else mag)
+        track.particles.spawn(pos, velocity, accel, drag or 0, expire_time, kill_offscreen, birth_time=now)
+    
+    def emit_wave(self, track : 'ParticleEffectTrack', count : int):
+        '''Emits count particles. Array backed effects sample and insert the whole wave at once.
+        Sprite particles are spawned one by one, from the same samples when NumPy is available so both follow the effect's seed.'''
+        if count <= 0: return
+        if not self.use_arrays:
+            if self.sampler is None:
+                for _ in range(count):
+                    self.emit(track)
+                return
+            columns = {field : (None if column is None else column.tolist()) for field, column in self.sampler.sample(self.rng, count).items()}
+            for index in range(count):
+                self.emit(track, {field : (None if column is None else column[index]) for field, column in columns.items()})
+            return
+        data : EffectData = self.data
+        values = self.sampler.sample(self.rng, count)
+        zeros = np.zeros(count)
+        origin = self.position if self.dynamic_origin else track.origin
+        positions = np.stack((values['offset_x'] + origin[0], values['offset_y'] + origin[1]), axis=1)
+        if values['velocity_x'] is None or values['velocity_y'] is None:
+            velocities = np.zeros((count, 2))
+        else:
+            velocities = np.stack((values['velocity_x'], values['velocity_y']), axis=1)
+        accels = np.stack((values['accel_x'] if values['accel_x'] is not None else zeros,
+                           values['accel_y'] if values['accel_y'] is not None else zeros), axis=1)
+        drags = values['drag'] if values['drag'] is not None else zeros
+        lifetimes = values['lifetime']
+        now : float = track.timer.get_timestamp()
+        expire_times = np.where(lifetimes >= 0, now + lifetimes, np.inf)
+        angles = values['angle'] if values['angle'] is not None else zeros
+        speeds = values['speed']
+
+        if track.particles is None: track.particles = self.new_particle_arrays()
+        kill_offscreen : bool = data.get('destroy_offscreen', True)
+        if data['update_method'] == 'spiral':
+            radii = np.where(speeds == 0, 1, speeds) if speeds is not None else np.ones(count)
+            track.particles.spawn_many(positions, velocities, accels, drags, expire_times, kill_offscreen, -angles, radii, birth_time=now)
+        else:
+            if values['angle'] is not None:
+                magnitudes = speeds if speeds is not None else np.ones(count)
+                angle_radians = np.radians(angles)
+                velocities += np.stack((np.cos(angle_radians), -np.sin(angle_radians)), axis=1) * magnitudes[:, None]
+            track.particles.spawn_many(positions, velocities, accels, drags, expire_times, kill_offscreen, birth_time=now)
+        track.total_count += count
+    
+    def update_particles(self, delta : float):
+        for track in self.tracks:
+            if track.particles is not None: track.particles.update(delta, track.timer.get_timestamp())
+    
+    def draw_particles(self, batch : RenderBatch):
+        '''Adds every particle of the effect to batch with the effect's blend flags, so they end up in a single Surface.blits call.'''
+        blend_flags : int = self.blend_flags
+        for track in self.tracks:
+            if track.flipbook is not None:
+                track.flipbook.draw(batch, self.position if self.dynamic_origin else track.origin, track.get_elapsed(), blend_flags)
+            if track.active: batch.add_many([(particle.image, particle.rect) for particle in track.active], blend_flags)
+            if track.particles is not None: track.particles.draw(batch, track.timer.get_timestamp(), blend_flags)
+    
+    @classmethod
+    def draw_all(cls, display : pygame.Surface, batch : RenderBatch|None = None):
+        '''The particle render stage : draws every effect, after the sprites and before the UI.
+        Particles are not part of the sprite render order. The batch is flushed right away unless one was provided by the caller.'''
+        own_batch : bool = batch is None
+        if own_batch: batch = cls.render_batch
+        for effect in cls.elements:
+            effect.draw_particles(batch)
+        if own_batch: batch.flush(display)
+    
     def play(self, pos : pygame.Vector2, time_source : TimeSource|None = None) -> 'ParticleEffectTrack':
         self.started_playing_once = True
         new_track = ParticleEffectTrack(pos, self.data['cooldown'], time_source=time_source)
         self.tracks.append(new_track)
-        for _ in range(self.data['init_spawn_count']):
-            self.emit(new_track)
+        if self.flipbook is not None:
+            self.flipbook.load()
+            new_track.flipbook = self.flipbook
+            return new_track
+        self.emit_budgeted(new_track, self.data['init_spawn_count'])
         return new_track
+    
+    def emit_budgeted(self, track : 'ParticleEffectTrack', count : int):
+        '''Emits what the budget allows out of count particles. Dropped particles still count towards target_spawn_count.'''
+        allowed : int = ParticleEffect.budget.allow(self, count)
+        self.emit_wave(track, allowed)
+        track.total_count += count - allowed
 
     def update(self):
         if len(self.tracks) <= 0 and self.is_persistent == False and self.started_playing_once == True:
@@ -248,28 +804,26 @@ class ParticleEffect:
             self.tracks.remove(track)
 
     def continue_track(self, track : 'ParticleEffectTrack'):
+        if track.flipbook is not None:
+            track.ended = track.flipbook.is_over(track.get_elapsed())
+            return
+        budget : ParticleBudget = ParticleEffect.budget
+        track.timer.duration = budget.get_cooldown(self, self.data['cooldown'])
         if track.timer.isover() and track.total_count < self.data['target_spawn_count']:
             count, remainder = divmod(track.timer.get_time() , track.timer.duration)
             track.timer.restart()
             if track.can_emit:
-                for _ in range(round(count)):
-                    for _ in range(self.data['part_per_wave']):
-                        self.emit(track)
-                        if track.total_count >= self.data['target_spawn_count']: break
+                wave_size : int = budget.get_wave_size(self, self.data['part_per_wave'])
+                skipped : int = round(count) * (self.data['part_per_wave'] - wave_size)
+                wanted : int = min(round(count) * wave_size, self.data['target_spawn_count'] - track.total_count)
+                self.emit_budgeted(track, max(0, wanted))
+                track.total_count += skipped
             track.timer.start_time -= remainder
 
             
 
-        if (len(track.active) == 0) and ((track.total_count >= self.data['target_spawn_count']) or (track.can_emit == False)):
+        if (track.get_live_count() == 0) and ((track.total_count >= self.data['target_spawn_count']) or (track.can_emit == False)):
             track.ended = True
-        
-        to_del = []
-        for part in track.active:
-            if part.is_active() == False:
-                to_del.append(part)
-
-        for part in to_del:
-            track.active.remove(part)
 
     def stop(self):
         for track in self.tracks:
@@ -290,6 +844,8 @@ class ParticleEffect:
     
     @classmethod
     def update_all(cls):
+        live_count : int = sum(track.get_live_count() for element in cls.elements for track in element.tracks)
+        cls.budget.begin_frame(core_object.get_average_dt(), live_count, cls.elements)
         to_del : list[ParticleEffect] = []
         for element in cls.elements:
             element.update()
@@ -318,16 +874,43 @@ class ParticleEffectTrack:
     def __init__(self, origin, cooldown, time_source : TimeSource|None = None) -> None:
         self.total_count = 0
         self.active : list[Particle] = []
+        self.particles : ParticleArrays|None = None
         self.timer : Timer = Timer(cooldown, time_source)
         self.origin = origin
         self.ended = False
         self.can_emit = True
         self.time_source : TimeSource|None = time_source
+        self.flipbook : BakedFlipbook|None = None
+        self.start_time : float = self.timer.get_timestamp()
+    
+    def get_elapsed(self) -> float:
+        return self.timer.get_timestamp() - self.start_time
     
     def cleanup(self):
+        '''Kills every particle of the track. Sprite particles leave the track as they get cleaned up.'''
+        if self.flipbook is not None: self.ended = True
         for part in self.active:
             part.kill_instance_safe()
-        self.active.clear()
+        if self.particles is not None: self.particles.clear()
+    
+    def adopt(self, particle : Particle):
+        particle.track = self
+        particle._track_slot = len(self.active)
+        self.active.append(particle)
+    
+    def release(self, particle : Particle):
+        '''Called by a dying particle. Swap-removes it from active so the list always only holds live particles.'''
+        active = self.active
+        index : int = particle._track_slot
+        particle.track = None
+        if index >= len(active) or active[index] is not particle: return
+        last : Particle = active.pop()
+        if last is not particle:
+            active[index] = last
+            last._track_slot = index
+    
+    def get_live_count(self) -> int:
+        return len(self.active) + (len(self.particles) if self.particles is not None else 0)
     
     def stop_emission(self):
         self.can_emit = False
@@ -336,21 +919,14 @@ TEMPLATE : EffectData = {'offset_x' : [0, 0], 'offset_y' : [0, 0], 'velocity_x'
             'accel_x' : [0,0], 'accel_y' : [0,0], 'drag' : [0, 0],
             'init_spawn_count' : 0, 'cooldown' : 0.25, 'target_spawn_count' : 0, 'lifetime' : [0,0], 'part_per_wave' : 1,
             'main_texture' : Particle.test_image, 'alt_textures' : None, "animation" : None,
-            'update_method' : 'simulated', 'destroy_offscreen' : True, 'copy_surface' : False, 'type' : None}
-
-test_effect : EffectData = {'offset_x' : [0, 0], 'offset_y' : [0, 0], 'velocity_x' : [0,0], 'velocity_y' : [0,0], 'angle' : [80, 100], 'speed' : [5, 9],
-            'accel_x' : [0,0], 'accel_y' : [0.15,0.12], 'drag' : [0, 0],
-            'init_spawn_count' : 3, 'cooldown' : 0.20, 'target_spawn_count' : 35, 'lifetime' : [5,5], 'part_per_wave' : 3,
-            'main_texture' : Particle.test_image, 'alt_textures' : None, "animation" : None,
-            'update_method' : 'simulated', 'destroy_offscreen' : False, 'copy_surface' : False, 'type' : None}
-
-test_effect2 : EffectData = {'offset_x' : [0, 0], 'offset_y' : [0, 0], 'velocity_x' : [1.5,1.6], 'velocity_y' : [0.8,0.82], 'angle' : [0, 20], 'speed' : [20, 22],
-            'accel_x' : [0,0], 'accel_y' : [0.0,0.0], 'drag' : [0, 0],
-            'init_spawn_count' : 1, 'cooldown' : 0.05, 'target_spawn_count' : 35, 'lifetime' : [5,5], 'part_per_wave' : 1,
-            'main_texture' : Particle.test_image, 'alt_textures' : None, "animation" : None,
-            'update_method' : 'spiral', 'destroy_offscreen' : False, 'copy_surface' : False, 'type' : None}
-
-ParticleEffect.effects_data = {'test' : test_effect, 'test2' : test_effect2}
+            'update_method' : 'simulated', 'destroy_offscreen' : True, 'copy_surface' : False, 'type' : None,
+            'priority' : 0, 'critical' : False, 'tint' : None, 'fade' : None, 'scale' : None, 'variant_steps' : 8,
+            'frames' : None, 'frame_duration' : 0.1, 'loop_frames' : True, 'blend_mode' : 'normal'}
+
+EFFECT_LIBRARY_PATH : str = 'assets/data/particle_effects.json'
+BAKED_EFFECTS_PATH : str = 'assets/data/baked_particle_effects.json'
+load_effect_library(EFFECT_LIBRARY_PATH)
+load_baked_effects(BAKED_EFFECTS_PATH)
 
 def runtime_imports():
     global core_object
@@ -0,0 +1,91 @@
+import pygame
+import weakref
+from typing import NamedTuple
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ColorTuple = tuple[int, int, int]
+
+class VariantSpec(NamedTuple):
+    '''How a particle texture changes over a particle's life. Each set field goes from its first to its second value.'''
+    steps : int
+    tint : tuple[ColorTuple, ColorTuple]|None = None
+    fade : tuple[float, float]|None = None
+    scale : tuple[float, float]|None = None
+
+class TextureVariants:
+    '''Premultiplied variants of one texture, baked once at evenly spaced points of a particle's life.
+    Particles only keep the index of the variant they show and are drawn with BLEND_PREMULTIPLIED.'''
+    blend_flags : int = pygame.BLEND_PREMULTIPLIED
+
+    def __init__(self, base : pygame.Surface, spec : VariantSpec) -> None:
+        self.spec : VariantSpec = spec
+        self.steps : int = spec.steps
+        source = pygame.Surface(base.get_size(), pygame.SRCALPHA)
+        source.blit(base, (0, 0))
+        self.surfaces : list[pygame.Surface] = [self.bake(source, spec, step / max(1, spec.steps - 1)) for step in range(spec.steps)]
+        self.half_sizes : list[tuple[int, int]] = [(surf.get_width() // 2, surf.get_height() // 2) for surf in self.surfaces]
+
+    @staticmethod
+    def bake(source : pygame.Surface, spec : VariantSpec, t : float) -> pygame.Surface:
+        surf : pygame.Surface = source.copy()
+        if spec.scale is not None:
+            factor : float = pygame.math.lerp(spec.scale[0], spec.scale[1], t)
+            size = (max(1, round(source.get_width() * factor)), max(1, round(source.get_height() * factor)))
+            if size != source.get_size(): surf = pygame.transform.smoothscale(surf, size)
+        if spec.tint is not None:
+            color = [round(pygame.math.lerp(start, end, t)) for start, end in zip(*spec.tint)]
+            surf.fill((*color, 255), special_flags=pygame.BLEND_RGBA_MULT)
+        if spec.fade is not None:
+            alpha : int = round(pygame.math.lerp(spec.fade[0], spec.fade[1], t))
+            surf.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+        return surf.premul_alpha()
+
+    def index_at(self, age : float) -> int:
+        '''Returns the variant to show at age, the fraction of the particle's life already spent.'''
+        index : int = int(age * self.steps)
+        return 0 if index < 0 else (index if index < self.steps else self.steps - 1)
+
+class ParticleFlipbook:
+    '''Frames a particle shows one after the other, frame_duration seconds each, from the moment it spawns.
+    Particles only keep their spawn time : the frames of a whole set of particles are found in one pass with get_indices.'''
+    blend_flags : int = 0
+
+    def __init__(self, frames : list[pygame.Surface], frame_duration : float, loop : bool = True) -> None:
+        self.surfaces : list[pygame.Surface] = frames
+        self.half_sizes : list[tuple[int, int]] = [(surf.get_width() // 2, surf.get_height() // 2) for surf in frames]
+        self.frame_duration : float = frame_duration
+        self.loop : bool = loop
+
+    def index_at(self, age : float) -> int:
+        '''Returns the frame to show age seconds after spawning. Flipbooks that do not loop hold their last frame.'''
+        index : int = max(0, int(age / self.frame_duration))
+        if self.loop: return index % len(self.surfaces)
+        return min(index, len(self.surfaces) - 1)
+
+    def get_indices(self, ages : 'np.ndarray') -> 'np.ndarray':
+        indices = np.maximum((ages / self.frame_duration).astype(int), 0)
+        if self.loop: return indices % len(self.surfaces)
+        return np.minimum(indices, len(self.surfaces) - 1)
+
+class TextureRegistry:
+    '''Shares baked variants between every effect using the same texture with the same spec.
+    Textures are weakly referenced, so the variants of a texture go away with it.'''
+    def __init__(self) -> None:
+        self.variants : weakref.WeakKeyDictionary[pygame.Surface, dict[VariantSpec, TextureVariants]] = weakref.WeakKeyDictionary()
+
+    def get_variants(self, base : pygame.Surface, spec : VariantSpec) -> TextureVariants:
+        by_spec = self.variants.get(base)
+        if by_spec is None:
+            by_spec = self.variants[base] = {}
+        variants = by_spec.get(spec)
+        if variants is None:
+            variants = by_spec[spec] = TextureVariants(base, spec)
+        return variants
+
+    def clear(self):
+        self.variants.clear()
+
+texture_registry : TextureRegistry = TextureRegistry()
@@ -0,0 +1,271 @@
+import atexit
+import multiprocessing
+import weakref
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+import pygame
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from utils.particle_arrays import ParticleArrays
+from utils.particle_textures import TextureVariants, ParticleFlipbook
+
+COLUMNS : tuple[tuple[str, int, type], ...] = (('positions', 2, np.float64), ('velocities', 2, np.float64), ('accelerations', 2, np.float64),
+                                               ('drags', 1, np.float64), ('angles', 1, np.float64), ('radii', 1, np.float64),
+                                               ('expire_times', 1, np.float64), ('birth_times', 1, np.float64),
+                                               ('kill_offscreen', 1, np.bool_)) if np is not None else ()
+
+def get_block_size(capacity : int) -> int:
+    return sum(capacity * width * np.dtype(dtype).itemsize for _, width, dtype in COLUMNS)
+
+def bind_block(arrays : ParticleArrays, block : SharedMemory, capacity : int):
+    '''Points the columns of arrays at the rows stored in block.'''
+    offset : int = 0
+    for name, width, dtype in COLUMNS:
+        shape = (capacity, width) if width > 1 else (capacity,)
+        column = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        setattr(arrays, name, column)
+        offset += column.nbytes
+    arrays.capacity = capacity
+
+def copy_rows(source : ParticleArrays, target : ParticleArrays, count : int, target_start : int = 0):
+    for name, _, _ in COLUMNS:
+        getattr(target, name)[target_start:target_start + count] = getattr(source, name)[:count]
+
+class WorkerTracks:
+    '''The worker process side : the shared buffers of every registered track.'''
+    def __init__(self) -> None:
+        self.tracks : dict[int, tuple[list[SharedMemory], list[ParticleArrays]]] = {}
+
+    def attach(self, track_id : int, names : list[str], capacity : int, update_method : str, 
+               bounding_box : tuple[int, int, int, int], image_size : tuple[int, int]):
+        if track_id in self.tracks: self.detach(track_id)
+        try:
+            blocks : list[SharedMemory] = [SharedMemory(name) for name in names]
+        except FileNotFoundError:
+            return
+        buffers : list[ParticleArrays] = []
+        for block in blocks:
+            arrays = ParticleArrays(update_method, pygame.Surface(image_size), pygame.Rect(bounding_box), capacity=0)
+            bind_block(arrays, block, capacity)
+            buffers.append(arrays)
+        self.tracks[track_id] = (blocks, buffers)
+
+    def detach(self, track_id : int):
+        if track_id not in self.tracks: return
+        blocks, buffers = self.tracks.pop(track_id)
+        buffers.clear()
+        for block in blocks: block.close()
+
+    def step(self, track_id : int, front : int, count : int, delta : float, current_time : float) -> int:
+        '''Copies the front buffer into the back buffer and steps it in place. Returns the number of rows left.'''
+        if track_id not in self.tracks: return 0
+        buffers : list[ParticleArrays] = self.tracks[track_id][1]
+        target : ParticleArrays = buffers[1 - front]
+        copy_rows(buffers[front], target, count)
+        target.count = count
+        target.update(delta, current_time)
+        return target.count
+
+def worker_main(connection : Connection):
+    '''Entry point of the worker process. Each step message carries the rows to advance for every registered track,
+    the new row counts are sent back once all of them are done.'''
+    worker_tracks = WorkerTracks()
+    while True:
+        message : tuple = connection.recv()
+        kind : str = message[0]
+        if kind == 'step':
+            connection.send([worker_tracks.step(*request) for request in message[1]])
+        elif kind == 'attach':
+            worker_tracks.attach(*message[1:])
+        elif kind == 'detach':
+            worker_tracks.detach(message[1])
+        elif kind == 'stop':
+            for track_id in list(worker_tracks.tracks): worker_tracks.detach(track_id)
+            break
+
+def release_blocks(released : list[tuple[int|None, list[SharedMemory]]], track_id : int, blocks : list[SharedMemory]):
+    released.append((track_id, blocks))
+
+class SharedParticleArrays(ParticleArrays):
+    '''ParticleArrays whose rows live in two shared memory buffers stepped by a ParticleWorker.
+    The main process only reads the front buffer (the last finished step) to draw. Particles spawned during a frame are staged
+    and appended to the front buffer when the worker hands it back, right before the next step is requested.'''
+    def __init__(self, worker : 'ParticleWorker', update_method : str, image : pygame.Surface, bounding_box : pygame.Rect,
+                 capacity : int = 64, variants : TextureVariants|None = None, flipbook : ParticleFlipbook|None = None) -> None:
+        super().__init__(update_method, image, bounding_box, capacity=0, variants=variants, flipbook=flipbook)
+        self.worker : ParticleWorker = worker
+        self.staged : ParticleArrays = ParticleArrays(update_method, image, bounding_box, capacity)
+        self.track_id : int = worker.get_track_id()
+        self.blocks : list[SharedMemory] = []
+        self.front : int = 0
+        self.discard_step : bool = False
+        self.finalizer : weakref.finalize|None = None
+        self.allocate(capacity)
+
+    def allocate(self, capacity : int):
+        '''Moves the rows to new shared buffers of the given capacity and has the worker use them.'''
+        blocks : list[SharedMemory] = [SharedMemory(create=True, size=max(1, get_block_size(capacity))) for _ in range(2)]
+        if self.blocks:
+            old_front = ParticleArrays(self.update_method, self.image, self.bounding_box, capacity=0)
+            bind_block(old_front, self.blocks[self.front], self.capacity)
+            new_front = ParticleArrays(self.update_method, self.image, self.bounding_box, capacity=0)
+            bind_block(new_front, blocks[0], capacity)
+            copy_rows(old_front, new_front, self.count)
+            self.finalizer.detach()
+            self.worker.released.append((None, self.blocks))
+        self.blocks = blocks
+        self.front = 0
+        bind_block(self, blocks[0], capacity)
+        self.finalizer = weakref.finalize(self, release_blocks, self.worker.released, self.track_id, blocks)
+        self.worker.live.add(self)
+        self.worker.send(('attach', self.track_id, [block.name for block in blocks], capacity, self.update_method,
+                          tuple(self.bounding_box), self.image.get_size()))
+
+    def grow(self, new_capacity : int):
+        self.allocate(new_capacity)
+
+    def spawn(self, *args, **kwargs) -> int:
+        return self.staged.spawn(*args, **kwargs)
+
+    def spawn_many(self, *args, **kwargs):
+        self.staged.spawn_many(*args, **kwargs)
+
+    def update(self, delta : float, current_time : float):
+        self.worker.request_step(self, delta, current_time)
+
+    def finish_step(self, count : int):
+        '''Called by the worker once the back buffer holds the stepped rows.'''
+        if self.discard_step:
+            self.discard_step = False
+            return
+        self.front = 1 - self.front
+        bind_block(self, self.blocks[self.front], self.capacity)
+        self.count = count
+
+    def append_staged(self):
+        staged_count : int = self.staged.count
+        if staged_count == 0: return
+        if self.count + staged_count > self.capacity:
+            new_capacity : int = self.capacity
+            while new_capacity < self.count + staged_count: new_capacity *= 2
+            self.grow(new_capacity)
+        copy_rows(self.staged, self, staged_count, self.count)
+        self.count += staged_count
+        self.staged.clear()
+
+    def clear(self):
+        self.count = 0
+        self.staged.clear()
+        self.discard_step = self.worker.is_in_flight(self)
+
+    def to_local(self) -> ParticleArrays:
+        '''Returns a regular ParticleArrays holding the same particles, staged ones included.'''
+        local = ParticleArrays(self.update_method, self.image, self.bounding_box, max(1, self.count + self.staged.count),
+                               variants=self.variants, flipbook=self.flipbook)
+        copy_rows(self, local, self.count)
+        copy_rows(self.staged, local, self.staged.count, self.count)
+        local.count = self.count + self.staged.count
+        return local
+
+    def __len__(self):
+        return self.count + self.staged.count
+
+class ParticleWorker:
+    '''Runs the particle simulation of every SharedParticleArrays in a separate process.
+    sync is called once per frame : it collects the step requested on the previous frame, swaps the buffers,
+    appends the particles spawned since and requests the next step, which runs while the main process renders.'''
+    def __init__(self) -> None:
+        self.process : multiprocessing.Process|None = None
+        self.connection : Connection|None = None
+        self.next_track_id : int = 0
+        self.requests : list[tuple[SharedParticleArrays, float, float]] = []
+        self.in_flight : list[SharedParticleArrays]|None = None
+        self.released : list[tuple[int|None, list[SharedMemory]]] = []
+        self.outbox : list[tuple] = []
+        self.live : weakref.WeakSet[SharedParticleArrays] = weakref.WeakSet()
+
+    @staticmethod
+    def is_supported() -> bool:
+        '''The worker is forked, as a spawned process would run main.py again. This rules out Windows and web builds.'''
+        return np is not None and 'fork' in multiprocessing.get_all_start_methods()
+
+    def start(self):
+        if self.process is not None: return
+        context = multiprocessing.get_context('fork')
+        resource_tracker.ensure_running()
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+        atexit.register(self.stop)
+
+    def stop(self):
+        '''Stops the worker process. SharedParticleArrays still alive lose their buffers and must not be used afterwards.'''
+        if self.process is None: return
+        self.wait_step()
+        self.free_released()
+        for arrays in list(self.live):
+            arrays.finalizer.detach()
+            for block in arrays.blocks: block.unlink()
+        self.live.clear()
+        self.connection.send(('stop',))
+        self.process.join()
+        self.process = None
+        self.connection.close()
+        self.connection = None
+        self.requests.clear()
+        atexit.unregister(self.stop)
+
+    def is_running(self) -> bool:
+        return self.process is not None
+
+    def get_track_id(self) -> int:
+        self.next_track_id += 1
+        return self.next_track_id
+
+    def send(self, message : tuple):
+        '''Messages are held until the worker is idle, so buffers are never replaced during a step.'''
+        if self.in_flight is None: self.connection.send(message)
+        else: self.outbox.append(message)
+
+    def request_step(self, arrays : SharedParticleArrays, delta : float, current_time : float):
+        self.requests.append((arrays, delta, current_time))
+
+    def is_in_flight(self, arrays : SharedParticleArrays) -> bool:
+        return self.in_flight is not None and any(element is arrays for element in self.in_flight)
+
+    def wait_step(self):
+        if self.in_flight is None: return
+        counts : list[int] = self.connection.recv()
+        for arrays, count in zip(self.in_flight, counts):
+            arrays.finish_step(count)
+        self.in_flight = None
+        for message in self.outbox:
+            self.connection.send(message)
+        self.outbox.clear()
+
+    def free_released(self):
+        for track_id, blocks in self.released:
+            if track_id is not None: self.connection.send(('detach', track_id))
+            for block in blocks:
+                block.close()
+                block.unlink()
+        self.released.clear()
+
+    def sync(self):
+        if self.process is None: return
+        self.wait_step()
+        self.free_released()
+        if not self.requests: return
+        steps : list[tuple[int, int, int, float, float]] = []
+        for arrays, delta, current_time in self.requests:
+            arrays.append_staged()
+            steps.append((arrays.track_id, arrays.front, arrays.count, delta, current_time))
+        self.connection.send(('step', steps))
+        self.in_flight = [arrays for arrays, _, _ in self.requests]
+        self.requests.clear()
+
+particle_worker : ParticleWorker = ParticleWorker()
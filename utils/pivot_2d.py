@@ -1,5 +1,6 @@
 import pygame
 from typing import Any
+from utils.rotation_cache import RotationCache, RotatedImage, rotation_cache
 def rotate_around_pivot_accurate(image : pygame.Surface, pos : pygame.Vector2, angle : float,
                         offset : pygame.Vector2 = None, debug = False, colorkey : pygame.Color|None = None):
     
@@ -22,6 +23,7 @@ def rotate_around_pivot_pos_only(pos : pygame.Vector2, angle : float, offset : p
 
 
 class Pivot2D:
+    rotation_cache : RotationCache|None = rotation_cache #Used to rotate original_image, None to always rotate at the exact angle
     def __init__(self, pos : pygame.Vector2, og_image : pygame.Surface|None = None, colorkey : pygame.Color|None = None) -> None:
         self._origin : pygame.Vector2 = pos
         self._pivot_offset : pygame.Vector2 = pygame.Vector2(0,0)
@@ -30,6 +32,7 @@ class Pivot2D:
         self.is_cached : bool = True
         self.original_image : pygame.Surface|None = og_image
         self.img_colorkey : pygame.Color|None = colorkey
+        self.rotated : RotatedImage|None = None
     
     @property
     def origin(self):
@@ -73,8 +76,15 @@ class Pivot2D:
     def rotate_image(self, image : pygame.Surface) -> tuple[pygame.Surface, pygame.Rect, pygame.Vector2]:
         return rotate_around_pivot_accurate(image, self._origin, self._angle, self._pivot_offset, debug=False, colorkey=self.img_colorkey)
     
-    def rotate_og_image(self):
-        return self.rotate_image(self.original_image)
+    def rotate_og_image(self) -> tuple[pygame.Surface, pygame.Rect, pygame.Vector2]:
+        '''Rotates original_image, through the rotation cache when there is one. The image angle is then quantized to the cache step,
+        the position is not.'''
+        if self.rotation_cache is None:
+            self.rotated = None
+            return self.rotate_image(self.original_image)
+        self.rotated = self.rotation_cache.get(self.original_image, self._angle, self.img_colorkey)
+        new_pos : pygame.Vector2 = self._origin - self._pivot_offset.rotate(self._angle)
+        return self.rotated.image, self.rotated.get_rect(round(new_pos)), new_pos
     
     def rotate_image_debug(self, image : pygame.Surface) -> tuple[pygame.Surface, pygame.Rect, pygame.Vector2, Any]:
         return rotate_around_pivot_accurate(image, self._origin, self._angle, self._pivot_offset, debug=True, colorkey=self.img_colorkey)
\ No newline at end of file
@@ -0,0 +1,95 @@
+import pygame
+import weakref
+from typing import Callable, Union, TypeAlias
+
+BlitSequence : TypeAlias = list[tuple]
+DrawCallback : TypeAlias = Callable[[pygame.Surface], None]
+
+class RenderBatch:
+    '''Collects blits during a draw pass and flushes them with Surface.blits.
+    Consecutive blits sharing the same blend flags end up in the same Surface.blits call.
+    Elements with a custom draw method are kept in order as callbacks.'''
+    def __init__(self) -> None:
+        self.commands : list[Union[tuple[int, BlitSequence], DrawCallback]] = []
+        self.current : BlitSequence|None = None
+        self.current_flags : int = 0
+        self.callback_count : int = 0
+
+    def add(self, surf : pygame.Surface, dest : pygame.Rect|tuple[int, int], flags : int = 0):
+        if self.current is None or flags != self.current_flags:
+            self.current = []
+            self.current_flags = flags
+            self.commands.append((flags, self.current))
+        self.current.append((surf, dest) if flags == 0 else (surf, dest, None, flags))
+
+    def add_many(self, sequence : BlitSequence, flags : int = 0):
+        '''Appends already built (surface, dest) pairs.'''
+        if self.current is None or flags != self.current_flags:
+            self.current = []
+            self.current_flags = flags
+            self.commands.append((flags, self.current))
+        if flags == 0:
+            self.current.extend(sequence)
+        else:
+            self.current.extend((surf, dest, None, flags) for surf, dest in sequence)
+
+    def add_callback(self, draw_func : DrawCallback):
+        '''Keeps a draw call that cannot be batched. It runs in order with the blits around it.'''
+        self.commands.append(draw_func)
+        self.current = None
+        self.callback_count += 1
+
+    def iter_blits(self):
+        '''Yields every batched blit item in draw order, ignoring callbacks.
+        Items are (surface, dest) or (surface, dest, None, flags) tuples, as accepted by Surface.blits.'''
+        for command in self.commands:
+            if callable(command): continue
+            yield from command[1]
+
+    def is_empty(self) -> bool:
+        return not self.commands
+
+    def clear(self):
+        self.commands.clear()
+        self.current = None
+        self.callback_count = 0
+
+    def flush(self, display : pygame.Surface):
+        for command in self.commands:
+            if callable(command):
+                command(display)
+            else:
+                display.blits(command[1], doreturn=False)
+        self.clear()
+
+class SurfaceVersions:
+    '''Generation counters for surfaces drawn on in place.
+    A batch only records which surface is blitted where, so code changing the pixels of a surface it keeps showing
+    (text rendered onto a button, UI filters) must call bump for renderers comparing frames (DirtyRenderer) to notice.
+    Like MaskCache, entries hold a weak reference to their surface so a surface going away drops its counter.'''
+    def __init__(self) -> None:
+        self.versions : dict[int, int] = {}
+        self.refs : dict[int, weakref.ref] = {}
+
+    def bump(self, surf : pygame.Surface):
+        key : int = id(surf)
+        ref = self.refs.get(key)
+        if ref is None or ref() is not surf:
+            self.refs[key] = weakref.ref(surf, self._make_remover(key))
+            self.versions[key] = 0
+        self.versions[key] += 1
+
+    def get(self, surf : pygame.Surface) -> int:
+        return self.versions.get(id(surf), 0)
+
+    def _make_remover(self, key : int):
+        def remove(ref : weakref.ref):
+            if self.refs.get(key) is ref:
+                del self.refs[key]
+                del self.versions[key]
+        return remove
+
+    def __len__(self):
+        return len(self.versions)
+
+surface_versions : SurfaceVersions = SurfaceVersions()
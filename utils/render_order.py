@@ -0,0 +1,52 @@
+from bisect import insort
+
+class RenderOrder:
+    '''Keeps sprites bucketed by zindex so they can be drawn in order without sorting every frame.
+    Every filed element stores its bucket key in _render_z and its index within the bucket in _render_slot.'''
+    def __init__(self) -> None:
+        self.buckets : dict[int, list['Sprite']] = {}
+        self.order : list[int] = []
+
+    def add(self, element : 'Sprite', zindex : int):
+        bucket = self.buckets.get(zindex)
+        if bucket is None:
+            bucket = self.buckets[zindex] = []
+            insort(self.order, zindex)
+        element._render_z = zindex
+        element._render_slot = len(bucket)
+        bucket.append(element)
+
+    def remove(self, element : 'Sprite'):
+        zindex = element._render_z
+        if zindex is None: return
+        bucket = self.buckets[zindex]
+        index : int = element._render_slot
+        last = bucket.pop()
+        if last is not element:
+            bucket[index] = last
+            last._render_slot = index
+        element._render_z = None
+        if not bucket:
+            del self.buckets[zindex]
+            self.order.remove(zindex)
+
+    def move(self, element : 'Sprite', zindex : int|None):
+        '''Refiles an element after its zindex changed. A zindex of None takes it out of the render order.'''
+        if element._render_z == zindex: return
+        self.remove(element)
+        if zindex is not None: self.add(element, zindex)
+
+    def clear(self):
+        for bucket in self.buckets.values():
+            for element in bucket:
+                element._render_z = None
+        self.buckets.clear()
+        self.order.clear()
+
+    def __iter__(self):
+        buckets = self.buckets
+        for zindex in self.order:
+            yield from buckets[zindex]
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
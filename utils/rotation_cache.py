@@ -0,0 +1,157 @@
+import pygame
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Iterable
+
+ColorKey = tuple[int, ...]|None
+
+class RotatedImage:
+    '''A cached rotation of a surface. offset is the topleft of the rotated image relative to its center,
+    the collision mask is only built the first time it is asked for. owner is the cache holding the image, if any,
+    which is told about the mask's memory once it exists.'''
+    __slots__ = ('image', 'offset', '_mask', 'size_bytes', 'owner')
+    def __init__(self, image : pygame.Surface) -> None:
+        self.image : pygame.Surface = image
+        self.offset : tuple[int, int] = (-(image.get_width() // 2), -(image.get_height() // 2))
+        self._mask : pygame.Mask|None = None
+        self.size_bytes : int = image.get_width() * image.get_height() * image.get_bytesize()
+        self.owner : RotationCache|None = None
+
+    @property
+    def mask(self) -> pygame.Mask:
+        if self._mask is None:
+            self._mask = pygame.mask.from_surface(self.image)
+            mask_bytes : int = (self.image.get_width() + 63) // 64 * 8 * self.image.get_height() #Masks are stored as rows of 64 bit words
+            if self.owner is not None: self.owner.grow_entry(self, mask_bytes)
+            else: self.size_bytes += mask_bytes
+        return self._mask
+
+    def get_rect(self, center : tuple[int, int]) -> pygame.Rect:
+        return pygame.Rect(center[0] + self.offset[0], center[1] + self.offset[1], self.image.get_width(), self.image.get_height())
+
+class RotationCache:
+    '''Shares rotated copies of surfaces, keyed on (source surface, quantized angle, colorkey).
+    Angles are rounded to the nearest multiple of step degrees. Like MaskCache, entries hold a weak reference to their source,
+    so a surface going away drops its rotations. The least recently used entries are evicted once max_bytes of pixels is reached.
+    Surfaces modified in place must be passed to invalidate.'''
+    def __init__(self, step : float = 1.0, max_bytes : int = 64 * 1024 * 1024) -> None:
+        self.step : float = step
+        self.steps_per_turn : int = round(360 / step)
+        self.max_bytes : int = max_bytes
+        self.size_bytes : int = 0
+        self.entries : OrderedDict[tuple[int, int, ColorKey], tuple[weakref.ref, RotatedImage]] = OrderedDict()
+        self.sources : dict[int, weakref.ref] = {}
+        self.lock : threading.RLock = threading.RLock()
+        self.hit_count : int = 0
+        self.miss_count : int = 0
+
+    def quantize(self, angle : float) -> int:
+        return round(angle / self.step) % self.steps_per_turn
+
+    def get(self, surf : pygame.Surface, angle : float, colorkey : pygame.Color|tuple|None = None) -> RotatedImage:
+        '''Returns surf rotated clockwise by angle (the rotation used by Pivot2D), drawn with colorkey if one is given.'''
+        return self.get_step(surf, self.quantize(angle), colorkey)
+
+    def get_step(self, surf : pygame.Surface, step_index : int, colorkey : pygame.Color|tuple|None = None) -> RotatedImage:
+        key = (id(surf), step_index, tuple(colorkey) if colorkey is not None else None)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0]() is surf:
+                self.entries.move_to_end(key)
+                self.hit_count += 1
+                return entry[1]
+            self.miss_count += 1
+        rotated = RotatedImage(self.rotate(surf, step_index * self.step, colorkey))
+        with self.lock:
+            self.store(key, surf, rotated)
+        return rotated
+
+    def rotate(self, surf : pygame.Surface, angle : float, colorkey : pygame.Color|tuple|None) -> pygame.Surface:
+        '''The source is copied rather than having its colorkey swapped and restored, since it may be in use on another thread.'''
+        if colorkey is not None and surf.get_colorkey() != pygame.Color(colorkey):
+            surf = surf.copy()
+            surf.set_colorkey(colorkey)
+        return pygame.transform.rotate(surf, -angle)
+
+    def store(self, key : tuple[int, int, ColorKey], surf : pygame.Surface, rotated : RotatedImage):
+        self.drop(key)
+        self.entries[key] = (self.get_source_ref(surf), rotated)
+        rotated.owner = self
+        self.size_bytes += rotated.size_bytes
+        self.evict()
+
+    def evict(self):
+        '''Drops the least recently used entries until the cache fits in max_bytes again.'''
+        while self.size_bytes > self.max_bytes and len(self.entries) > 1:
+            self.drop(next(iter(self.entries)))
+
+    def drop(self, key : tuple[int, int, ColorKey]):
+        entry = self.entries.pop(key, None)
+        if entry is None: return
+        entry[1].owner = None
+        self.size_bytes -= entry[1].size_bytes
+
+    def grow_entry(self, rotated : RotatedImage, extra_bytes : int):
+        '''Accounts for memory an entry allocated after being stored (its mask).'''
+        with self.lock:
+            rotated.size_bytes += extra_bytes
+            if rotated.owner is not self: return
+            self.size_bytes += extra_bytes
+            self.evict()
+
+    def get_source_ref(self, surf : pygame.Surface) -> weakref.ref:
+        '''One weak reference per source surface, shared by all of its rotations.'''
+        ref = self.sources.get(id(surf))
+        if ref is None or ref() is not surf:
+            ref = weakref.ref(surf, self._make_remover(id(surf)))
+            self.sources[id(surf)] = ref
+        return ref
+
+    def _make_remover(self, surf_id : int):
+        def remove(ref : weakref.ref):
+            with self.lock:
+                if self.sources.get(surf_id) is ref: del self.sources[surf_id]
+                for key in [key for key, entry in self.entries.items() if key[0] == surf_id and entry[0] is ref]:
+                    self.drop(key)
+        return remove
+
+    def prewarm(self, surf : pygame.Surface, step : float|None = None, colorkey : pygame.Color|tuple|None = None,
+                background : bool = True) -> threading.Thread|None:
+        '''Caches the rotations of surf every step degrees (every cache step by default), on a daemon thread unless background is False.
+        Returns the thread so loading code can join it.'''
+        return self.prewarm_many([(surf, colorkey)], step, background)
+
+    def prewarm_many(self, images : Iterable[tuple[pygame.Surface, pygame.Color|tuple|None]], step : float|None = None,
+                     background : bool = True) -> threading.Thread|None:
+        '''Same as prewarm for several (surface, colorkey) pairs, one after the other on a single thread.'''
+        stride : int = max(1, round((step or self.step) / self.step))
+        indexes = range(0, self.steps_per_turn, stride)
+        images = list(images)
+        def warm():
+            for surf, colorkey in images:
+                for step_index in indexes: self.get_step(surf, step_index, colorkey)
+        if not background:
+            warm()
+            return None
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        return thread
+
+    def invalidate(self, surf : pygame.Surface):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == id(surf)]:
+                self.drop(key)
+            self.sources.pop(id(surf), None)
+
+    def clear(self):
+        with self.lock:
+            for _, rotated in self.entries.values(): rotated.owner = None
+            self.entries.clear()
+            self.sources.clear()
+            self.size_bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+rotation_cache : RotationCache = RotationCache()
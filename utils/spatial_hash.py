@@ -0,0 +1,115 @@
+import pygame
+from math import ceil
+from typing import Iterable
+
+class SpatialHash:
+    '''Uniform grid broadphase. Every element is filed in each cell its rect touches.
+    Queries made before the next rebuild widen their rect by how far the fastest element could have moved since,
+    the speed being tracked from one rebuild to the next.'''
+    def __init__(self, cell_size : int = 64, min_margin : int = 4, speed_slack : float = 1.5) -> None:
+        self.cell_size : int = cell_size
+        self.min_margin : int = min_margin
+        self.speed_slack : float = speed_slack
+        self.cells : dict[tuple[int, int], list['Sprite']] = {}
+        self.centers : dict[int, tuple[int, int]] = {}
+        self.max_speed : float = 0
+        self.frame : int = -1
+
+        self.candidate_count : int = 0
+        self.hit_count : int = 0
+        self.last_candidate_count : int = 0
+        self.last_hit_count : int = 0
+
+    def clear(self):
+        self.cells.clear()
+        self.centers.clear()
+        self.max_speed = 0
+        self.frame = -1
+
+    def rebuild(self, elements : Iterable['Sprite'], frame : int, delta : float = 1):
+        '''Refiles every element. delta is the time since the previous rebuild, used to measure the fastest element.'''
+        self.last_candidate_count = self.candidate_count
+        self.last_hit_count = self.hit_count
+        self.candidate_count = 0
+        self.hit_count = 0
+
+        self.cells.clear()
+        self.frame = frame
+        old_centers = self.centers
+        centers : dict[int, tuple[int, int]] = {}
+        max_step : int = 0
+        for element in elements:
+            rect : pygame.Rect|None = element.rect
+            if rect is None: continue
+            self._file(element, rect)
+            center = rect.center
+            centers[id(element)] = center
+            old_center = old_centers.get(id(element))
+            if old_center is not None:
+                step : int = max(abs(center[0] - old_center[0]), abs(center[1] - old_center[1]))
+                if step > max_step: max_step = step
+        self.centers = centers
+        self.max_speed = max_step / delta if delta > 0 else 0
+
+    def _file(self, element : 'Sprite', rect : pygame.Rect, check : bool = False):
+        size : int = self.cell_size
+        cells = self.cells
+        x0 : int = rect.left // size
+        y0 : int = rect.top // size
+        x1 : int = max(x0, (rect.right - 1) // size)
+        y1 : int = max(y0, (rect.bottom - 1) // size)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [element]
+                elif not check or not any(filed is element for filed in bucket):
+                    bucket.append(element)
+
+    def insert(self, element : 'Sprite'):
+        '''Files an element spawned after the last rebuild. Inserting an element again (killed and respawned in the same frame)
+        only adds it to the cells it is not in yet, so buckets never hold duplicates.'''
+        rect : pygame.Rect|None = element.rect
+        if rect is None: return
+        self._file(element, rect, check=True)
+
+    def is_usable(self, frame : int) -> bool:
+        '''The hash is usable during the frame it was built in and the one right after (with a margin).'''
+        return frame - 1 <= self.frame <= frame
+
+    def get_stale_margin(self, delta : float) -> int:
+        '''How far, in pixels, the fastest element may have moved after delta more time.'''
+        return max(self.min_margin, ceil(self.max_speed * delta * self.speed_slack))
+
+    def query(self, rect : pygame.Rect, frame : int, delta : float = 1) -> list['Sprite']:
+        '''Returns every filed element sharing a cell with rect, without duplicates.
+        delta is the time elapsed since the rebuild when querying the hash of the previous frame.
+        The returned list may be one of the hash's own buckets and must not be modified.'''
+        if self.frame != frame:
+            margin : int = self.get_stale_margin(delta)
+            rect = rect.inflate(margin * 2, margin * 2)
+        size : int = self.cell_size
+        cells = self.cells
+        x0 : int = rect.left // size
+        y0 : int = rect.top // size
+        x1 : int = max(x0, (rect.right - 1) // size)
+        y1 : int = max(y0, (rect.bottom - 1) // size)
+        if x0 == x1 and y0 == y1:
+            return cells.get((x0, y0), [])
+
+        seen : set[int] = set()
+        result : list[Sprite] = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None: continue
+                for element in bucket:
+                    element_id = id(element)
+                    if element_id in seen: continue
+                    seen.add(element_id)
+                    result.append(element)
+        return result
+
+    def get_stats(self) -> tuple[int, int]:
+        '''Returns (candidate pairs, actual hits) counted during the last complete frame.'''
+        return self.last_candidate_count, self.last_hit_count
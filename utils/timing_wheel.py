@@ -0,0 +1,86 @@
+from math import ceil, floor
+from typing import Any
+
+class TimingWheel:
+    '''Hierarchical timing wheel for deadlines that are rarely cancelled (lifetimes, expiries).
+    Time is cut into ticks of tick_length seconds. Level 0 holds one slot per tick, every level above
+    covers slot_count times the span of the one below and cascades its entries down when the wheel reaches them.
+    Scheduling is O(1) and advancing only touches the entries that are due (plus the occasional cascade).
+    Entries cannot be removed: schedule a token along with the item and check it is still current when it comes back.'''
+    def __init__(self, tick_length : float = 1 / 60, slot_count : int = 64, level_count : int = 3, start_time : float = 0) -> None:
+        self.tick_length : float = tick_length
+        self.slot_count : int = slot_count
+        self.level_count : int = level_count
+        self.levels : list[list[list[tuple[int, Any, Any]]]] = [[[] for _ in range(slot_count)] for _ in range(level_count)]
+        self.overflow : list[tuple[int, Any, Any]] = []
+        self.due : list[tuple[Any, Any]] = []
+        self.current_tick : int = floor(start_time / tick_length)
+        self.count : int = 0
+
+    def schedule(self, deadline : float, item : Any, token : Any = None):
+        '''Queues item to be handed back by the first advance reaching deadline (in the same time unit as advance).'''
+        self.count += 1
+        self._insert(ceil(deadline / self.tick_length), item, token)
+
+    def _insert(self, tick : int, item : Any, token : Any):
+        distance : int = tick - self.current_tick
+        if distance <= 0:
+            self.due.append((item, token))
+            return
+        slot_count : int = self.slot_count
+        span : int = 1
+        for level in self.levels:
+            if distance < span * slot_count:
+                level[(tick // span) % slot_count].append((tick, item, token))
+                return
+            span *= slot_count
+        self.overflow.append((tick, item, token))
+
+    def _cascade(self, entries : list[tuple[int, Any, Any]]):
+        for tick, item, token in entries:
+            self._insert(tick, item, token)
+
+    def advance(self, current_time : float) -> list[tuple[Any, Any]]:
+        '''Moves the wheel up to current_time and returns the (item, token) pairs that came due.'''
+        target_tick : int = floor(current_time / self.tick_length)
+        slot_count : int = self.slot_count
+        levels = self.levels
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            tick : int = self.current_tick
+            span : int = slot_count
+            for level_index in range(1, self.level_count):
+                if tick % span: break
+                slot : list = levels[level_index][(tick // span) % slot_count]
+                levels[level_index][(tick // span) % slot_count] = []
+                self._cascade(slot)
+                span *= slot_count
+            else:
+                if tick % span == 0 and self.overflow:
+                    overflow = self.overflow
+                    self.overflow = []
+                    self._cascade(overflow)
+            bucket : list = levels[0][tick % slot_count]
+            if bucket:
+                levels[0][tick % slot_count] = []
+                self.due.extend((item, token) for _, item, token in bucket)
+        due = self.due
+        self.due = []
+        self.count -= len(due)
+        return due
+
+    def clear(self):
+        for level in self.levels:
+            for slot in level:
+                slot.clear()
+        self.overflow.clear()
+        self.due.clear()
+        self.count = 0
+
+    def reset(self, start_time : float = 0):
+        '''Empties the wheel and moves it to start_time, which may be earlier than the current time (e.g. a restarted timer).'''
+        self.clear()
+        self.current_tick = floor(start_time / self.tick_length)
+
+    def __len__(self):
+        return self.count
@@ -118,8 +118,9 @@ class TweenTrack:
             lerp_func = interpolation.compatibilty_lerp
         else:
             lerp_func = interpolation.lerp
+        eased_alpha : float = self.info.easying_style(alpha)
         for attr in self.goal:
-            result = lerp_func(self.start[attr], self.goal[attr], self.info.easying_style(alpha))
+            result = lerp_func(self.start[attr], self.goal[attr], eased_alpha)
             #print(f'{self.start[attr]} --> {self.goal[attr]} : {result}')
             self.set_chained_attribute(self.target, attr, result)
       
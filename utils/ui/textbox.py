@@ -1,6 +1,7 @@
 import pygame
 from math import floor
 from utils.ui.ui_sprite import UiSprite
+from utils.render_batch import surface_versions
 from utils.helpers import rotate_around_pivot_accurate
 class TextBox(UiSprite):
     main_image = pygame.image.load('assets/graphics/button_templates/textbox_green_colorkey.png').convert()
@@ -52,6 +53,7 @@ class TextBox(UiSprite):
         if self._true_text == '': return
         text_surf = self.text_settings[0].render(self._true_text, self.text_settings[2], self.text_settings[1], wraplength=self.max_line_lentgh)
         self.surf.blit(text_surf, self.text_start_pos)
+        surface_versions.bump(self.surf) #The surface may be the one currently shown
     
     @property
     def text(self):
@@ -1,6 +1,7 @@
 import pygame
 from math import floor
 from utils.ui.ui_sprite import UiSprite
+from utils.render_batch import surface_versions
 from utils.helpers import rotate_around_pivot_accurate
 import button_templates
 
@@ -50,6 +51,7 @@ class TextButton(UiSprite):
         if self.text_scale != 1:
             text_surf = pygame.transform.scale_by(text_surf, self.text_scale)
         self.surf.blit(text_surf, text_surf.get_rect(center=(centerx, centery)))
+        surface_versions.bump(self.surf) #The surface may be the one currently shown
     
     @property
     def text(self):
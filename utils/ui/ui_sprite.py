@@ -1,6 +1,7 @@
 import pygame
 from utils.helpers import rotate_around_pivot_accurate, ColorType
 from utils.pivot_2d import Pivot2D
+from utils.render_batch import surface_versions
 
 
 
@@ -15,10 +16,17 @@ class UiFilter:
             surface.blit(self.value, (0,0), special_flags=self.blend_mode)
         elif t == pygame.Color:
             surface.fill(self.value, special_flags=self.blend_mode)
+        surface_versions.bump(surface)
         
 
 class UiSprite:
     TAG_EVENT = pygame.event.custom_type()
+    zindex_version : int = 0
+    batched_draw : bool = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.batched_draw = cls.draw is UiSprite.draw
     def __init__(self, surf : pygame.Surface, rect : pygame.Rect, tag : int, name : str|None = None, keep_og_surf = False, 
                  attributes : dict = None, data : dict = None, forced_og_surf : pygame.Surface = None, zindex : int = 0,
                  colorkey : ColorType|str|None = None):
@@ -35,7 +43,7 @@ class UiSprite:
         self.rect : pygame.Rect = rect if rect is not None else self.surf.get_rect() if self.surf is not None else None
         self.tag : int = tag
         self.name : str|None = name
-        self.zindex : int = zindex
+        self._zindex : int = zindex
         
         self.visible : bool = True
         self.interactible : bool = True
@@ -105,6 +113,16 @@ class UiSprite:
             if not has_modified: self.surf = self.og_surf.copy()
             filter.apply(self.surf)
 
+    @property
+    def zindex(self) -> int:
+        return self._zindex
+    
+    @zindex.setter
+    def zindex(self, new_val : int):
+        if new_val == self._zindex: return
+        self._zindex = new_val
+        UiSprite.zindex_version += 1
+
     @property
     def opacity(self):
         return self._opacity
@@ -6,6 +6,8 @@ from typing import Literal
 
 class UiSpriteGroup:
     base_name : str = 'Group'
+    batched_draw : bool = False #Not a UiSprite : Ui.render runs draw as a callback, which draws every element in turn
+    zindex : int = 0
     def __init__(self, *args : tuple[UiSprite], serial : str = ''):
         self.tag : None = None
         self.elements : list[UiSprite] = [arg for arg in args]